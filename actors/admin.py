@@ -1,10 +1,147 @@
+import string
+
 from django.contrib import admin, messages
-from django.db.models import QuerySet
+from django.contrib.admin.exceptions import NotRegistered
+from django.contrib.admin.utils import get_last_value_from_parameters
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Max, Min, Q, QuerySet
+from django.db.models.functions import Lower
 from django.http import HttpRequest
+from django.utils.functional import cached_property
 from django.utils.safestring import mark_safe
 
 from .models import Actor, Category, Producer, Tag
 from .services import pluralize
+from .thumbnails import thumbnail_url
+
+
+def estimate_row_count(model) -> int:
+    """Estimate the number of rows of a model's table from its primary key range.
+
+    Reading MIN(pk) and MAX(pk) is two index lookups instead of a full COUNT(*). The estimate is too high by the
+    number of deleted rows and is cached for a minute.
+
+    Args:
+        model: The model class.
+
+    Returns:
+        int: The estimated row count.
+    """
+    key = f'admin:estimated_rows:{model._meta.label_lower}'
+    estimate = cache.get(key)
+    if estimate is None:
+        bounds = model._default_manager.order_by().aggregate(low=Min('pk'), high=Max('pk'))
+        estimate = bounds['high'] - bounds['low'] + 1 if bounds['high'] is not None else 0
+        cache.set(key, estimate, 60)
+    return estimate
+
+
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def lowered_prefixes(word: str) -> set[str]:
+    """Return what LOWER() turns the start of a name matching a search word into.
+
+    SQLite's LOWER() only folds ASCII letters, so names keep the case of their other letters in the expression
+    indexes. A word beyond ASCII is therefore looked up in the case forms names are written in: as typed,
+    lowercase, capitalized and uppercase.
+
+    Args:
+        word (str): One word of the search term.
+
+    Returns:
+        set: The prefixes to look up in the LOWER(first_name) and LOWER(last_name) indexes.
+    """
+    if word.isascii():
+        return {word.lower()}
+    return {form.translate(ASCII_LOWER) for form in (word, word.lower(), word.capitalize(), word.upper())}
+
+
+class LargeTablePaginator(Paginator):
+    """Paginator that never runs an unbounded COUNT(*).
+
+    The unfiltered changelist uses the estimated row count. Filtered or searched changelists count at most
+    `count_limit` rows, so deep pages of a broad filter are reached with the cursor link instead.
+    """
+
+    count_limit = 10_000
+
+    @cached_property
+    def count(self) -> int:
+        if not self.object_list.query.has_filters():
+            return estimate_row_count(self.object_list.model)
+        return min(self.object_list.values('pk')[: self.count_limit + 1].count(), self.count_limit)
+
+
+class CursorChangeList(ChangeList):
+    """Changelist offering a 'next page' link that seeks by id instead of using OFFSET."""
+
+    @cached_property
+    def next_cursor_url(self) -> str:
+        """Query string of the page following this one, or '' when the list isn't ordered by ascending id."""
+        ordering = set(self.queryset.query.order_by)
+        if not ordering or not ordering <= {'id', 'pk'} or not self.multi_page:
+            return ''
+        rows = list(self.result_list)
+        if len(rows) < self.list_per_page:
+            return ''
+        return self.get_query_string({'id__gt': rows[-1].pk}, [PAGE_VAR])
+
+
+class LimitedRelatedFieldListFilter(admin.RelatedFieldListFilter):
+    """Related filter listing at most `limit` options, plus the selected ones, instead of the whole table.
+
+    Once the options don't fit, a search box narrows them down with the search of the related model's admin, so
+    every option stays reachable.
+    """
+
+    limit = 25
+    template = 'admin/actors/limited_related_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.search_kwarg = f'{field_path}__search'
+        self.search_term = (get_last_value_from_parameters(params, self.search_kwarg) or '').strip()
+        self.truncated = False
+        super().__init__(field, request, params, model, model_admin, field_path)
+        # The search term narrows down the options, not the changelist.
+        self.used_parameters.pop(self.search_kwarg, None)
+        self.kept_params = [
+            (name, value)
+            for name, values in request.GET.lists()
+            if name not in (self.search_kwarg, PAGE_VAR)
+            for value in values
+        ]
+
+    def expected_parameters(self) -> list[str]:
+        return [*super().expected_parameters(), self.search_kwarg]
+
+    def has_output(self) -> bool:
+        return self.truncated or bool(self.search_term) or super().has_output()
+
+    def field_choices(self, field, request: HttpRequest, model_admin: admin.ModelAdmin) -> list[tuple]:
+        ordering = self.field_admin_ordering(field, request, model_admin) or ('pk',)
+        related = field.related_model._default_manager.order_by(*ordering)
+        options = related
+        if self.search_term:
+            try:
+                related_admin = model_admin.admin_site.get_model_admin(field.related_model)
+            except NotRegistered:
+                pass
+            else:
+                options, _ = related_admin.get_search_results(request, related, self.search_term)
+        choices = [(obj.pk, str(obj)) for obj in options[: self.limit + 1]]
+        self.truncated = len(choices) > self.limit
+        choices = choices[: self.limit]
+        missing = {str(value) for value in self.lookup_val or ()} - {str(pk) for pk, _ in choices}
+        if missing:
+            try:
+                choices += [(obj.pk, str(obj)) for obj in related.filter(pk__in=missing)]
+            except (ValueError, ValidationError):
+                pass
+        return choices
 
 
 class ProducerFilter(admin.SimpleListFilter):
@@ -42,8 +179,13 @@ class ActorAdmin(admin.ModelAdmin):
     The fields of the Actor model are displayed in a specific order, with various functionalities such as
     search, filter, and actions like 'publish_actors' and 'remove_from_publication'.
 
+    Once the table holds more than `large_table_threshold` rows (estimated), the changelist switches to a large-table
+    mode: counts are estimated or bounded, related filters list a limited number of options and search matches
+    name prefixes through the lowercase name indexes instead of scanning with LIKE '%term%'.
+
     Attributes:
         ACTOR_WORD (str): Word to be used in the messages shown after actions.
+        large_table_threshold (int): Estimated row count from which the large-table mode is used.
     """
 
     fields = (
@@ -63,16 +205,62 @@ class ActorAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('first_name', 'last_name')}
     list_display = ('id', 'get_full_name', 'get_small_photo', 'time_create', 'author', 'is_published', 'category')
     list_display_links = ('id', 'get_full_name')
+    list_select_related = ('author', 'category')
     ordering = ('id',)
     readonly_fields = ('get_photo', 'author', 'time_create', 'time_update')
     actions = ('publish_actors', 'remove_from_publication')
     search_fields = ('first_name', 'last_name', 'category__name')
     list_filter = (ProducerFilter, 'category', 'is_published', 'tags')
-    filter_horizontal = ('tags',)
+    autocomplete_fields = ('category', 'tags', 'producer')
+    show_full_result_count = False
 
     save_on_top = True
 
     ACTOR_WORD = 'actor'
+    large_table_threshold = 50_000
+
+    def is_large_table(self) -> bool:
+        return estimate_row_count(self.model) >= self.large_table_threshold
+
+    def get_changelist(self, request: HttpRequest, **kwargs):
+        return CursorChangeList
+
+    def get_paginator(self, request: HttpRequest, queryset: QuerySet, per_page: int, **kwargs) -> Paginator:
+        if self.is_large_table():
+            return LargeTablePaginator(queryset, per_page, **kwargs)
+        return super().get_paginator(request, queryset, per_page, **kwargs)
+
+    def get_list_filter(self, request: HttpRequest) -> tuple:
+        if self.is_large_table():
+            return (
+                ProducerFilter,
+                ('category', LimitedRelatedFieldListFilter),
+                'is_published',
+                ('tags', LimitedRelatedFieldListFilter),
+            )
+        return self.list_filter
+
+    def get_search_results(self, request: HttpRequest, queryset: QuerySet, search_term: str) -> tuple[QuerySet, bool]:
+        """Match every search word against the start of the first or last name, or within the category name, in
+        large-table mode.
+
+        Each word becomes range conditions on LOWER(first_name) and LOWER(last_name), which the expression indexes
+        answer directly; see lowered_prefixes() for words beyond ASCII. The categories are few, so their names are
+        matched in Python and the words they match become a condition on the category.
+        """
+        if not self.is_large_table():
+            return super().get_search_results(request, queryset, search_term)
+        words = search_term.split()
+        categories = list(Category.objects.values_list('pk', 'name')) if words else []
+        queryset = queryset.alias(first_name_lower=Lower('first_name'), last_name_lower=Lower('last_name'))
+        for word in words:
+            condition = Q(category__in=[pk for pk, name in categories if word.lower() in name.lower()])
+            for prefix in lowered_prefixes(word):
+                upper = prefix + '\uffff'
+                condition |= Q(first_name_lower__gte=prefix, first_name_lower__lt=upper)
+                condition |= Q(last_name_lower__gte=prefix, last_name_lower__lt=upper)
+            queryset = queryset.filter(condition)
+        return queryset, False
 
     @staticmethod
     def publish_actor(actor: Actor) -> bool:
@@ -148,7 +336,10 @@ class ActorAdmin(admin.ModelAdmin):
 
     @admin.display(description='Photo')
     def get_small_photo(self, actor: Actor) -> str:
-        """Return HTML string of a smaller version of actor's photo or a default one if photo is missing.
+        """Return HTML string of a thumbnail of actor's photo or a default one if photo is missing.
+
+        Thumbnails are made when a photo is saved or by the make_thumbnails command, and only read here, so the
+        changelist neither resizes nor downloads full-size photos; images below the fold are loaded lazily.
 
         Args:
             actor (Actor): Instance of Actor model.
@@ -157,8 +348,8 @@ class ActorAdmin(admin.ModelAdmin):
             str: HTML formatted string displaying the smaller version of the actor's photo.
         """
         if actor.photo:
-            return mark_safe(f'<img src="{actor.photo.url}" width="50">')
-        return mark_safe('<img src="/static/images/default.jpeg" width="50">')
+            return mark_safe(f'<img src="{thumbnail_url(actor.photo, 100)}" width="50" loading="lazy">')
+        return mark_safe('<img src="/static/images/default.jpeg" width="50" loading="lazy">')
 
     @admin.action(description='Publish selected actors')
     def publish_actors(self, request: HttpRequest, queryset: QuerySet) -> None:
@@ -218,6 +409,7 @@ class CategoryAdmin(admin.ModelAdmin):
 
     list_display = ('id', 'name')
     list_display_links = ('id', 'name')
+    search_fields = ('name',)
 
 
 @admin.register(Tag)
@@ -230,13 +422,16 @@ class TagAdmin(admin.ModelAdmin):
 
     list_display = ('id', 'name')
     list_display_links = ('id', 'name')
+    search_fields = ('name',)
+    ordering = ('name',)
 
 
 @admin.register(Producer)
 class ProducerAdmin(admin.ModelAdmin):
     """Admin interface for the Producer model.
 
-    The Producer model's id, full name and age fields are displayed, sorted by id and age.
+    The Producer model's id, full name and age fields are displayed, sorted by id and age, and searchable by name
+    for the actor's producer autocomplete.
 
     Methods:
         get_full_name: Return the full name of the producer.
@@ -245,6 +440,14 @@ class ProducerAdmin(admin.ModelAdmin):
     list_display = ('id', 'get_full_name', 'age')
     list_display_links = ('id', 'get_full_name')
     ordering = ('id', 'age')
+    search_fields = ('first_name', 'last_name')
+
+    def get_search_results(self, request: HttpRequest, queryset: QuerySet, search_term: str) -> tuple[QuerySet, bool]:
+        """Offer only unassigned producers in the autocomplete of the actor's producer field."""
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if request.GET.get('model_name') == 'actor' and request.GET.get('field_name') == 'producer':
+            queryset = queryset.filter(producer=None)
+        return queryset, may_have_duplicates
 
     @admin.display(description='Full name')
     def get_full_name(self, producer: Producer) -> str:
@@ -0,0 +1,216 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Case, F, Value, When
+
+logger = logging.getLogger('actors.counters')
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SPOOL_DIR': None,
+    'FLUSH_INTERVAL': 10.0,
+    'FLUSH_THREAD': True,
+    'CLAIM_TIMEOUT': 300.0,
+}
+
+
+def get_config() -> dict:
+    return {**DEFAULTS, **getattr(settings, 'VIEW_COUNTS', {})}
+
+
+def apply_deltas(deltas: dict[int, int]) -> int:
+    """Add view count deltas to the actors with one UPDATE statement.
+
+    Args:
+        deltas (dict[int, int]): Views to add per actor id.
+
+    Returns:
+        int: Number of updated actors.
+    """
+    from .models import Actor
+
+    deltas = {actor_id: delta for actor_id, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    increment = Case(*(When(pk=actor_id, then=Value(delta)) for actor_id, delta in deltas.items()), default=Value(0))
+    return Actor.objects.filter(pk__in=deltas).update(views=F('views') + increment)
+
+
+def write_spool(directory: Path, deltas: dict[int, int]) -> Path:
+    """Atomically write view count deltas to a new file in the spool directory."""
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{os.getpid()}-{uuid.uuid4().hex}.json'
+    temporary = path.with_suffix('.tmp')
+    temporary.write_text(json.dumps(deltas))
+    os.replace(temporary, path)
+    return path
+
+
+def drain_spool(directory: Path, claim_timeout: float | None = None) -> int:
+    """Apply every spooled delta file to the database in one UPDATE and delete the files.
+
+    Files are claimed by renaming them first, so several drainers can run at once without counting a file twice.
+    A claim older than `claim_timeout` seconds is taken to be left behind by a drainer that died before applying
+    it, and is drained again; the timeout must therefore exceed the longest run.
+
+    Args:
+        directory (Path): The spool directory.
+        claim_timeout (float | None): Age of an abandoned claim; VIEW_COUNTS['CLAIM_TIMEOUT'] by default.
+
+    Returns:
+        int: Number of updated actors.
+    """
+    directory = Path(directory)
+    if not directory.is_dir():
+        return 0
+    if claim_timeout is None:
+        claim_timeout = get_config()['CLAIM_TIMEOUT']
+    abandoned = time.time() - claim_timeout
+    for claim in directory.glob('*.claimed'):
+        try:
+            if claim.stat().st_mtime < abandoned:
+                os.replace(claim, unclaimed(claim))
+                logger.warning('Draining view count spool file %s again, its drainer did not finish', claim)
+        except FileNotFoundError:
+            continue
+    totals, claimed = Counter(), []
+    for path in directory.glob('*.json'):
+        claim = path.with_suffix(f'.{os.getpid()}.claimed')
+        try:
+            # Touched first: the rename keeps the modification time, which dates the claim for later drainers.
+            os.utime(path)
+            os.replace(path, claim)
+            totals.update({int(actor_id): delta for actor_id, delta in json.loads(claim.read_text()).items()})
+        except FileNotFoundError:
+            continue
+        except ValueError:
+            logger.warning('Skipping unreadable view count spool file %s', claim)
+            continue
+        claimed.append(claim)
+    try:
+        updated = apply_deltas(totals)
+    except Exception:
+        # Put the files back for the next run.
+        for claim in claimed:
+            os.replace(claim, unclaimed(claim))
+        raise
+    for claim in claimed:
+        claim.unlink(missing_ok=True)
+    return updated
+
+
+def unclaimed(claim: Path) -> Path:
+    """Return the spool file name a claim was renamed from."""
+    return claim.with_name(f'{claim.name.split(".")[0]}.json')
+
+
+class ViewCounter:
+    """Counts actor views in process memory and flushes the aggregated deltas periodically.
+
+    Every thread increments its own shard under the shard's lock, which no other thread takes except the flusher,
+    so recording a view never contends with other requests. The shards of threads that ended are folded into one
+    shared Counter, so recycled threads don't leave a shard each behind. A flush swaps every shard for an empty one,
+    sums them and either applies the deltas to the database with one UPDATE or, when SPOOL_DIR is set, writes them
+    to the spool directory for `manage.py flush_view_counts` to apply. The latter is the mode for multi-process
+    deployments, where only one process should write the counters.
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._shards = {}
+        self._retired = Counter()
+        self._shards_lock = threading.Lock()
+        self._flusher = None
+        self._flusher_lock = threading.Lock()
+
+    def _shard(self) -> list:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = [threading.Lock(), Counter()]
+            with self._shards_lock:
+                self._retire_dead_threads()
+                self._shards[threading.current_thread()] = shard
+        return shard
+
+    def _retire_dead_threads(self) -> None:
+        # Called with _shards_lock held: the counts of threads that ended wait in one shared Counter for the flush.
+        for thread in [thread for thread in self._shards if not thread.is_alive()]:
+            lock, counts = self._shards.pop(thread)
+            with lock:
+                self._retired.update(counts)
+
+    def hit(self, actor_id: int) -> None:
+        """Count one view of an actor."""
+        config = get_config()
+        if not config['ENABLED']:
+            return
+        shard = self._shard()
+        with shard[0]:
+            shard[1][actor_id] += 1
+        if config['FLUSH_THREAD'] and self._flusher is None:
+            self._start_flusher(config['FLUSH_INTERVAL'])
+
+    def drain(self) -> Counter:
+        """Take the counts recorded so far out of every shard and return their sum."""
+        with self._shards_lock:
+            self._retire_dead_threads()
+            totals, self._retired = self._retired, Counter()
+            shards = list(self._shards.values())
+        for shard in shards:
+            with shard[0]:
+                counts, shard[1] = shard[1], Counter()
+            totals.update(counts)
+        return totals
+
+    def flush(self) -> int:
+        """Apply or spool the pending counts.
+
+        Returns:
+            int: Number of actors with pending views.
+        """
+        deltas = self.drain()
+        if not deltas:
+            return 0
+        spool_dir = get_config()['SPOOL_DIR']
+        try:
+            if spool_dir:
+                write_spool(Path(spool_dir), dict(deltas))
+            else:
+                apply_deltas(deltas)
+        except Exception:
+            # Keep the counts for the next flush.
+            shard = self._shard()
+            with shard[0]:
+                shard[1].update(deltas)
+            raise
+        return len(deltas)
+
+    def _start_flusher(self, interval: float) -> None:
+        with self._flusher_lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run, args=(interval,), name='view-counter', daemon=True)
+            self._flusher.start()
+            atexit.register(self.flush)
+
+    def _run(self, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush view counts')
+            finally:
+                close_old_connections()
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,131 @@
+"""Facets of the actor list pages: the categories and tags of a filtered result set, with their actor counts.
+
+A filter is one category and any number of tags, all of which an actor must have. The counts of every category
+and tag come from one aggregation query over the published actors, cached per normalized filter for
+SIDEBAR_CACHE_TIMEOUT seconds; every committed change to the actors, categories or tags starts a new generation
+of facet keys, see actors.signals.
+"""
+
+import copy
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, QuerySet, Value
+from django.http import QueryDict
+from django.urls import reverse
+
+from actors_django.metrics import record_cache
+
+from .models import Actor
+
+CATEGORY, TAG = 'category', 'tag'
+
+# Tags a filter may combine; each one joins the actor-tag table once more.
+MAX_TAGS = 5
+
+VERSION_KEY = 'actors:facets:version'
+
+
+def normalize_query(query: QueryDict) -> tuple[str | None, tuple[str, ...]]:
+    """Read the category and tag slugs of a filter from a query string, in a canonical order without repeats.
+
+    Returns:
+        tuple: The category slug or None, and the sorted tag slugs.
+    """
+    return query.get(CATEGORY) or None, tuple(sorted(set(filter(None, query.getlist(TAG)))))
+
+
+def filter_params(category: str | None, tags) -> list[tuple[str, str]]:
+    """Return the query parameters of a filter, in the canonical order of normalize_query()."""
+    return ([(CATEGORY, category)] if category else []) + [(TAG, tag) for tag in sorted(tags)]
+
+
+def filter_url(category: str | None, tags) -> str:
+    """Return the URL of the list page of a filter.
+
+    A single category or tag keeps its own list page, so that its drill-down links share the cached page.
+    """
+    tags = sorted(tags)
+    if not tags:
+        return reverse('actors:category', kwargs={'category_slug': category}) if category else reverse('actors:index')
+    if not category and len(tags) == 1:
+        return reverse('actors:tag', kwargs={'tag_slug': tags[0]})
+    return f'{reverse("actors:browse")}?{urlencode(filter_params(category, tags))}'
+
+
+def filter_actors(queryset: QuerySet, category_id: int | None, tag_ids) -> QuerySet:
+    """Narrow an actor queryset down to the actors in the category, if any, that have every one of the tags."""
+    if category_id is not None:
+        queryset = queryset.filter(category_id=category_id)
+    for tag_id in tag_ids:
+        queryset = queryset.filter(tags=tag_id)
+    return queryset
+
+
+def count_facets(category_id: int | None, tag_ids) -> dict[str, dict[int, int]]:
+    """Count the published actors per category and per tag within a filter, in one query.
+
+    The categories are counted under the tag filter alone, so that the counts tell how many actors switching to
+    another category would show; the tags are counted under the whole filter.
+
+    Returns:
+        dict: Actor count by category pk under CATEGORY and by tag pk under TAG.
+    """
+    by_tags = filter_actors(Actor.published.order_by(), None, tag_ids)
+    categories = by_tags.values(facet=F('category_id')).annotate(kind=Value(CATEGORY), total=Count('pk'))
+    in_result = filter_actors(by_tags, category_id, ())
+    tags = (
+        Actor.tags.through.objects.filter(actor__in=in_result.values('pk'))
+        .values(facet=F('tag_id'))
+        .annotate(kind=Value(TAG), total=Count('pk'))
+    )
+    counts = {CATEGORY: {}, TAG: {}}
+    for row in categories.union(tags, all=True):
+        counts[row['kind']][row['facet']] = row['total']
+    return counts
+
+
+def facet_counts(category_id: int | None, tag_ids) -> dict[str, dict[int, int]]:
+    """Return count_facets() from the cache, keyed by the normalized filter, counting on a miss."""
+    timeout = getattr(settings, 'SIDEBAR_CACHE_TIMEOUT', 0)
+    if not timeout:
+        return count_facets(category_id, tag_ids)
+    version = cache.get_or_set(VERSION_KEY, lambda: uuid.uuid4().hex, None)
+    key = f'actors:facets:{version}:{category_id or ""}:{",".join(map(str, sorted(tag_ids)))}'
+    counts = cache.get(key)
+    record_cache('facets', counts is not None)
+    if counts is None:
+        counts = count_facets(category_id, tag_ids)
+        cache.set(key, counts, timeout)
+    return counts
+
+
+def evict_facets() -> None:
+    # Older keys are never read again and expire on their own.
+    cache.delete(VERSION_KEY)
+
+
+def facet_entries(entries, counts: dict[int, int], selected, url) -> list:
+    """Turn sidebar entries into facets: copies counting the actors of the filter, linked to the filter they lead to.
+
+    Args:
+        entries: Categories or tags of the sidebar.
+        counts (dict): Actor count by pk; entries without actors are left out unless selected.
+        selected: Pks of the selected entries, marked with `facet_selected`.
+        url: Called with an entry, returns the URL stored as `facet_url`.
+
+    Returns:
+        list: The facets in the order of the sidebar.
+    """
+    facets = []
+    for entry in entries:
+        if not counts.get(entry.pk) and entry.pk not in selected:
+            continue
+        facet = copy.copy(entry)
+        facet.total = counts.get(entry.pk, 0)
+        facet.facet_selected = entry.pk in selected
+        facet.facet_url = url(entry)
+        facets.append(facet)
+    return facets
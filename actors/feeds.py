@@ -0,0 +1,35 @@
+from django.contrib.syndication.views import Feed
+from django.db.models import QuerySet
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from .models import Actor
+
+
+class LatestActorsFeed(Feed):
+    """Atom feed of the most recently published actors."""
+
+    feed_type = Atom1Feed
+    title = 'Actors'
+    subtitle = 'Recently published actors.'
+    limit = 20
+
+    def link(self) -> str:
+        return reverse('actors:index')
+
+    def items(self) -> QuerySet[Actor]:
+        fields = ('first_name', 'last_name', 'slug', 'biography', 'time_create', 'time_update')
+        return Actor.published.only(*fields)[: self.limit]
+
+    def item_title(self, item: Actor) -> str:
+        return f'{item.first_name} {item.last_name}'
+
+    def item_description(self, item: Actor) -> str:
+        return Truncator(item.biography).words(60)
+
+    def item_pubdate(self, item: Actor):
+        return item.time_create
+
+    def item_updateddate(self, item: Actor):
+        return item.time_update
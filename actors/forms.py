@@ -1,18 +1,72 @@
 from django import forms
+from django.db.models import Q
+from django.urls import reverse_lazy
 
 from .models import Actor, Category, Producer, Tag
 
 
+class AutocompleteWidgetMixin:
+    """Renders only the selected options of a model choice field and lets autocomplete.js load the others.
+
+    The field's queryset is never iterated for rendering: only the submitted or initial ids are looked up.
+
+    Attributes:
+        url (str): URL of the JSON endpoint returning matching choices.
+    """
+
+    class Media:
+        js = ('js/autocomplete.js',)
+
+    def __init__(self, url: str, attrs: dict = None) -> None:
+        super().__init__(attrs=attrs)
+        self.url = url
+
+    def build_attrs(self, base_attrs: dict, extra_attrs: dict = None) -> dict:
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['data-autocomplete-url'] = str(self.url)
+        return attrs
+
+    def optgroups(self, name: str, value: list, attrs: dict = None) -> list:
+        field = self.choices.field
+        selected = [item for item in value if item not in ('', None)]
+        options = []
+        if not self.allow_multiple_selected and field.empty_label is not None:
+            options.append(('', field.empty_label))
+        if selected:
+            try:
+                objects = self.choices.queryset.filter(pk__in=selected)
+                options += [(str(obj.pk), field.label_from_instance(obj)) for obj in objects]
+            except (ValueError, TypeError):
+                pass
+        subgroup = [
+            self.create_option(name, pk, label, pk in selected or (not pk and not selected), index)
+            for index, (pk, label) in enumerate(options)
+        ]
+        return [(None, subgroup, 0)]
+
+
+class AutocompleteSelect(AutocompleteWidgetMixin, forms.Select):
+    """Single choice select backed by an autocomplete endpoint."""
+
+
+class AutocompleteSelectMultiple(AutocompleteWidgetMixin, forms.SelectMultiple):
+    """Multiple choice select backed by an autocomplete endpoint."""
+
+
 class ActorForm(forms.ModelForm):
     """Form for the 'Actor' model.
 
     Provides form fields to collect data for an Actor instance.
 
+    The category, tags and producer fields use autocomplete widgets: only the selected objects are rendered and
+    validation only looks up the submitted ids.
+
     Attributes:
-        category (ModelChoiceField): Dropdown list of all available Category instances.
-        producer (ModelChoiceField): Dropdown list of all available Producer instances, label as optional.
+        category (ModelChoiceField): Autocomplete select of the Category instances.
+        producer (ModelChoiceField): Autocomplete select of the Producer instances not yet assigned to another
+            actor, label as optional.
         is_published (BooleanField): Checkbox to mark if the Actor instance is published, default is True.
-        tags (ModelMultipleChoiceField): Multiple selection field of all available Tag instances, not required.
+        tags (ModelMultipleChoiceField): Autocomplete multiple select of the Tag instances, not required.
 
     Subclasses:
         Meta: Defines additional metadata for the ActorForm, such as the model it's associated with,
@@ -21,15 +75,26 @@ class ActorForm(forms.ModelForm):
         'last_name', 'biography', and 'is_published' fields.
     """
 
-    category = forms.ModelChoiceField(label='Category', queryset=Category.objects.all(), empty_label='Select category')
+    category = forms.ModelChoiceField(
+        label='Category',
+        queryset=Category.objects.all(),
+        empty_label='Select category',
+        widget=AutocompleteSelect(url=reverse_lazy('actors:autocomplete', kwargs={'source': 'category'})),
+    )
     producer = forms.ModelChoiceField(
         label='Producer(optional):',
         queryset=Producer.objects.filter(producer=None),
         empty_label='Select producer',
         required=False,
+        widget=AutocompleteSelect(url=reverse_lazy('actors:autocomplete', kwargs={'source': 'producer'})),
     )
     is_published = forms.BooleanField(label='Publish:', required=False, initial=True)
-    tags = forms.ModelMultipleChoiceField(label='Tags:', queryset=Tag.objects.all(), required=False)
+    tags = forms.ModelMultipleChoiceField(
+        label='Tags:',
+        queryset=Tag.objects.all(),
+        required=False,
+        widget=AutocompleteSelectMultiple(url=reverse_lazy('actors:autocomplete', kwargs={'source': 'tag'})),
+    )
 
     class Meta:
         model = Actor
@@ -54,3 +119,11 @@ class ActorForm(forms.ModelForm):
             ),
             'is_published': forms.CheckboxInput(),
         }
+
+    def __init__(self, *args, **kwargs) -> None:
+        """Allow the actor's own producer next to the unassigned ones when editing."""
+        super().__init__(*args, **kwargs)
+        if self.instance.producer_id:
+            self.fields['producer'].queryset = Producer.objects.filter(
+                Q(producer=None) | Q(pk=self.instance.producer_id)
+            )
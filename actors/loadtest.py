@@ -0,0 +1,406 @@
+import asyncio
+import math
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from http.cookies import SimpleCookie
+from socketserver import ThreadingMixIn
+from urllib.parse import urlencode, urlsplit
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+CSRF_TOKEN_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+DEFAULT_MIX = {
+    'index': 40,
+    'detail': 25,
+    'category': 15,
+    'tag': 10,
+    'edit': 5,
+    'login': 5,
+}
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """Return the given percentile of the values using the nearest-rank method.
+
+    Args:
+        values (list[float]): Sorted list of measurements.
+        percent (float): Percentile to return, between 0 and 100.
+
+    Returns:
+        float: The measurement at the requested rank, or 0.0 for an empty list.
+    """
+    if not values:
+        return 0.0
+    rank = max(math.ceil(percent * len(values) / 100), 1)
+    return values[min(rank, len(values)) - 1]
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    """Parse a scenario mix such as ``index=50,detail=30,login=20``.
+
+    Args:
+        value (str): Comma separated ``scenario=weight`` pairs.
+
+    Returns:
+        dict: Mapping of scenario name to its integer weight.
+
+    Raises:
+        ValueError: If a scenario is unknown or a weight is not a non-negative integer.
+    """
+    mix = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        name, _, weight = item.partition('=')
+        if name not in DEFAULT_MIX:
+            raise ValueError(f'Unknown scenario "{name}", expected one of: {", ".join(DEFAULT_MIX)}.')
+        if not weight.isdigit():
+            raise ValueError(f'Weight of "{name}" must be a non-negative integer.')
+        mix[name] = int(weight)
+    return mix
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    """WSGI reference server handling every connection in its own thread."""
+
+    daemon_threads = True
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    """Request handler that does not write an access log line per request."""
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServer:
+    """Runs the project under a local WSGI or ASGI server in a background thread.
+
+    Attributes:
+        interface (str): Either 'wsgi' or 'asgi'.
+        host (str): Interface to bind to.
+        port (int): Port to bind to, 0 picks a free one.
+    """
+
+    def __init__(self, interface: str = 'wsgi', host: str = '127.0.0.1', port: int = 0) -> None:
+        self.interface = interface
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    def start(self) -> None:
+        """Start serving and block until the server accepts connections.
+
+        Raises:
+            RuntimeError: If the ASGI mode is requested but uvicorn is not installed.
+        """
+        if self.interface == 'asgi':
+            self._start_asgi()
+        else:
+            self._start_wsgi()
+
+    def stop(self) -> None:
+        if self.interface == 'asgi':
+            self._server.should_exit = True
+        else:
+            self._server.shutdown()
+            self._server.server_close()
+        self._thread.join(timeout=10)
+
+    def _start_wsgi(self) -> None:
+        from django.core.wsgi import get_wsgi_application
+
+        self._server = make_server(
+            self.host,
+            self.port,
+            get_wsgi_application(),
+            server_class=ThreadingWSGIServer,
+            handler_class=QuietWSGIRequestHandler,
+        )
+        self.port = self._server.server_port
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def _start_asgi(self) -> None:
+        try:
+            import uvicorn
+        except ImportError as error:
+            raise RuntimeError('The ASGI mode needs uvicorn to be installed.') from error
+        from django.core.asgi import get_asgi_application
+
+        if not self.port:
+            import socket
+
+            with socket.socket() as sock:
+                sock.bind((self.host, 0))
+                self.port = sock.getsockname()[1]
+        config = uvicorn.Config(
+            get_asgi_application(), host=self.host, port=self.port, log_level='warning', lifespan='off'
+        )
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+
+
+@dataclass
+class Response:
+    status: int
+    headers: dict
+    body: bytes
+    cookies: list[str] = field(default_factory=list)
+
+
+class HttpClient:
+    """Minimal asyncio HTTP/1.1 client with a per-client cookie jar.
+
+    Every request opens its own connection and asks the server to close it, which keeps the client free of
+    third-party dependencies and matches how the reference WSGI server behaves.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 30.0) -> None:
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.cookies = {}
+
+    async def request(self, method: str, path: str, data: dict | None = None, referer: str = '') -> Response:
+        body = urlencode(data or {}, doseq=True).encode() if method == 'POST' else b''
+        headers = {
+            'Host': f'{self.host}:{self.port}',
+            'Connection': 'close',
+            'User-Agent': 'actors-loadtest',
+            'Content-Length': str(len(body)),
+        }
+        if method == 'POST':
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['Referer'] = referer or f'http://{self.host}:{self.port}{path}'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        head = f'{method} {path} HTTP/1.1\r\n' + ''.join(f'{key}: {value}\r\n' for key, value in headers.items())
+
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        try:
+            writer.write(head.encode('latin-1') + b'\r\n' + body)
+            await writer.drain()
+            raw = await asyncio.wait_for(reader.read(), self.timeout)
+        finally:
+            writer.close()
+        response = self._parse(raw)
+        for cookie in response.cookies:
+            parsed = SimpleCookie(cookie)
+            for name, morsel in parsed.items():
+                if morsel['max-age'] == '0' or not morsel.value:
+                    self.cookies.pop(name, None)
+                else:
+                    self.cookies[name] = morsel.value
+        return response
+
+    @staticmethod
+    def _parse(raw: bytes) -> Response:
+        head, _, body = raw.partition(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split()[1])
+        headers, cookies = {}, []
+        for line in lines[1:]:
+            key, _, value = line.partition(':')
+            if key.lower() == 'set-cookie':
+                cookies.append(value.strip())
+            headers[key.lower()] = value.strip()
+        return Response(status=status, headers=headers, body=body, cookies=cookies)
+
+
+@dataclass
+class Targets:
+    """Data the scenarios pick their URLs and form payloads from."""
+
+    actor_slugs: list[str]
+    category_slugs: list[str]
+    tag_slugs: list[str]
+    edit_payloads: dict[str, dict]
+    username: str = ''
+    password: str = ''
+
+    @classmethod
+    def from_database(cls, username: str = '', password: str = '', limit: int = 500) -> 'Targets':
+        """Collect published slugs and unchanged edit payloads from the configured database."""
+        from django.db.models import Count
+
+        from .models import Actor, Category, Tag
+
+        actors = list(Actor.published.prefetch_related('tags').order_by('-id')[:limit])
+        payloads = {
+            actor.slug: {
+                'first_name': actor.first_name,
+                'last_name': actor.last_name,
+                'biography': actor.biography,
+                'is_published': 'on',
+                'category': actor.category_id or '',
+                'tags': [tag.pk for tag in actor.tags.all()],
+                'producer': actor.producer_id or '',
+            }
+            for actor in actors
+        }
+        categories = Category.objects.annotate(total=Count('actors')).filter(total__gt=0)
+        tags = Tag.objects.annotate(total=Count('actors')).filter(total__gt=0)
+        return cls(
+            actor_slugs=[actor.slug for actor in actors],
+            category_slugs=list(categories.values_list('slug', flat=True)),
+            tag_slugs=list(tags.values_list('slug', flat=True)),
+            edit_payloads=payloads,
+            username=username,
+            password=password,
+        )
+
+
+class RouteStats:
+    """Latency and error bookkeeping grouped by route name."""
+
+    def __init__(self) -> None:
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, route: str, seconds: float, ok: bool) -> None:
+        self.latencies[route].append(seconds)
+        if not ok:
+            self.errors[route] += 1
+
+    def summary(self, elapsed: float) -> list[dict]:
+        """Return one row of aggregated figures per route, sorted by route name."""
+        rows = []
+        for route in sorted(self.latencies):
+            values = sorted(self.latencies[route])
+            rows.append(
+                {
+                    'route': route,
+                    'requests': len(values),
+                    'errors': self.errors[route],
+                    'error_rate': self.errors[route] / len(values),
+                    'throughput': len(values) / elapsed if elapsed else 0.0,
+                    'p50': percentile(values, 50),
+                    'p95': percentile(values, 95),
+                    'p99': percentile(values, 99),
+                }
+            )
+        return rows
+
+
+class LoadGenerator:
+    """Drives the site with concurrent virtual users following a weighted scenario mix.
+
+    Attributes:
+        base_url (str): Root URL of the running server.
+        targets (Targets): Slugs and payloads the scenarios use.
+        mix (dict): Scenario weights, see DEFAULT_MIX.
+        concurrency (int): Number of virtual users running in parallel.
+    """
+
+    def __init__(self, base_url: str, targets: Targets, mix: dict[str, int], concurrency: int = 10) -> None:
+        self.base_url = base_url
+        self.targets = targets
+        self.mix = self._usable_mix(mix)
+        self.concurrency = concurrency
+        self.stats = RouteStats()
+
+    def _usable_mix(self, mix: dict[str, int]) -> dict[str, int]:
+        needs = {
+            'detail': self.targets.actor_slugs,
+            'category': self.targets.category_slugs,
+            'tag': self.targets.tag_slugs,
+            'edit': self.targets.username and self.targets.actor_slugs,
+            'login': self.targets.username,
+        }
+        usable = {name: weight for name, weight in mix.items() if weight and needs.get(name, True)}
+        if not usable:
+            raise ValueError('None of the requested scenarios can run against this database.')
+        return usable
+
+    def run(self, total_requests: int = 0, duration: float = 0.0) -> float:
+        """Run the load test until the request budget or the duration is exhausted.
+
+        Returns:
+            float: Wall-clock seconds the run took.
+        """
+        return asyncio.run(self._run(total_requests=total_requests, duration=duration))
+
+    async def _run(self, total_requests: int, duration: float) -> float:
+        remaining = [total_requests]
+        deadline = time.monotonic() + duration if duration else None
+        started = time.perf_counter()
+        await asyncio.gather(*(self._user(remaining, deadline) for _ in range(self.concurrency)))
+        return time.perf_counter() - started
+
+    async def _user(self, remaining: list[int], deadline: float | None) -> None:
+        client = HttpClient(self.base_url)
+        names, weights = list(self.mix), list(self.mix.values())
+        while True:
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            if deadline is None:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            scenario = random.choices(names, weights)[0]
+            await getattr(self, f'_scenario_{scenario}')(client)
+
+    async def _timed(self, client: HttpClient, route: str, method: str, path: str, data=None, expect=(200,)):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, data=data)
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+            self.stats.record(route, time.perf_counter() - started, ok=False)
+            return None
+        self.stats.record(route, time.perf_counter() - started, ok=response.status in expect)
+        return response
+
+    async def _scenario_index(self, client: HttpClient) -> None:
+        await self._timed(client, 'actors:index', 'GET', '/')
+
+    async def _scenario_detail(self, client: HttpClient) -> None:
+        slug = random.choice(self.targets.actor_slugs)
+        await self._timed(client, 'actors:post', 'GET', f'/post/{slug}')
+
+    async def _scenario_category(self, client: HttpClient) -> None:
+        slug = random.choice(self.targets.category_slugs)
+        await self._timed(client, 'actors:category', 'GET', f'/category/{slug}')
+
+    async def _scenario_tag(self, client: HttpClient) -> None:
+        slug = random.choice(self.targets.tag_slugs)
+        await self._timed(client, 'actors:tag', 'GET', f'/tag/{slug}')
+
+    async def _login(self, client: HttpClient) -> bool:
+        form = await self._timed(client, 'users:login [GET]', 'GET', '/users/login/')
+        token = form and CSRF_TOKEN_RE.search(form.body.decode(errors='replace'))
+        if not token:
+            return False
+        data = {
+            'csrfmiddlewaretoken': token.group(1),
+            'username': self.targets.username,
+            'password': self.targets.password,
+        }
+        response = await self._timed(client, 'users:login [POST]', 'POST', '/users/login/', data=data, expect=(302,))
+        return response is not None and response.status == 302
+
+    async def _scenario_login(self, client: HttpClient) -> None:
+        await self._login(HttpClient(self.base_url))
+
+    async def _scenario_edit(self, client: HttpClient) -> None:
+        if 'sessionid' not in client.cookies and not await self._login(client):
+            return
+        slug = random.choice(self.targets.actor_slugs)
+        path = f'/update_actor/{slug}'
+        form = await self._timed(client, 'actors:update_actor [GET]', 'GET', path)
+        token = form and CSRF_TOKEN_RE.search(form.body.decode(errors='replace'))
+        if not token:
+            return
+        data = dict(self.targets.edit_payloads[slug], csrfmiddlewaretoken=token.group(1))
+        await self._timed(client, 'actors:update_actor [POST]', 'POST', path, data=data, expect=(302,))
@@ -0,0 +1,125 @@
+import asyncio
+import importlib
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import clear_url_caches
+
+from actors.loadtest import Targets, percentile
+
+
+async def asgi_get(application, path: str) -> int:
+    """Send one GET request through the ASGI application in-process and return the response status.
+
+    The client address is outside INTERNAL_IPS so that the debug toolbar stays out of the measurement.
+    """
+    query = ''
+    if '?' in path:
+        path, query = path.split('?', 1)
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'localhost')],
+        'client': ('192.0.2.1', 0),
+        'server': ('localhost', 80),
+    }
+    status = 0
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await application(scope, receive, send)
+    return status
+
+
+def use_async_views(enabled: bool) -> None:
+    """Switch the actor URLs between the sync and the async views by rebuilding the URLconfs."""
+    settings.ASYNC_VIEWS = enabled
+    clear_url_caches()
+    importlib.reload(importlib.import_module('actors.urls'))
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+
+
+class Command(BaseCommand):
+    """Compares the sync and the async actor views under concurrent load through the ASGI handler.
+
+    Requests are sent in-process with asyncio.gather, so the figures exclude network and server overhead and
+    show what the handler itself does: sync views each take a trip through the thread-sensitive executor, while
+    async views await their queries concurrently and keep the event loop free.
+    """
+
+    help = 'Benchmark the sync and async actor views under concurrent ASGI requests.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=20, help='Number of requests in flight.')
+        parser.add_argument('--requests', type=int, default=500, help='Number of requests per variant.')
+
+    def handle(self, *args, **options):
+        targets = Targets.from_database()
+        if not targets.actor_slugs:
+            raise CommandError('The database has no published actors to request.')
+        paths = ['/']
+        paths += [f'/post/{slug}' for slug in targets.actor_slugs]
+        paths += [f'/category/{slug}' for slug in targets.category_slugs]
+        paths += [f'/tag/{slug}' for slug in targets.tag_slugs]
+
+        application = get_asgi_application()
+        # Set up after the application, which reconfigures logging.
+        logging.getLogger('actors_django.timing').setLevel(logging.ERROR)
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        original = settings.ASYNC_VIEWS
+        try:
+            for label, enabled in (('sync views', False), ('async views', True)):
+                use_async_views(enabled)
+                result = asyncio.run(self.run(application, paths, options))
+                self.report(label, result)
+        finally:
+            use_async_views(original)
+
+    @staticmethod
+    async def run(application, paths: list[str], options: dict) -> dict:
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        latencies, errors = [], 0
+
+        async def one(path: str) -> None:
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                status = await asgi_get(application, path)
+                latencies.append(time.perf_counter() - started)
+                if status >= 400:
+                    errors += 1
+
+        await asgi_get(application, '/')
+        started = time.perf_counter()
+        await asyncio.gather(*(one(random.choice(paths)) for _ in range(options['requests'])))
+        return {'elapsed': time.perf_counter() - started, 'latencies': sorted(latencies), 'errors': errors}
+
+    def report(self, label: str, result: dict) -> None:
+        latencies = result['latencies']
+        self.stdout.write(
+            f'{label:<12} {len(latencies) / result["elapsed"]:>8.1f} req/s   '
+            f'p50 {percentile(latencies, 50) * 1000:>7.1f} ms   p95 {percentile(latencies, 95) * 1000:>7.1f} ms   '
+            f'p99 {percentile(latencies, 99) * 1000:>7.1f} ms   errors {result["errors"]}'
+        )
@@ -0,0 +1,62 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from actors.loadtest import percentile
+
+SCENARIOS = {
+    'unknown user': ('nobody-{number}', 'secret'),
+    'wrong password (username)': ('bench-login', 'wrong'),
+    'wrong password (email)': ('bench-login@example.com', 'wrong'),
+    'success (username)': ('bench-login', 'secret'),
+    'success (email)': ('BENCH-LOGIN@example.com', 'secret'),
+}
+
+
+class Command(BaseCommand):
+    """Measures the cost of authenticate() per login scenario with the configured backends.
+
+    A throwaway user is created inside a transaction that is rolled back at the end. For every scenario the
+    command reports the database queries per attempt and the mean and p99 wall time, which is dominated by
+    password hashing.
+    """
+
+    help = 'Benchmark authenticate() for successful and failed logins.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=20, help='Number of attempts per scenario.')
+        parser.add_argument(
+            '--backends',
+            default='',
+            help='Comma separated AUTHENTICATION_BACKENDS to use instead of the configured ones.',
+        )
+
+    def handle(self, *args, **options):
+        backends = [path for path in options['backends'].split(',') if path] or list(settings.AUTHENTICATION_BACKENDS)
+        self.stdout.write(f'Backends: {", ".join(backends)}')
+        self.stdout.write(f'{"scenario":<28}{"queries":>9}{"mean ms":>10}{"p99 ms":>10}{"result":>9}')
+        with override_settings(AUTHENTICATION_BACKENDS=backends), transaction.atomic():
+            get_user_model().objects.create_user(
+                username='bench-login', email='bench-login@example.com', password='secret'
+            )
+            for name, (username, password) in SCENARIOS.items():
+                self.run(name, username, password, options['attempts'])
+            transaction.set_rollback(True)
+
+    def run(self, name: str, username: str, password: str, attempts: int) -> None:
+        timings, queries, user = [], 0, None
+        for number in range(attempts):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                user = authenticate(None, username=username.format(number=number), password=password)
+                timings.append(time.perf_counter() - started)
+            queries += len(captured)
+        timings.sort()
+        self.stdout.write(
+            f'{name:<28}{queries / attempts:>9.1f}{sum(timings) / attempts * 1000:>10.1f}'
+            f'{percentile(timings, 99) * 1000:>10.1f}{"ok" if user else "denied":>9}'
+        )
@@ -0,0 +1,132 @@
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from actors_django.sqlite3.base import DEFAULT_PRAGMAS
+
+LIST_QUERY = 'SELECT id, name, time_create FROM actor WHERE is_published ORDER BY time_create DESC, id DESC LIMIT 10'
+
+
+class Profile:
+    """Connection behaviour of one database configuration.
+
+    Attributes:
+        name (str): Label used in the report.
+        pragmas (dict): PRAGMAs applied to each new connection.
+        persistent (bool): Whether a worker keeps its connection instead of opening one per operation.
+        begin (str): Statement opening a write transaction.
+    """
+
+    def __init__(self, name: str, pragmas: dict, persistent: bool, begin: str) -> None:
+        self.name = name
+        self.pragmas = pragmas
+        self.persistent = persistent
+        self.begin = begin
+
+    def connect(self, path: Path) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, isolation_level=None)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+
+PROFILES = (
+    Profile('before (rollback journal, connection per request, BEGIN)', {}, persistent=False, begin='BEGIN'),
+    Profile('after (WAL + pragmas, persistent, BEGIN IMMEDIATE)', DEFAULT_PRAGMAS, True, begin='BEGIN IMMEDIATE'),
+)
+
+
+class Command(BaseCommand):
+    """Compares read/write throughput of the stock SQLite setup with the project's tuned backend.
+
+    Reader threads run the index list query, writer threads update a row inside a transaction, both against
+    the same database file for a fixed duration. Failed operations ("database is locked") are counted separately.
+    """
+
+    help = 'Benchmark concurrent SQLite read/write throughput before and after the connection tuning.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='Number of reader threads.')
+        parser.add_argument('--writers', type=int, default=2, help='Number of writer threads.')
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds to run each profile.')
+        parser.add_argument('--rows', type=int, default=20000, help='Number of rows to seed.')
+
+    def handle(self, *args, **options):
+        for profile in PROFILES:
+            with tempfile.TemporaryDirectory() as directory:
+                path = Path(directory) / 'bench.sqlite3'
+                self.seed(path, options['rows'])
+                result = self.run(profile, path, options)
+            self.stdout.write(
+                f'{profile.name}:\n'
+                f'  reads/s {result["reads"] / options["duration"]:>10.1f}   read errors {result["read_errors"]}\n'
+                f'  writes/s {result["writes"] / options["duration"]:>9.1f}   write errors {result["write_errors"]}'
+            )
+
+    @staticmethod
+    def seed(path: Path, rows: int) -> None:
+        conn = sqlite3.connect(path)
+        conn.execute(
+            'CREATE TABLE actor (id INTEGER PRIMARY KEY, name TEXT, is_published BOOL, time_create REAL, views INT)'
+        )
+        conn.execute('CREATE INDEX actor_published_idx ON actor (time_create DESC, id DESC) WHERE is_published')
+        conn.executemany(
+            'INSERT INTO actor (name, is_published, time_create, views) VALUES (?, ?, ?, 0)',
+            ((f'actor {number}', number % 5 != 0, number) for number in range(rows)),
+        )
+        conn.commit()
+        conn.close()
+
+    def run(self, profile: Profile, path: Path, options: dict) -> dict:
+        counts = {'reads': 0, 'read_errors': 0, 'writes': 0, 'write_errors': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+
+        def count(key: str) -> None:
+            with lock:
+                counts[key] += 1
+
+        def worker(operation, success: str, failure: str) -> None:
+            conn = profile.connect(path) if profile.persistent else None
+            number = 0
+            while time.monotonic() < deadline:
+                current = conn or profile.connect(path)
+                try:
+                    operation(current, number)
+                    count(success)
+                except sqlite3.OperationalError:
+                    if current.in_transaction:
+                        current.execute('ROLLBACK')
+                    count(failure)
+                finally:
+                    if conn is None:
+                        current.close()
+                number += 1
+            if conn is not None:
+                conn.close()
+
+        def read(conn: sqlite3.Connection, number: int) -> None:
+            conn.execute(LIST_QUERY).fetchall()
+
+        def write(conn: sqlite3.Connection, number: int) -> None:
+            conn.execute(profile.begin)
+            row_id = number % options['rows'] + 1
+            conn.execute('SELECT views FROM actor WHERE id = ?', (row_id,)).fetchone()
+            conn.execute('UPDATE actor SET views = views + 1 WHERE id = ?', (row_id,))
+            conn.execute('COMMIT')
+
+        threads = [
+            threading.Thread(target=worker, args=(read, 'reads', 'read_errors')) for _ in range(options['readers'])
+        ]
+        threads += [
+            threading.Thread(target=worker, args=(write, 'writes', 'write_errors')) for _ in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return counts
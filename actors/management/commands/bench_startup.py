@@ -0,0 +1,102 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+STEPS = ('setup', 'handler', 'first_request', 'second_request')
+
+
+def parse_importtime(output: str) -> dict[str, float]:
+    """Sum the self time of the modules in `python -X importtime` output per top-level package.
+
+    Returns:
+        dict[str, float]: Seconds spent importing each top-level package, e.g. 'django' or 'debug_toolbar'.
+    """
+    totals = defaultdict(float)
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, _, module = line[len('import time:') :].split('|')
+        totals[module.strip().split('.')[0]] += int(own) / 1_000_000
+    return dict(totals)
+
+
+class Command(BaseCommand):
+    """Measures the boot cost of a worker for each settings profile, to track it across releases.
+
+    Every run starts a fresh interpreter with `python -X importtime -m actors_django.startup`, which times
+    django.setup(), loading the WSGI handler with its middleware, and the first and second request to --path.
+    The command reports the median of every step over --runs runs, and the import time per top-level package.
+    Pass --json to get the figures as one machine-readable object.
+    """
+
+    help = 'Measure django.setup(), import and first-request times of a fresh worker per settings profile.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles',
+            nargs='+',
+            default=['development', 'production'],
+            help='Values of ACTORS_ENV to measure.',
+        )
+        parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters started per profile.')
+        parser.add_argument('--path', default='/', help='URL path requested after boot.')
+        parser.add_argument('--top', type=int, default=12, help='Number of packages listed by import time.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        results = {profile: self.measure(profile, options) for profile in options['profiles']}
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for profile, result in results.items():
+            self.report(profile, result, options['top'])
+
+    def measure(self, profile: str, options: dict) -> dict:
+        environment = {
+            **os.environ,
+            'ACTORS_ENV': profile,
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'actors_django.settings'),
+        }
+        environment.setdefault('ACTORS_SECRET_KEY', 'bench-startup-' + 'x' * 50)
+        environment.setdefault('ACTORS_ALLOWED_HOSTS', 'localhost')
+        if 'ACTORS_REDIS_URL' not in environment:
+            environment.setdefault('ACTORS_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'bench-startup-cache'))
+        timings, imports = defaultdict(list), defaultdict(list)
+        for _ in range(options['runs']):
+            process = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-m', 'actors_django.startup', options['path'], options['path']],
+                cwd=settings.BASE_DIR,
+                env=environment,
+                capture_output=True,
+                text=True,
+            )
+            if process.returncode:
+                raise CommandError(f'The {profile} worker failed to start:\n{process.stderr[-2000:]}')
+            run = json.loads(process.stdout.strip().splitlines()[-1])
+            run['first_request'], run['second_request'] = run['requests']
+            run['status'] = run['statuses'][0]
+            for step in STEPS:
+                timings[step].append(run[step])
+            for package, seconds in parse_importtime(process.stderr).items():
+                imports[package].append(seconds)
+        return {
+            'status': run['status'],
+            'timings': {step: statistics.median(values) for step, values in timings.items()},
+            'imports': {package: statistics.median(values) for package, values in imports.items()},
+        }
+
+    def report(self, profile: str, result: dict, top: int) -> None:
+        timings, imports = result['timings'], result['imports']
+        self.stdout.write(f'{profile} (first response {result["status"]}), medians:')
+        for step in STEPS:
+            self.stdout.write(f'  {step:<16} {timings[step] * 1000:8.1f} ms')
+        self.stdout.write(f'  {"imports":<16} {sum(imports.values()) * 1000:8.1f} ms, slowest packages:')
+        for package, seconds in sorted(imports.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f'    {package:<24} {seconds * 1000:8.1f} ms')
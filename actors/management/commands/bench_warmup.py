@@ -0,0 +1,87 @@
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from actors.loadtest import DEFAULT_MIX, Targets, percentile
+
+SCENARIOS = ('index', 'detail', 'category', 'tag')
+
+
+def first_paths(targets: Targets, count: int, seed: int = 0) -> list[str]:
+    """Pick the paths of a worker's first requests with the load test weights of the public scenarios.
+
+    The same seed gives the same paths, so that the variants are compared on the same requests.
+    """
+    generator = random.Random(seed)
+    choices = {
+        'index': lambda: generator.choice(['/', '/', '/?order=popular']),
+        'detail': lambda: f'/post/{generator.choice(targets.actor_slugs)}',
+        'category': lambda: f'/category/{generator.choice(targets.category_slugs)}',
+        'tag': lambda: f'/tag/{generator.choice(targets.tag_slugs)}',
+    }
+    scenarios = generator.choices(SCENARIOS, weights=[DEFAULT_MIX[name] for name in SCENARIOS], k=count)
+    return [choices[scenario]() for scenario in scenarios]
+
+
+class Command(BaseCommand):
+    """Compares the latency of a fresh worker's first requests with and without actors_django.warmup.
+
+    Every run starts a fresh interpreter with `python -m actors_django.startup`, which boots Django, optionally
+    warms it up, and sends the same --requests requests in turn. For each variant the command reports the median
+    over --runs runs of the warm-up time, the first request and the mean, 90th percentile and slowest of the first
+    requests. Run it against a copy of the production database, with the settings profile of the deployment.
+    """
+
+    help = 'Compare the first-request latency of a fresh worker with and without the warm-up.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help='Number of first requests timed per run.')
+        parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters started per variant.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        targets = Targets.from_database()
+        if not (targets.actor_slugs and targets.category_slugs and targets.tag_slugs):
+            raise CommandError('The database needs published actors with categories and tags to request.')
+        paths = first_paths(targets, options['requests'])
+        results = {
+            variant: self.measure(paths, warm, options['runs']) for variant, warm in (('cold', False), ('warm', True))
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f'First {len(paths)} requests of a fresh worker, medians of {options["runs"]} runs:')
+        self.stdout.write(f'  {"":<6} {"warm-up":>9} {"first":>9} {"mean":>9} {"p90":>9} {"slowest":>9}')
+        for variant, result in results.items():
+            figures = ' '.join(f'{result[key] * 1000:7.1f}ms' for key in ('warm_up', 'first', 'mean', 'p90', 'max'))
+            self.stdout.write(f'  {variant:<6} {figures}')
+
+    @staticmethod
+    def measure(paths: list[str], warm: bool, runs: int) -> dict:
+        arguments = [sys.executable, '-m', 'actors_django.startup', *(['--warm-up'] if warm else []), *paths]
+        environment = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'actors_django.settings'),
+        }
+        figures = {key: [] for key in ('warm_up', 'first', 'mean', 'p90', 'max')}
+        for _ in range(runs):
+            process = subprocess.run(arguments, cwd=settings.BASE_DIR, env=environment, capture_output=True, text=True)
+            if process.returncode:
+                raise CommandError(f'The worker failed:\n{process.stderr[-2000:]}')
+            run = json.loads(process.stdout.strip().splitlines()[-1])
+            failed = [path for path, status in zip(paths, run['statuses']) if status >= 400]
+            if failed:
+                raise CommandError(f'Requests failed: {", ".join(failed)}')
+            latencies = run['requests']
+            figures['warm_up'].append(run['warm_up'])
+            figures['first'].append(latencies[0])
+            figures['mean'].append(statistics.mean(latencies))
+            figures['p90'].append(percentile(sorted(latencies), 90))
+            figures['max'].append(max(latencies))
+        return {key: statistics.median(values) for key, values in figures.items()}
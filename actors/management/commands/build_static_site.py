@@ -0,0 +1,65 @@
+import functools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings
+
+from actors import counters, page_cache
+from actors.static_site import build_page, delete_page, init_worker, plan, read_manifest, snapshot, write_manifest
+
+
+class Command(BaseCommand):
+    """Renders the public pages to plain HTML files, so a front web server can serve them without Python.
+
+    Writes the index and every category and tag list with all their pages, every published actor's page and the
+    about page, each with a .gz (and .br) sibling. A manifest of the actors the build saw is stored alongside;
+    later runs rebuild only the pages of actors whose time_update, category or tags changed since, and delete the
+    pages of actors that were unpublished. Pass --full after changing templates or renaming categories and tags.
+
+    Pages are named by `actors.static_site.page_file`. With nginx, serving STATIC_ROOT under /static/ and
+    proxying everything else that has no file:
+
+        set $page "";
+        if ($arg_page ~ "^[0-9]+$") { set $page ".page-$arg_page"; }
+        location / { gzip_static on; try_files $uri$page.html $uri/index$page.html @django; }
+    """
+
+    help = 'Render the public actor pages to static HTML files, rebuilding only what changed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(settings.STATIC_SITE_ROOT), help='Directory to write the site to.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of rendering processes.')
+        parser.add_argument('--full', action='store_true', help='Rebuild every page, not only the changed ones.')
+
+    def handle(self, *args, **options):
+        output = Path(options['output'])
+        started = time.perf_counter()
+        state = snapshot()
+        pages, stale = plan(state, read_manifest(output), full=options['full'])
+
+        render = functools.partial(build_page, output)
+        if options['workers'] > 1 and len(pages) > 1:
+            # Forked workers must not share the parent's database connections.
+            connections.close_all()
+            chunksize = max(1, len(pages) // (options['workers'] * 4))
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as executor:
+                sizes = list(executor.map(render, pages.keys(), pages.values(), chunksize=chunksize))
+        else:
+            with override_settings(
+                VIEW_COUNTS={**counters.get_config(), 'ENABLED': False},
+                PAGE_CACHE={**page_cache.get_config(), 'ENABLED': False},
+            ):
+                sizes = [render(name, url) for name, url in pages.items()]
+        for name in stale:
+            delete_page(output, name)
+        write_manifest(output, state)
+
+        self.stdout.write(
+            f'Rendered {len(pages)} pages ({sum(sizes) / 1024:.1f} KiB) and deleted {len(stale)} into {output} '
+            f'in {time.perf_counter() - started:.2f}s.'
+        )
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from actors.counters import drain_spool, get_config
+
+
+class Command(BaseCommand):
+    """Applies buffered actor view counts to the database.
+
+    In multi-process deployments the web processes spool their counts to VIEW_COUNTS['SPOOL_DIR'] and this
+    command, run once from cron or continuously with --interval, writes them with one UPDATE per run. Without a
+    spool directory every process writes its own counts and there is nothing for the command to apply.
+    """
+
+    help = 'Apply spooled actor view counts to the database, once or periodically.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0.0, help='Repeat every N seconds instead of once.')
+
+    def handle(self, *args, **options):
+        spool_dir = get_config()['SPOOL_DIR']
+        if not spool_dir:
+            raise CommandError('VIEW_COUNTS["SPOOL_DIR"] is not set, so the web processes write their own counts.')
+        while True:
+            updated = drain_spool(spool_dir)
+            self.stdout.write(f'Updated view counts of {updated} actors.')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from actors.loadtest import DEFAULT_MIX, LoadGenerator, LocalServer, Targets, parse_mix
+
+
+class Command(BaseCommand):
+    """Starts the project under a local server and drives it with a concurrent scenario mix.
+
+    Reports p50/p95/p99 latency, throughput and error rate per route so worker counts can be sized before a deploy.
+    Logged-in scenarios ('edit' and 'login') only run when credentials of an existing user are given.
+    """
+
+    help = 'Run a local concurrent load test and report latency percentiles per route.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interface', choices=('wsgi', 'asgi'), default='wsgi', help='Server interface to use.')
+        parser.add_argument('--url', default='', help='Target an already running server instead of starting one.')
+        parser.add_argument('--concurrency', type=int, default=10, help='Number of concurrent virtual users.')
+        parser.add_argument('--requests', type=int, default=1000, help='Total number of scenarios to run.')
+        parser.add_argument('--duration', type=float, default=0.0, help='Run for N seconds instead of --requests.')
+        parser.add_argument(
+            '--mix',
+            default=','.join(f'{name}={weight}' for name, weight in DEFAULT_MIX.items()),
+            help='Comma separated scenario=weight pairs.',
+        )
+        parser.add_argument('--username', default='', help='User for the edit and login scenarios.')
+        parser.add_argument('--password', default='', help='Password of that user.')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        targets = Targets.from_database(username=options['username'], password=options['password'])
+        server = None
+        if options['url']:
+            base_url = options['url'].rstrip('/')
+        else:
+            server = LocalServer(interface=options['interface'])
+            try:
+                server.start()
+            except RuntimeError as error:
+                raise CommandError(error)
+            base_url = server.base_url
+
+        try:
+            try:
+                generator = LoadGenerator(base_url, targets, mix=mix, concurrency=options['concurrency'])
+            except ValueError as error:
+                raise CommandError(error)
+            self.stdout.write(f'Load testing {base_url} with {options["concurrency"]} users, mix: {generator.mix}')
+            elapsed = generator.run(total_requests=options['requests'], duration=options['duration'])
+        finally:
+            if server:
+                server.stop()
+
+        self.report(generator.stats.summary(elapsed), elapsed)
+
+    def report(self, rows: list[dict], elapsed: float) -> None:
+        header = f'{"route":<30}{"reqs":>8}{"err %":>8}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in rows:
+            self.stdout.write(
+                f'{row["route"]:<30}{row["requests"]:>8}{row["error_rate"] * 100:>8.1f}{row["throughput"]:>9.1f}'
+                f'{row["p50"] * 1000:>9.1f}{row["p95"] * 1000:>9.1f}{row["p99"] * 1000:>9.1f}'
+            )
+        total = sum(row['requests'] for row in rows)
+        self.stdout.write(f'\n{total} requests in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.1f} req/s)')
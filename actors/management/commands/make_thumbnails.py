@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from actors.models import Actor
+from actors.thumbnails import make_thumbnails
+
+
+class Command(BaseCommand):
+    """Makes the missing thumbnails of the actor photos, such as those of photos stored before thumbnails were made
+    on save.
+
+    The admin changelist only reads thumbnails and shows the full-size photo of an actor until its thumbnail exists.
+    """
+
+    help = 'Make the missing thumbnails of the actor photos.'
+
+    def handle(self, *args, **options):
+        made = 0
+        for actor in Actor.objects.exclude(photo='').exclude(photo=None).only('photo').iterator():
+            made += make_thumbnails(actor.photo)
+        self.stdout.write(f'Made {made} thumbnails.')
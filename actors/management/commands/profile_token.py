@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from actors_django.profiling import make_token
+
+
+class Command(BaseCommand):
+    """Prints a signed token that profiles any request sending it in the X-Profile header."""
+
+    help = 'Print a signed X-Profile header value that enables profiling for a request.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(make_token())
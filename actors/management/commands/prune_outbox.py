@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from actors.outbox import prune
+
+
+class Command(BaseCommand):
+    """Deletes change events that every outbox consumer has committed and that are older than RETENTION_DAYS.
+
+    Events are kept until the slowest consumer has read them, so a stopped consumer holds back pruning; delete
+    its actors.OutboxCheckpoint row once it is retired.
+    """
+
+    help = 'Delete old change events that every outbox consumer has already read.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Override CHANGE_OUTBOX["RETENTION_DAYS"].')
+
+    def handle(self, *args, **options):
+        deleted = prune(options['days'])
+        self.stdout.write(f'Deleted {deleted} change events.')
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from actors_django.mail import deliver
+
+
+class Command(BaseCommand):
+    """Delivers the mail queued by the spool email backend.
+
+    Run it once from cron or continuously with --interval when MAIL_SPOOL['DELIVERY_THREAD'] is off, e.g. to send
+    all mail from one process instead of from every web worker.
+    """
+
+    help = 'Deliver the mail queued in MAIL_SPOOL["DIRECTORY"], once or periodically.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0.0, help='Repeat every N seconds instead of once.')
+
+    def handle(self, *args, **options):
+        while True:
+            delivered, failed = deliver()
+            self.stdout.write(f'Delivered {delivered} messages, {failed} failed attempts.')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
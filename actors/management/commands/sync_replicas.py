@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from actors_django.replication import sync_replicas
+from actors_django.routers import get_replicas
+
+
+class Command(BaseCommand):
+    """Keeps local SQLite replica files in sync with the primary database.
+
+    Stands in for real replication when running the read-replica setup on a single machine.
+    """
+
+    help = 'Copy the primary SQLite database over the configured replica files, once or periodically.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0.0, help='Repeat every N seconds instead of once.')
+
+    def handle(self, *args, **options):
+        if not get_replicas():
+            raise CommandError('No DATABASE_REPLICAS are configured.')
+        while True:
+            replicas = sync_replicas()
+            self.stdout.write(f'Synced {", ".join(replicas)}.')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
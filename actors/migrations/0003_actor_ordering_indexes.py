@@ -0,0 +1,31 @@
+# Generated by Django 5.0 on 2026-10-19 03:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actors', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='actor',
+            options={'ordering': ('-time_create', '-id')},
+        ),
+        migrations.AddIndex(
+            model_name='actor',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-time_create', '-id'], name='actor_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='actor',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['category', '-time_create', '-id'], name='actor_category_published_idx'),
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX actor_tags_tag_actor_idx ON actors_actor_tags (tag_id, actor_id);',
+            reverse_sql='DROP INDEX actor_tags_tag_actor_idx;',
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0 on 2026-10-19 04:35
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actors', '0003_actor_ordering_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='actor',
+            index=models.Index(django.db.models.functions.text.Lower('first_name'), name='actor_first_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='actor',
+            index=models.Index(django.db.models.functions.text.Lower('last_name'), name='actor_last_name_lower_idx'),
+        ),
+    ]
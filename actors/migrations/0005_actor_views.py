@@ -0,0 +1,28 @@
+# Generated by Django 5.0 on 2026-10-19 05:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actors', '0004_actor_name_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actor',
+            name='views',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='actor',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-views', '-id'], name='actor_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='actor',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['category', '-views', '-id'], name='actor_category_popular_idx'),
+        ),
+    ]
@@ -1,13 +1,73 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, router, transaction
 from django.db.models import QuerySet
+from django.db.models.functions import Lower
 from django.template.defaultfilters import slugify
 from django.urls import reverse
 
 from .services import cyrillic_to_latin
 
 
-class Category(models.Model):
+class OutboxQuerySet(models.QuerySet):
+    """QuerySet whose bulk writes are recorded in the change outbox, in the same transaction.
+
+    update() locks and reads the ids of the matched rows first, then updates exactly those rows, so every updated
+    row gets an event. Updates touching only the model's `outbox_ignored_fields` are not recorded. bulk_create()
+    records the created rows when the database returns their ids. Deletes go through the deletion collector,
+    which sends the post_delete signal handled in actors.signals.
+    """
+
+    def update(self, **kwargs) -> int:
+        from .outbox import UPDATE_BATCH_SIZE, record_changes
+
+        if set(kwargs) <= set(getattr(self.model, 'outbox_ignored_fields', ())):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            ids = list(self.select_for_update().order_by('pk').values_list('pk', flat=True))
+            updated = 0
+            for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+                batch = ids[start : start + UPDATE_BATCH_SIZE]
+                updated += self.model._base_manager.using(self.db).filter(pk__in=batch).update(**kwargs)
+            record_changes(self.model, ids, ChangeEvent.Action.UPDATE, {'fields': sorted(kwargs)}, using=self.db)
+        return updated
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs) -> list:
+        from .outbox import record_created
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            record_created([obj for obj in objs if obj.pk is not None], using=self.db)
+        return objs
+
+    bulk_create.alters_data = True
+
+
+class OutboxModel(models.Model):
+    """Base for the models whose changes are published through the change outbox.
+
+    save() runs in a transaction together with the post_save handler writing its outbox event, so a change and
+    its event are committed or rolled back together.
+
+    Attributes:
+        outbox_ignored_fields (tuple): Fields whose changes alone are not worth an event.
+    """
+
+    outbox_ignored_fields = ()
+
+    objects = OutboxQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            return super().save(*args, **kwargs)
+
+
+class Category(OutboxModel):
     """Represents a category in the database.
 
     Attributes:
@@ -47,7 +107,7 @@ class Category(models.Model):
         return reverse(viewname='actors:category', kwargs={'category_slug': self.slug})
 
 
-class Tag(models.Model):
+class Tag(OutboxModel):
     """Represents a tag in the database.
 
     Attributes:
@@ -90,7 +150,7 @@ class Tag(models.Model):
         return reverse(viewname='actors:tag', kwargs={'tag_slug': self.slug})
 
 
-class PublishedManager(models.Manager):
+class PublishedManager(models.Manager.from_queryset(OutboxQuerySet)):
     """Custom manager for Actor model to handle published actors specifically.
 
     This manager filters out only published actors. Inherits from Django's base manager class.
@@ -105,7 +165,7 @@ class PublishedManager(models.Manager):
         return super().get_queryset().filter(is_published=Actor.PublishedStatus.PUBLISHED)
 
 
-class Actor(models.Model):
+class Actor(OutboxModel):
     """Represents an actor in the database.
 
     Attributes:
@@ -123,6 +183,7 @@ class Actor(models.Model):
         tags (ManyToManyField): A many-to-many relationship with the Tag model.
         producer (OneToOneField): A one-to-one relationship with the Producer model, optional.
         author (ForeignKey): The author of the actor record, a foreign key relationship with the user model.
+        views (PositiveIntegerField): Number of detail page views, flushed in batches by actors.counters.
         objects (Manager): The default manager including all records.
         published (PublishedManager): A custom manager including published records only.
     """
@@ -157,10 +218,40 @@ class Actor(models.Model):
         on_delete=models.SET_NULL,
         null=True,
     )
+    views = models.PositiveIntegerField(default=0, editable=False)
 
-    objects = models.Manager()
+    objects = OutboxQuerySet.as_manager()
     published = PublishedManager()
 
+    outbox_ignored_fields = ('views',)
+
+    class Meta:
+        ordering = ('-time_create', '-id')
+        indexes = (
+            models.Index(
+                fields=('-time_create', '-id'),
+                condition=models.Q(is_published=True),
+                name='actor_published_idx',
+            ),
+            models.Index(
+                fields=('category', '-time_create', '-id'),
+                condition=models.Q(is_published=True),
+                name='actor_category_published_idx',
+            ),
+            models.Index(
+                fields=('-views', '-id'),
+                condition=models.Q(is_published=True),
+                name='actor_popular_idx',
+            ),
+            models.Index(
+                fields=('category', '-views', '-id'),
+                condition=models.Q(is_published=True),
+                name='actor_category_popular_idx',
+            ),
+            models.Index(Lower('first_name'), name='actor_first_name_lower_idx'),
+            models.Index(Lower('last_name'), name='actor_last_name_lower_idx'),
+        )
+
     def __str__(self):
         """Returns a string representation of the Actor model.
 
@@ -196,7 +287,7 @@ class Actor(models.Model):
         return f'{self.first_name} {self.last_name}'
 
 
-class Producer(models.Model):
+class Producer(OutboxModel):
     """Represents a producer in the database.
 
     Attributes:
@@ -218,3 +309,53 @@ class Producer(models.Model):
             string: A string that includes the first name and last name of the producer.
         """
         return f'{self.first_name} {self.last_name}'
+
+
+class ChangeEvent(models.Model):
+    """One change to an actor, category, tag or producer, written in the same transaction as the change.
+
+    Consumers read the events in id order from their checkpoint on, see actors.outbox.OutboxConsumer.
+
+    Attributes:
+        topic (CharField): Label of the changed model, e.g. 'actors.actor'.
+        object_id (BigIntegerField): Primary key of the changed row.
+        action (CharField): What happened to the row.
+        data (JSONField): For saves, the saved field values; for bulk updates, the updated field names; for tag
+            changes, the tag ids added or removed.
+        time_create (DateTimeField): When the event was written.
+    """
+
+    class Action(models.TextChoices):
+        CREATE = 'create', 'Create'
+        UPDATE = 'update', 'Update'
+        DELETE = 'delete', 'Delete'
+        TAGS = 'tags', 'Tags changed'
+
+    topic = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=Action.choices)
+    data = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    time_create = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = (models.Index(fields=('topic', 'id'), name='changeevent_topic_idx'),)
+
+    def __str__(self):
+        return f'#{self.pk} {self.action} {self.topic} {self.object_id}'
+
+
+class OutboxCheckpoint(models.Model):
+    """The id of the last change event a consumer has processed.
+
+    Attributes:
+        consumer (CharField): Unique name of the consumer.
+        position (BigIntegerField): Id of the last processed ChangeEvent.
+        time_update (DateTimeField): When the checkpoint last moved.
+    """
+
+    consumer = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    time_update = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.consumer} at {self.position}'
@@ -0,0 +1,182 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models import Min
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
+
+from .models import ChangeEvent, OutboxCheckpoint
+
+DEFAULTS = {
+    'BATCH_SIZE': 500,
+    'GAP_TIMEOUT': 30.0,
+    'RETENTION_DAYS': 7,
+}
+
+# Rows updated and events inserted per statement by the bulk paths.
+UPDATE_BATCH_SIZE = 500
+
+
+def get_config() -> dict:
+    return {**DEFAULTS, **getattr(settings, 'CHANGE_OUTBOX', {})}
+
+
+def snapshot(instance: models.Model, fields=None) -> dict:
+    """The concrete field values of an instance, as stored in the database.
+
+    Args:
+        instance (Model): The saved instance.
+        fields (Iterable[str] | None): Names of the fields to include, all of them when None.
+    """
+    values = {}
+    for field in instance._meta.concrete_fields:
+        if fields is not None and field.name not in fields and field.attname not in fields:
+            continue
+        value = field.value_from_object(instance)
+        values[field.attname] = value.name if isinstance(value, FieldFile) else value
+    return values
+
+
+def record_change(instance: models.Model, action: str, data: dict | None = None, using: str | None = None) -> None:
+    """Write one outbox event for a saved or deleted instance.
+
+    Args:
+        instance (Model): The changed instance.
+        action (str): One of ChangeEvent.Action.
+        data (dict | None): Event payload, the snapshot of the instance when None.
+        using (str | None): Database of the change; the event must be written in the same transaction.
+    """
+    ChangeEvent.objects.using(using or instance._state.db or DEFAULT_DB_ALIAS).create(
+        topic=instance._meta.label_lower,
+        object_id=instance.pk,
+        action=action,
+        data=snapshot(instance) if data is None else data,
+    )
+
+
+def record_changes(model: type[models.Model], ids, action: str, data: dict, using: str) -> None:
+    """Write the same outbox event for many rows of a model, in batches."""
+    events = [ChangeEvent(topic=model._meta.label_lower, object_id=pk, action=action, data=data) for pk in ids]
+    ChangeEvent.objects.using(using).bulk_create(events, batch_size=UPDATE_BATCH_SIZE)
+
+
+def record_created(instances: list[models.Model], using: str) -> None:
+    """Write the creation events of bulk-created instances, with their snapshots, in batches."""
+    events = [
+        ChangeEvent(
+            topic=instance._meta.label_lower,
+            object_id=instance.pk,
+            action=ChangeEvent.Action.CREATE,
+            data=snapshot(instance),
+        )
+        for instance in instances
+    ]
+    ChangeEvent.objects.using(using).bulk_create(events, batch_size=UPDATE_BATCH_SIZE)
+
+
+class OutboxConsumer:
+    """Reads change events in order from a named checkpoint, so a consumer only handles what changed since.
+
+    Event ids are allocated when a transaction inserts the event but become visible when it commits, so a
+    transaction committing late can leave a gap below events already visible. A batch therefore stops before the
+    first gap younger than GAP_TIMEOUT seconds; older gaps are ids of rolled back transactions and are skipped.
+
+    Example:
+        consumer = OutboxConsumer('search-index', topics=['actors.actor'])
+        for events in consumer:
+            reindex(events)
+            consumer.commit(events)
+
+    Attributes:
+        name (str): Checkpoint name, unique per consumer.
+        topics (list[str] | None): Model labels to read, all topics when None.
+        batch_size (int): Maximum number of events per batch.
+        gap_timeout (float): Seconds to wait for a missing id before skipping it.
+    """
+
+    def __init__(self, name: str, topics=None, batch_size: int | None = None, gap_timeout: float | None = None) -> None:
+        config = get_config()
+        self.name = name
+        self.topics = list(topics) if topics is not None else None
+        self.batch_size = batch_size or config['BATCH_SIZE']
+        self.gap_timeout = config['GAP_TIMEOUT'] if gap_timeout is None else gap_timeout
+
+    @property
+    def position(self) -> int:
+        """Id of the last event committed by this consumer."""
+        checkpoint = OutboxCheckpoint.objects.filter(consumer=self.name).values_list('position', flat=True).first()
+        return checkpoint or 0
+
+    def poll(self) -> list[ChangeEvent]:
+        """Read the next batch of events after the checkpoint, without moving it.
+
+        Returns:
+            list[ChangeEvent]: Up to batch_size events in id order, empty when the consumer has caught up.
+        """
+        position = self.position
+        # Gaps are looked for over every topic, since ids are shared by all of them.
+        rows = list(
+            ChangeEvent.objects.filter(pk__gt=position)
+            .order_by('pk')
+            .values_list('pk', 'time_create', 'topic')[: self.batch_size]
+        )
+        settled = timezone.now() - timedelta(seconds=self.gap_timeout)
+        ids, expected = [], position + 1
+        for pk, created, topic in rows:
+            # A new consumer starts at the oldest event still kept, whatever its id.
+            if pk != expected and position and created > settled:
+                break
+            expected = pk + 1
+            if self.topics is None or topic in self.topics:
+                ids.append(pk)
+        if not ids:
+            if rows and expected > position + 1:
+                # The whole batch was other topics: move past it so the next poll reads further.
+                self.commit(expected - 1)
+            return []
+        return list(ChangeEvent.objects.filter(pk__in=ids).order_by('pk'))
+
+    def commit(self, events) -> None:
+        """Move the checkpoint past the given events, or to the given position.
+
+        Args:
+            events (list[ChangeEvent] | int): Events that have been processed, or the id of the last one.
+        """
+        if isinstance(events, int):
+            position = events
+        elif events:
+            position = events[-1].pk
+        else:
+            return
+        with transaction.atomic():
+            checkpoint, _ = OutboxCheckpoint.objects.select_for_update().get_or_create(consumer=self.name)
+            if position > checkpoint.position:
+                checkpoint.position = position
+                checkpoint.save(update_fields=('position', 'time_update'))
+
+    def __iter__(self):
+        """Yield batches until the consumer has caught up; commit each batch to advance."""
+        while True:
+            events = self.poll()
+            if not events:
+                return
+            yield events
+            if events[-1].pk > self.position:
+                raise RuntimeError('Commit every batch before reading the next one.')
+
+
+def prune(retention_days: int | None = None) -> int:
+    """Delete the events every consumer has committed that are older than the retention period.
+
+    Returns:
+        int: Number of deleted events.
+    """
+    if retention_days is None:
+        retention_days = get_config()['RETENTION_DAYS']
+    committed = OutboxCheckpoint.objects.aggregate(position=Min('position'))['position']
+    if committed is None:
+        return 0
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    deleted, _ = ChangeEvent.objects.filter(pk__lte=committed, time_create__lt=cutoff).delete()
+    return deleted
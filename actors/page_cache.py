@@ -0,0 +1,161 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+
+from actors_django.metrics import record_cache, registry
+
+logger = logging.getLogger('actors.page_cache')
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'SOFT_TTL': 30,
+    'HARD_TTL': 300,
+    'LOCK_TIMEOUT': 30,
+    'WAIT_TIMEOUT': 5.0,
+    'REFRESH_WORKERS': 2,
+}
+
+# Seconds between two cache reads of a request waiting for another process to store a page.
+POLL_INTERVAL = 0.05
+
+
+def get_config() -> dict:
+    return {**DEFAULTS, **getattr(settings, 'PAGE_CACHE', {})}
+
+
+def page_key(path: str, query: str = '') -> str:
+    """Cache key of a page; the path and query string are hashed, since cache backends restrict key characters."""
+    return 'page:' + hashlib.sha1(f'{path}?{query}'.encode()).hexdigest()
+
+
+class PageCache:
+    """Caches rendered pages with a soft and a hard TTL, and renders each page at most once at a time.
+
+    A page younger than SOFT_TTL is served as it is. Between SOFT_TTL and HARD_TTL, when the cache backend drops
+    it, the stale page is still served while one refresh renders it again on a background thread. On a miss, the
+    first request renders the page and concurrent requests for it wait for that render instead of querying the
+    database too: within a process they wait on the leader's future, across processes the leader holds a lock
+    added to the cache and the others poll the cache for its page for up to WAIT_TIMEOUT seconds. A request that
+    waited that long renders the page itself.
+
+    Pages are stored as (fresh until, content, content type) tuples.
+    """
+
+    def __init__(self) -> None:
+        self._reset()
+        # A process forked after a warm-up must not inherit the parent's locks, pending renders or pool threads.
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._rendering = {}
+        self._refreshing = set()
+        self._executor = None
+
+    def get(self, key: str, render, view: str = '') -> tuple[bytes, str]:
+        """Return a page from the cache, rendering it when it is missing.
+
+        Args:
+            key (str): Cache key of the page, from page_key().
+            render (Callable[[], tuple[bytes, str]]): Renders the page as its content and content type. It may be
+                called on a background thread after the request is over.
+            view (str): URL name of the page, used as a metric label.
+
+        Returns:
+            tuple[bytes, str]: Content and content type of the page.
+        """
+        config = get_config()
+        entry = caches[config['CACHE']].get(key)
+        record_cache('page', entry is not None)
+        if entry is None:
+            return self._fill(key, render, config, view)
+        fresh_until, content, content_type = entry
+        if time.time() >= fresh_until:
+            registry.inc('page_cache_stale_total', (('view', view),))
+            self._refresh_later(key, render, config)
+        return content, content_type
+
+    def store(self, key: str, page: tuple[bytes, str], config: dict) -> tuple[bytes, str]:
+        content, content_type = page
+        entry = (time.time() + config['SOFT_TTL'], content, content_type)
+        caches[config['CACHE']].set(key, entry, config['HARD_TTL'])
+        return page
+
+    def _fill(self, key: str, render, config: dict, view: str) -> tuple[bytes, str]:
+        with self._lock:
+            future = self._rendering.get(key)
+            leader = future is None
+            if leader:
+                future = self._rendering[key] = Future()
+        if not leader:
+            registry.inc('page_cache_coalesced_total', (('scope', 'process'), ('view', view)))
+            try:
+                return future.result(timeout=config['WAIT_TIMEOUT'])
+            except FutureTimeoutError:
+                return render()
+        try:
+            page = self._fill_locked(key, render, config, view)
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(page)
+            return page
+        finally:
+            with self._lock:
+                del self._rendering[key]
+
+    def _fill_locked(self, key: str, render, config: dict, view: str) -> tuple[bytes, str]:
+        cache = caches[config['CACHE']]
+        lock = f'{key}:lock'
+        if cache.add(lock, 1, config['LOCK_TIMEOUT']):
+            try:
+                return self.store(key, render(), config)
+            finally:
+                cache.delete(lock)
+        # Another process is rendering the page.
+        registry.inc('page_cache_coalesced_total', (('scope', 'cache'), ('view', view)))
+        deadline = time.monotonic() + config['WAIT_TIMEOUT']
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[1], entry[2]
+        return self.store(key, render(), config)
+
+    def _refresh_later(self, key: str, render, config: dict) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(config['REFRESH_WORKERS'], thread_name_prefix='page-cache')
+        # The lock is shared with misses, so one refresh runs across all processes.
+        if not caches[config['CACHE']].add(f'{key}:lock', 1, config['LOCK_TIMEOUT']):
+            with self._lock:
+                self._refreshing.discard(key)
+            return
+        self._executor.submit(self._refresh, key, render, config)
+
+    def _refresh(self, key: str, render, config: dict) -> None:
+        try:
+            self.store(key, render(), config)
+        except Exception:
+            logger.exception('Failed to refresh cached page %s', key)
+        finally:
+            caches[config['CACHE']].delete(f'{key}:lock')
+            with self._lock:
+                self._refreshing.discard(key)
+            close_old_connections()
+
+
+page_cache = PageCache()
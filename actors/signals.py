@@ -0,0 +1,113 @@
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .facets import evict_facets
+from .models import Actor, Category, ChangeEvent, Producer, Tag
+from .outbox import record_change, record_changes, snapshot
+from .thumbnails import make_thumbnails
+from .utils import evict_sidebar
+
+TRACKED_MODELS = (Actor, Category, Tag, Producer)
+
+
+@receiver(post_save, sender=Actor)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Producer)
+def record_save(sender, instance, created, update_fields=None, using=None, **kwargs):
+    """Record a saved row; OutboxModel.save() runs this inside the transaction of the save."""
+    if update_fields is not None and set(update_fields) <= set(sender.outbox_ignored_fields):
+        return
+    action = ChangeEvent.Action.CREATE if created else ChangeEvent.Action.UPDATE
+    record_change(instance, action, snapshot(instance, update_fields), using=using)
+
+
+@receiver(post_delete, sender=Actor)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Producer)
+def record_delete(sender, instance, using=None, **kwargs):
+    """Record a deleted row; the deletion collector sends post_delete inside its transaction."""
+    record_change(instance, ChangeEvent.Action.DELETE, {}, using=using)
+
+
+@receiver(pre_delete, sender=Producer)
+@receiver(pre_delete, sender=get_user_model())
+def record_set_null(sender, instance, using=None, **kwargs):
+    """Record the tracked rows whose foreign key to a row being deleted is about to be set to NULL.
+
+    The deletion collector sets them with a bulk UPDATE that sends no signal, in the same transaction.
+    """
+    for relation in sender._meta.related_objects:
+        if relation.related_model not in TRACKED_MODELS or relation.on_delete is not models.SET_NULL:
+            continue
+        rows = relation.related_model._base_manager.using(using).filter(**{relation.field.name: instance.pk})
+        ids = list(rows.values_list('pk', flat=True))
+        record_changes(relation.related_model, ids, ChangeEvent.Action.UPDATE, {'fields': [relation.field.name]}, using)
+
+
+@receiver(m2m_changed, sender=Actor.tags.through)
+def record_tags(sender, instance, action, reverse, model, pk_set, using=None, **kwargs):
+    """Record added, removed or cleared actor tags, from either side of the relation.
+
+    The related manager sends m2m_changed inside the transaction of the change. Clears are recorded before they
+    happen, while the removed tags can still be read.
+    """
+    changes = {'post_add': 'add', 'post_remove': 'remove', 'pre_clear': 'remove'}
+    if action not in changes:
+        return
+    if action == 'pre_clear':
+        related = instance.actors if reverse else instance.tags
+        pk_set = set(related.using(using).values_list('pk', flat=True))
+    if not pk_set:
+        return
+    if reverse:
+        # Actors were added to or removed from a tag: one event per actor.
+        record_changes(Actor, sorted(pk_set), ChangeEvent.Action.TAGS, {changes[action]: [instance.pk]}, using)
+    else:
+        record_change(instance, ChangeEvent.Action.TAGS, {changes[action]: sorted(pk_set)}, using=using)
+
+
+@receiver(post_save, sender=Actor)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Actor)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+@receiver(m2m_changed, sender=Actor.tags.through)
+def evict_cached_sidebar(sender, update_fields=None, using=None, **kwargs):
+    """Drop the cached sidebar when a change may alter its categories, tags or their actor counts.
+
+    The eviction waits for the commit, so that no request caches it again from the data before the change.
+    """
+    if update_fields is not None and set(update_fields) <= set(Actor.outbox_ignored_fields):
+        return
+    transaction.on_commit(evict_sidebar, using=using)
+
+
+@receiver(post_save, sender=Actor)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Actor)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+@receiver(m2m_changed, sender=Actor.tags.through)
+def evict_cached_facets(sender, update_fields=None, using=None, **kwargs):
+    """Start a new generation of cached facet counts when a change may alter them, once it is committed."""
+    if update_fields is not None and set(update_fields) <= set(Actor.outbox_ignored_fields):
+        return
+    transaction.on_commit(evict_facets, using=using)
+
+
+@receiver(post_save, sender=Actor)
+def make_photo_thumbnails(sender, instance, update_fields=None, using=None, **kwargs):
+    """Make the thumbnails of an actor's photo, so that the admin changelist only has to read them.
+
+    They are made once the save is committed, keeping the resizing out of the transaction and its write lock.
+    """
+    if not instance.photo or (update_fields is not None and 'photo' not in update_fields):
+        return
+    photo = instance.photo
+    transaction.on_commit(lambda: make_thumbnails(photo), using=using)
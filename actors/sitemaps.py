@@ -0,0 +1,159 @@
+import hashlib
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, Max
+from django.urls import reverse
+
+from .models import Actor, Category, Tag
+
+DEFAULTS = {
+    'SHARD_SIZE': 50_000,
+    'CHUNK_SIZE': 2_000,
+    'CACHE_DIR': None,
+}
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET_START = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_END = '</urlset>\n'
+INDEX_START = '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+INDEX_END = '</sitemapindex>\n'
+
+
+def get_config() -> dict:
+    return {**DEFAULTS, **getattr(settings, 'SITEMAPS', {})}
+
+
+def url_entry(location: str, lastmod: datetime | None, tag: str = 'url') -> str:
+    lastmod = f'<lastmod>{lastmod.isoformat(timespec="seconds")}</lastmod>' if lastmod else ''
+    return f'<{tag}><loc>{escape(location)}</loc>{lastmod}</{tag}>\n'
+
+
+def shard_range(shard: int, size: int) -> tuple[int, int]:
+    """First and last actor id of a shard; shard n holds the published actors with ids n*size+1 to (n+1)*size."""
+    return shard * size + 1, (shard + 1) * size
+
+
+def actor_shards(size: int) -> list[tuple[int, int, datetime]]:
+    """Number and last modification of every non-empty actor shard, with one aggregate query.
+
+    Returns:
+        list[tuple[int, int, datetime]]: (shard, published actors, latest time_update) per shard.
+    """
+    rows = (
+        Actor.published.annotate(shard=(F('pk') - 1) / size)
+        .values('shard')
+        .annotate(total=Count('pk'), lastmod=Max('time_update'))
+        .order_by('shard')
+    )
+    return [(row['shard'], row['total'], row['lastmod']) for row in rows]
+
+
+def shard_signature(shard: int, size: int) -> str | None:
+    """Fingerprint of a shard's id range that changes whenever an actor in it is added, saved or unpublished.
+
+    Returns:
+        str | None: The fingerprint, or None when the shard holds no published actor.
+    """
+    first, last = shard_range(shard, size)
+    stats = Actor.published.filter(pk__range=(first, last)).aggregate(total=Count('pk'), lastmod=Max('time_update'))
+    if not stats['total']:
+        return None
+    return hashlib.sha1(f'{stats["total"]}:{stats["lastmod"].isoformat()}'.encode()).hexdigest()[:16]
+
+
+def iter_actor_urls(shard: int, size: int, chunk_size: int, base_url: str):
+    """Yield the <url> entries of a shard, reading it in keyset-paginated chunks so memory stays constant.
+
+    Args:
+        shard (int): Shard number.
+        size (int): SHARD_SIZE.
+        chunk_size (int): Rows fetched per query.
+        base_url (str): Scheme and host prefixed to every path.
+    """
+    first, last = shard_range(shard, size)
+    # Reverse once; the per-row reverse() would cost more than the rest of the rendering.
+    path = reverse('actors:post', kwargs={'slug': 'SLUG'}).replace('SLUG', '{slug}')
+    queryset = Actor.published.order_by('pk').values_list('pk', 'slug', 'time_update')
+    cursor = first - 1
+    while True:
+        rows = list(queryset.filter(pk__gt=cursor, pk__lte=last)[:chunk_size])
+        if not rows:
+            return
+        yield ''.join(url_entry(base_url + path.format(slug=slug), updated) for _, slug, updated in rows)
+        cursor = rows[-1][0]
+
+
+def render_actor_shard(shard: int, size: int, chunk_size: int, base_url: str):
+    """Yield the whole sitemap document of an actor shard in chunks."""
+    yield XML_HEADER + URLSET_START
+    yield from iter_actor_urls(shard, size, chunk_size, base_url)
+    yield URLSET_END
+
+
+def cached_actor_shard(shard: int, base_url: str):
+    """The sitemap of an actor shard, from the cache directory when its id range is unchanged since it was written.
+
+    Returns:
+        Path | Iterator[str] | None: The cached file, or a generator rendering the shard, which stores it in
+            CACHE_DIR once it has been fully consumed. None when the shard is empty.
+    """
+    config = get_config()
+    size = config['SHARD_SIZE']
+    signature = shard_signature(shard, size)
+    if signature is None:
+        return None
+    chunks = render_actor_shard(shard, size, config['CHUNK_SIZE'], base_url)
+    if not config['CACHE_DIR']:
+        return chunks
+    directory = Path(config['CACHE_DIR'])
+    # The host is part of the content, so it is part of the name too.
+    host = hashlib.sha1(base_url.encode()).hexdigest()[:8]
+    path = directory / f'actors-{host}-{shard}-{signature}.xml'
+    if path.exists():
+        return path
+    return store_chunks(chunks, path, f'actors-{host}-{shard}-*.xml')
+
+
+def store_chunks(chunks, path: Path, pattern: str):
+    """Pass chunks through while writing them to `path`, replacing older files matching `pattern` at the end.
+
+    Nothing is stored when the consumer stops early, e.g. because the client disconnected.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f'.{path.name}.{os.getpid()}-{uuid.uuid4().hex}.tmp')
+    try:
+        with temporary.open('w', encoding='utf-8') as file:
+            for chunk in chunks:
+                file.write(chunk)
+                yield chunk
+        for old in path.parent.glob(pattern):
+            old.unlink(missing_ok=True)
+        os.replace(temporary, path)
+    finally:
+        temporary.unlink(missing_ok=True)
+
+
+def render_index(base_url: str) -> str:
+    """The sitemap index: one entry per non-empty actor shard, plus the category and tag sitemaps."""
+    size = get_config()['SHARD_SIZE']
+    entries = [
+        url_entry(base_url + reverse('actors:sitemap_actors', kwargs={'shard': shard}), lastmod, tag='sitemap')
+        for shard, _, lastmod in actor_shards(size)
+    ]
+    for section in ('categories', 'tags'):
+        location = base_url + reverse('actors:sitemap_section', kwargs={'section': section})
+        entries.append(url_entry(location, None, tag='sitemap'))
+    return XML_HEADER + INDEX_START + ''.join(entries) + INDEX_END
+
+
+def render_section(section: str, base_url: str) -> str:
+    """The sitemap of the category or tag lists that have published actors, dated by their latest actor."""
+    model = Category if section == 'categories' else Tag
+    rows = model.objects.filter(actors__is_published=True).annotate(lastmod=Max('actors__time_update')).order_by('pk')
+    entries = [url_entry(base_url + obj.get_absolute_url(), obj.lastmod) for obj in rows]
+    return XML_HEADER + URLSET_START + ''.join(entries) + URLSET_END
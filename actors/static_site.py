@@ -0,0 +1,243 @@
+import json
+import math
+import os
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpRequest, QueryDict
+
+MANIFEST_NAME = '.build-manifest.json'
+MANIFEST_VERSION = 2
+
+
+def page_file(path: str, number: int = 1) -> str:
+    """Name of the file a page is written to, relative to the output directory.
+
+    '/' becomes 'index.html', '/about/' 'about/index.html' and '/category/men' 'category/men.html'; later pages of
+    a list get a '.page-N' suffix, e.g. 'category/men.page-2.html' for '/category/men?page=2'.
+    """
+    name = path.lstrip('/')
+    if not name or name.endswith('/'):
+        name += 'index'
+    if number > 1:
+        name += f'.page-{number}'
+    return name + '.html'
+
+
+def page_url(path: str, number: int = 1) -> str:
+    return f'{path}?page={number}' if number > 1 else path
+
+
+def snapshot() -> dict:
+    """Read what the public pages depend on: every published actor, the sidebar entries and the facet counts.
+
+    Returns:
+        dict: 'actors' maps actor ids to their slug, category and tag slugs and time_update; 'sidebar' lists the
+            categories and tags shown on every page; 'facets' maps the path of every category and tag list to
+            the actor counts its sidebar shows, by category and by tag pk.
+    """
+    from django.urls import reverse
+
+    from .facets import CATEGORY, TAG, count_facets
+    from .models import Actor
+    from .utils import sidebar_categories, sidebar_tags
+
+    actors = {}
+    for pk, slug, category, updated in Actor.published.values_list('pk', 'slug', 'category__slug', 'time_update'):
+        actors[str(pk)] = {'slug': slug, 'category': category, 'tags': [], 'updated': updated.isoformat()}
+    tagged = Actor.tags.through.objects.filter(actor__in=Actor.published.all()).order_by('tag__slug')
+    for pk, tag in tagged.values_list('actor_id', 'tag__slug'):
+        actors[str(pk)]['tags'].append(tag)
+    sidebar = [
+        *(['category', slug, name] for slug, name in sidebar_categories().order_by('pk').values_list('slug', 'name')),
+        *(['tag', slug, name] for slug, name in sidebar_tags().order_by('pk').values_list('slug', 'name')),
+    ]
+    listed = {CATEGORY: set(), TAG: set()}
+    for actor in actors.values():
+        listed[CATEGORY].add(actor['category'])
+        listed[TAG].update(actor['tags'])
+    facets = {}
+    for pk, slug in sidebar_categories().filter(slug__in=listed[CATEGORY]).values_list('pk', 'slug'):
+        path = reverse('actors:category', kwargs={'category_slug': slug})
+        facets[path] = json_counts(count_facets(pk, ()))
+    for pk, slug in sidebar_tags().filter(slug__in=listed[TAG]).values_list('pk', 'slug'):
+        facets[reverse('actors:tag', kwargs={'tag_slug': slug})] = json_counts(count_facets(None, (pk,)))
+    return {'version': MANIFEST_VERSION, 'actors': actors, 'sidebar': sidebar, 'facets': facets}
+
+
+def json_counts(counts: dict[str, dict[int, int]]) -> dict[str, dict[str, int]]:
+    """Key facet counts by string pks, as they read back from the manifest."""
+    return {kind: {str(pk): total for pk, total in sorted(totals.items())} for kind, totals in counts.items()}
+
+
+def listing_paths(actor: dict) -> set[str]:
+    """Paths of the lists an actor appears on."""
+    from django.urls import reverse
+
+    paths = {reverse('actors:index')}
+    if actor['category']:
+        paths.add(reverse('actors:category', kwargs={'category_slug': actor['category']}))
+    paths.update(reverse('actors:tag', kwargs={'tag_slug': tag}) for tag in actor['tags'])
+    return paths
+
+
+def all_pages(state: dict) -> dict[str, str]:
+    """Every public page of a snapshot, as a mapping of file name to URL."""
+    from django.urls import reverse
+
+    from .views import IndexListView
+
+    counts = Counter(path for actor in state['actors'].values() for path in listing_paths(actor))
+    counts[reverse('actors:index')] += 0
+    pages = {page_file(reverse('actors:about')): reverse('actors:about')}
+    for path, count in counts.items():
+        for number in range(1, max(1, math.ceil(count / IndexListView.paginate_by)) + 1):
+            pages[page_file(path, number)] = page_url(path, number)
+    for actor in state['actors'].values():
+        path = reverse('actors:post', kwargs={'slug': actor['slug']})
+        pages[page_file(path)] = path
+    return pages
+
+
+def plan(state: dict, previous: dict | None, full: bool = False) -> tuple[dict[str, str], list[str]]:
+    """Work out which pages to render and which files to delete since the previous build.
+
+    Everything is rebuilt when asked to, when there is no usable previous manifest or when the sidebar changed,
+    since it is on every page. Otherwise only the pages of actors whose time_update, category or tags changed are
+    rendered, together with every page of the lists they were or are on, because one new or removed actor shifts
+    the whole list, and every page of the lists whose facet counts changed.
+
+    Args:
+        state (dict): Current snapshot.
+        previous (dict | None): Snapshot stored by the previous build.
+        full (bool): Rebuild every page.
+
+    Returns:
+        tuple[dict[str, str], list[str]]: Pages to render as file name to URL, and files to delete.
+    """
+    pages = all_pages(state)
+    if not previous or previous.get('version') != MANIFEST_VERSION:
+        return pages, []
+    stale = sorted(set(all_pages(previous)) - set(pages))
+    if full or previous['sidebar'] != state['sidebar']:
+        return pages, stale
+
+    from django.urls import reverse
+
+    current, old = state['actors'], previous['actors']
+    affected = set()
+    for pk in current.keys() | old.keys():
+        if current.get(pk) == old.get(pk):
+            continue
+        for actor in filter(None, (current.get(pk), old.get(pk))):
+            affected |= listing_paths(actor)
+        if pk in current:
+            affected.add(reverse('actors:post', kwargs={'slug': current[pk]['slug']}))
+    facets, old_facets = state['facets'], previous['facets']
+    affected.update(path for path in facets if facets[path] != old_facets.get(path))
+    return {name: url for name, url in pages.items() if url.split('?')[0] in affected}, stale
+
+
+def read_manifest(output: Path) -> dict | None:
+    try:
+        return json.loads((output / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def write_file(path: Path, content: bytes) -> None:
+    """Atomically replace a file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    temporary.write_bytes(content)
+    os.replace(temporary, path)
+
+
+def write_manifest(output: Path, state: dict) -> None:
+    write_file(output / MANIFEST_NAME, json.dumps(state).encode())
+
+
+def delete_page(output: Path, name: str) -> None:
+    from actors_django.staticfiles import ENCODINGS
+
+    for suffix in ('', *(suffix for _, suffix in ENCODINGS)):
+        (output / (name + suffix)).unlink(missing_ok=True)
+
+
+def init_worker() -> None:
+    """Prepare a pool process to render pages: set Django up under spawn, never count the rendered views and never
+    render them from the page cache."""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'actors_django.settings')
+        django.setup()
+    settings.VIEW_COUNTS = {**getattr(settings, 'VIEW_COUNTS', {}), 'ENABLED': False}
+    settings.PAGE_CACHE = {**getattr(settings, 'PAGE_CACHE', {}), 'ENABLED': False}
+
+
+def anonymous_request(url: str) -> HttpRequest:
+    """Build a GET request for `url` from an anonymous visitor, resolved but not passed through the middleware."""
+    from django.contrib.auth.models import AnonymousUser
+    from django.urls import resolve
+
+    path, _, query = url.partition('?')
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.GET = QueryDict(query)
+    request.META = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SERVER_NAME': 'localhost'}
+    request.user = AnonymousUser()
+
+    async def auser():
+        return request.user
+
+    request.auser = auser
+    request.resolver_match = resolve(path)
+    return request
+
+
+def call_view(request: HttpRequest):
+    """Call the view a request resolved to and return its rendered response.
+
+    An async view is run with async_to_sync, so its queries go back to this thread and its database connection.
+    """
+    from asgiref.sync import async_to_sync, iscoroutinefunction
+
+    match = request.resolver_match
+    view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+    response = view(request, *match.args, **match.kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def render_page(url: str) -> bytes:
+    """Render a public page as an anonymous visitor, calling the view directly without the middleware."""
+    from actors_django.compression import get_config, minify_html
+
+    response = call_view(anonymous_request(url))
+    if response.status_code != 200:
+        raise ValueError(f'{url} returned {response.status_code}')
+    return minify_html(response.content) if get_config()['MINIFY_HTML'] else response.content
+
+
+def build_page(output: Path, name: str, url: str) -> int:
+    """Render one page into the output directory with its precompressed siblings.
+
+    Returns:
+        int: Size of the written page in bytes.
+    """
+    from actors_django.staticfiles import ENCODINGS, compress
+
+    content = render_page(url)
+    write_file(output / name, content)
+    variants = compress(content)
+    for _, suffix in ENCODINGS:
+        if suffix in variants:
+            write_file(output / (name + suffix), variants[suffix])
+        else:
+            (output / (name + suffix)).unlink(missing_ok=True)
+    return len(content)
@@ -1,18 +1,21 @@
 from django import template
-from django.db.models import Count
 
-from actors.models import Category, Tag
+from actors.utils import cached_sidebar
 
 register = template.Library()
 
 
-@register.inclusion_tag(filename='actors/includes/list_categories.html')
-def show_categories(category_selected=0):
-    categories = Category.objects.annotate(total=Count('actors')).filter(total__gt=0)
+@register.inclusion_tag(filename='actors/includes/list_categories.html', takes_context=True)
+def show_categories(context, category_selected=0):
+    categories = context.get('sidebar_categories')
+    if categories is None:
+        categories = cached_sidebar()['sidebar_categories']
     return {'categories': categories, 'category_selected': category_selected}
 
 
-@register.inclusion_tag(filename='actors/includes/list_tags.html')
-def show_tags(tags_selected=0):
-    tags = Tag.objects.annotate(total=Count('actors')).filter(total__gt=0)
+@register.inclusion_tag(filename='actors/includes/list_tags.html', takes_context=True)
+def show_tags(context, tags_selected=0):
+    tags = context.get('sidebar_tags')
+    if tags is None:
+        tags = cached_sidebar()['sidebar_tags']
     return {'tags': tags, 'tags_selected': tags_selected}
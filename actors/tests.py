@@ -1,3 +1,1292 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.templatetags.static import static
+from django.test import AsyncRequestFactory, LiveServerTestCase, RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from actors_django.compression import minify_html
+from actors_django.instrumentation import QueryBudgetExceeded, fingerprint
+from actors_django.metrics import MetricsRegistry, registry
+from actors_django.middleware import (
+    CompressionMiddleware,
+    PrimaryPinningMiddleware,
+    RequestTimingMiddleware,
+    StaticAssetsMiddleware,
+)
+from actors_django.profiling import RequestProfiler, make_token
+from actors_django.replication import sync_sqlite
+from actors_django.routers import ReplicaRouter, primary_pinned, primary_written
+from actors_django.sqlite3.base import DatabaseWrapper
+from actors_django.staticfiles import minify_css
+from actors_django.throttle import memory_store
+from actors_django.warmup import warm_up
+
+from .admin import ActorAdmin
+from .counters import ViewCounter, drain_spool, view_counter, write_spool
+from .facets import count_facets, facet_counts
+from .loadtest import DEFAULT_MIX, HttpClient, LoadGenerator, RouteStats, Targets, parse_mix, percentile
+from .management.commands.bench_asgi import use_async_views
+from .management.commands.bench_startup import parse_importtime
+from .models import Actor, Category, ChangeEvent, Producer, Tag
+from .outbox import OutboxConsumer, prune
+from .page_cache import PageCache
+from .page_cache import get_config as get_page_cache_config
+from .page_cache import page_key
+from .views import (
+    AsyncActorDetailView,
+    AsyncCategoryListView,
+    AsyncIndexListView,
+    CategoryListView,
+    IndexListView,
+    TagListView,
+)
+
+
+class ActorTestData:
+    """Creates a small published catalogue shared by the test cases."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='editor', email='editor@gmail.com', password='pass')
+        cls.category = Category.objects.create(name='Men')
+        cls.tag = Tag.objects.create(name='Film icons')
+        cls.actors = []
+        for number in range(12):
+            actor = Actor.objects.create(
+                first_name=f'First{number}',
+                last_name=f'Last{number}',
+                category=cls.category,
+                author=cls.user,
+                is_published=Actor.PublishedStatus.PUBLISHED,
+            )
+            actor.tags.add(cls.tag)
+            cls.actors.append(actor)
+
+
+class LoadTestHelpersTest(SimpleTestCase):
+    """The load test parses its scenario mix and the raw responses it reads, and aggregates latencies per route."""
+
+    def test_percentile_uses_nearest_rank(self):
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual([percentile(values, percent) for percent in (50, 95, 99, 100)], [50.0, 95.0, 99.0, 100.0])
+        self.assertEqual(percentile([0.5], 99), 0.5)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix('index=50, detail=0,'), {'index': 50, 'detail': 0})
+        with self.assertRaisesRegex(ValueError, 'Unknown scenario "search"'):
+            parse_mix('search=1')
+        with self.assertRaisesRegex(ValueError, 'non-negative integer'):
+            parse_mix('index=-1')
+        with self.assertRaises(CommandError):
+            call_command('loadtest', '--mix', 'index=x')
+
+    def test_client_keeps_and_drops_cookies(self):
+        client = HttpClient('http://localhost:8000')
+        raw = (
+            b'HTTP/1.1 302 Found\r\nLocation: /\r\nSet-Cookie: sessionid=abc; Path=/\r\n'
+            b'Set-Cookie: csrftoken=""; Max-Age=0; Path=/\r\n\r\nbody'
+        )
+        response = client._parse(raw)
+        self.assertEqual((response.status, response.headers['location'], response.body), (302, '/', b'body'))
+        self.assertEqual(len(response.cookies), 2)
+
+        async def serve(reader, writer):
+            await reader.readuntil(b'\r\n\r\n')
+            writer.write(raw)
+            await writer.drain()
+            writer.close()
+
+        async def request():
+            server = await asyncio.start_server(serve, '127.0.0.1', 0)
+            async with server:
+                client.port = server.sockets[0].getsockname()[1]
+                client.cookies = {'csrftoken': 'old'}
+                return await client.request('GET', '/')
+
+        self.assertEqual(asyncio.run(request()).status, 302)
+        self.assertEqual(client.cookies, {'sessionid': 'abc'})
+
+    def test_scenarios_without_targets_are_left_out_of_the_mix(self):
+        targets = Targets(actor_slugs=['tom-hanks'], category_slugs=[], tag_slugs=['oscar'], edit_payloads={})
+        generator = LoadGenerator('http://localhost', targets, mix={**DEFAULT_MIX, 'tag': 0})
+        self.assertEqual(generator.mix, {'index': 40, 'detail': 25})
+        with self.assertRaisesRegex(ValueError, 'None of the requested scenarios'):
+            LoadGenerator('http://localhost', targets, mix={'login': 1, 'category': 1})
+
+    def test_summary_per_route(self):
+        stats = RouteStats()
+        for seconds in (0.1, 0.2, 0.3, 0.4):
+            stats.record('actors:index', seconds, ok=seconds < 0.4)
+        [row] = stats.summary(elapsed=2.0)
+        self.assertEqual((row['route'], row['requests'], row['errors']), ('actors:index', 4, 1))
+        self.assertEqual(row['error_rate'], 0.25)
+        self.assertEqual((row['throughput'], row['p50'], row['p99']), (2.0, 0.2, 0.4))
+
+
+class LoadTestTest(ActorTestData, LiveServerTestCase):
+    """The load test drives a running server through every scenario, logged-in ones included."""
+
+    def setUp(self):
+        self.setUpTestData()
+        memory_store.clear()
+
+    def test_scenarios_run_without_errors(self):
+        targets = Targets.from_database(username='editor', password='pass')
+        self.assertEqual(targets.category_slugs, [self.category.slug])
+        self.assertEqual(targets.edit_payloads[self.actors[0].slug]['tags'], [self.tag.pk])
+        generator = LoadGenerator(self.live_server_url, targets, mix=DEFAULT_MIX, concurrency=1)
+        generator.run(total_requests=20)
+        generator.mix = {'edit': 1}
+        elapsed = generator.run(total_requests=2)
+        rows = {row['route']: row for row in generator.stats.summary(elapsed)}
+        self.assertLessEqual(
+            {'users:login [GET]', 'users:login [POST]', 'actors:update_actor [GET]', 'actors:update_actor [POST]'},
+            set(rows),
+        )
+        self.assertEqual({route: row['errors'] for route, row in rows.items() if row['errors']}, {})
+
+    def test_command_reports_every_route(self):
+        out = io.StringIO()
+        # One user: the live server shares its in-memory database connection, and so its query counts, between threads.
+        arguments = ['--url', self.live_server_url, '--requests', '4', '--concurrency', '1', '--mix', 'index=1']
+        call_command('loadtest', *arguments, stdout=out)
+        self.assertRegex(out.getvalue(), r'\nactors:index +4 +0\.0 ')
+        self.assertIn('\n4 requests in ', out.getvalue())
+
+    @mock.patch('actors.management.commands.loadtest.LocalServer')
+    def test_command_stops_the_server_when_no_scenario_can_run(self, local_server):
+        local_server.return_value.base_url = self.live_server_url
+        with self.assertRaisesMessage(CommandError, 'None of the requested scenarios'):
+            call_command('loadtest', '--mix', 'edit=1', stdout=io.StringIO())
+        local_server.return_value.stop.assert_called_once_with()
+
+
+class RequestTimingTest(ActorTestData, TestCase):
+    """Every request reports its DB and template time in a Server-Timing header and one log line."""
+
+    def test_header_and_log_line_agree(self):
+        with self.assertLogs('actors_django.timing', 'INFO') as logs:
+            response = self.client.get(reverse('actors:index'))
+        match = re.fullmatch(
+            r'db;dur=[\d.]+;desc="(\d+) queries", tpl;dur=([\d.]+), total;dur=[\d.]+', response['Server-Timing']
+        )
+        self.assertIsNotNone(match, response['Server-Timing'])
+        [record] = logs.records
+        self.assertEqual(record.timing['db_queries'], int(match[1]))
+        self.assertGreater(record.timing['db_queries'], 0)
+        self.assertEqual(record.timing['template_ms'], float(match[2]))
+        self.assertTrue(record.getMessage().startswith('method=GET path=/ view=actors:index status=200 db_queries='))
+
+    @override_settings(REQUEST_TIMING={'HEADER': False, 'SLOW_REQUEST_MS': 0, 'QUERY_LIMIT': 1})
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertLogs('actors_django.timing', 'INFO') as logs:
+            response = self.client.get(reverse('actors:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        line, slow = logs.records
+        self.assertEqual(slow.name, 'actors_django.timing.slow')
+        self.assertEqual(slow.timing, line.timing)
+        self.assertRegex(slow.getMessage(), r'^Slow request GET / took [\d.]+ms with \d+ queries:\n\[default\] ')
+        self.assertEqual(slow.getMessage().count('[default]'), 1, 'the SQL is kept for QUERY_LIMIT statements')
+
+
+class QueryBudgetTest(ActorTestData, TestCase):
+    """The public views stay within their query budgets without repeating a query shape."""
+
+    def public_urls(self) -> list[str]:
+        return [
+            reverse('actors:index'),
+            reverse('actors:index') + '?page=2',
+            reverse('actors:about'),
+            self.category.get_absolute_url(),
+            self.tag.get_absolute_url(),
+            reverse('actors:browse') + f'?category={self.category.slug}&tag={self.tag.slug}',
+            self.actors[0].get_absolute_url(),
+        ]
+
+    def test_anonymous_pages_within_budget(self):
+        for url in self.public_urls():
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_authenticated_pages_within_budget(self):
+        self.client.force_login(self.user)
+        urls = self.public_urls() + [
+            reverse('actors:add_actor'),
+            reverse('actors:update_actor', kwargs={'slug': self.actors[0].slug}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_budget_violation_raises(self):
+        original = IndexListView.query_budget
+        IndexListView.query_budget = 1
+        try:
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('actors:index'))
+        finally:
+            IndexListView.query_budget = original
+
+    def test_fingerprint_collapses_literals(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 3 AND name = 'x' AND pk IN (%s, %s, %s)"),
+            'SELECT * FROM t WHERE id = ? AND name = ? AND pk IN (...)',
+        )
+
+
+class MetricsTest(ActorTestData, TestCase):
+    """The metrics endpoint exposes per-view figures in the Prometheus text format."""
+
+    def test_metrics_include_rendered_views(self):
+        self.client.get(reverse('actors:index'))
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'http_responses_total{view="actors:index",status="200"}')
+        self.assertContains(response, 'http_request_duration_seconds_bucket{view="actors:index",le="+Inf"}')
+
+    def test_metrics_forbidden_for_outside_clients(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.1.2.3')
+        self.assertEqual(response.status_code, 403)
+
+    def test_shards_of_finished_threads_are_folded(self):
+        metrics = MetricsRegistry()
+        for _ in range(20):
+            thread = threading.Thread(target=metrics.inc, args=('cache_requests_total', (), 1))
+            thread.start()
+            thread.join()
+        self.assertLessEqual(len(metrics._shards), 1)
+        self.assertEqual(metrics.snapshot()[('cache_requests_total', (), '')], 20)
+
+    def test_concurrent_flushes_and_exited_processes(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        metrics = MetricsRegistry(directory, flush_interval=0)
+        threads = [
+            threading.Thread(target=lambda: [metrics.inc('cache_requests_total', (), 1) for _ in range(200)])
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        metrics.flush()
+
+        exited = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+        dead = Path(directory) / f'{exited.stdout.strip()}.json'
+        dead.write_text(json.dumps([['cache_requests_total', [], '', 5]]))
+        for _ in range(2):
+            self.assertEqual(metrics.collect()[('cache_requests_total', (), '')], 1605)
+        files = sorted(path.name for path in Path(directory).iterdir() if not path.name.startswith('.'))
+        self.assertEqual(files, [f'{os.getpid()}.json', 'retired.json'])
+
+
+class ProfilingTest(ActorTestData, TestCase):
+    """Requests asked for are profiled into collapsed stacks and allocation deltas, one at a time."""
+
+    def setUp(self):
+        self.directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(PROFILING={'ENABLED': True, 'DIRECTORY': self.directory}))
+
+    def test_request_with_token_is_profiled(self):
+        response = self.client.get(reverse('actors:index'), HTTP_X_PROFILE=make_token())
+        profile_id = response['X-Profile-Id']
+        for suffix in ('collapsed', 'alloc.txt'):
+            self.assertTrue((self.directory / f'{profile_id}.{suffix}').exists())
+        meta = json.loads((self.directory / f'{profile_id}.json').read_text())
+        self.assertEqual((meta['view'], meta['status']), ('actors:index', 200))
+        self.assertFalse(self.client.get(reverse('actors:index')).has_header('X-Profile-Id'))
+
+    def test_concurrent_calls_are_not_profiled(self):
+        for engine in ('sampling', 'cprofile'):
+            profiler = RequestProfiler(self.directory, engine=engine)
+            started, release, results = threading.Event(), threading.Event(), []
+
+            def slow():
+                started.set()
+                release.wait(5)
+                return 'slow'
+
+            thread = threading.Thread(target=lambda: results.append(profiler.profile(slow)))
+            thread.start()
+            self.assertTrue(started.wait(5))
+            with self.subTest(engine=engine):
+                self.assertEqual(profiler.profile(lambda: 'fast'), ('fast', None))
+                release.set()
+                thread.join()
+                [(result, meta)] = results
+                self.assertEqual(result, 'slow')
+                self.assertTrue((self.directory / f'{meta["id"]}.alloc.txt').exists())
+                self.assertFalse(tracemalloc.is_tracing())
+
+
+class ListQueryPlanTest(ActorTestData, TestCase):
+    """Every list query is answered from an index instead of a table scan."""
+
+    def query_plan(self, queryset) -> list[str]:
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def view_queryset(self, view_class, query: dict = None, **kwargs):
+        view = view_class()
+        view.setup(RequestFactory().get('/', query), **kwargs)
+        return view.get_queryset()
+
+    def assertUsesIndex(self, queryset, sorted_by_index=True):
+        for query in (queryset[:10], queryset.order_by()):
+            plan = self.query_plan(query)
+            with self.subTest(plan=plan):
+                self.assertFalse([step for step in plan if step.startswith('SCAN') and 'INDEX' not in step])
+                if sorted_by_index and query.ordered:
+                    self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_index_list_uses_index(self):
+        self.assertUsesIndex(self.view_queryset(IndexListView))
+
+    def test_category_list_uses_index(self):
+        self.assertUsesIndex(self.view_queryset(CategoryListView, category_slug=self.category.slug))
+
+    def test_tag_list_uses_index(self):
+        self.assertUsesIndex(self.view_queryset(TagListView, tag_slug=self.tag.slug), sorted_by_index=False)
+
+    def test_most_viewed_lists_use_index(self):
+        popular = {'order': 'popular'}
+        self.assertUsesIndex(self.view_queryset(IndexListView, popular))
+        self.assertUsesIndex(self.view_queryset(CategoryListView, popular, category_slug=self.category.slug))
+
+
+class SQLiteBackendTest(SimpleTestCase):
+    """New connections apply the tuned pragmas and atomic blocks take the write lock up front."""
+
+    def setUp(self):
+        self.path = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'pragmas.sqlite3'
+        options = {'pragmas': {'cache_size': -2000}}
+        self.wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': self.path, 'OPTIONS': options}, 'pragmas')
+        connections['pragmas'] = self.wrapper
+        self.addCleanup(connections.__delitem__, 'pragmas')
+        self.addCleanup(self.wrapper.close)
+
+    def pragma(self, name: str):
+        with self.wrapper.cursor() as cursor:
+            return cursor.execute(f'PRAGMA {name}').fetchone()[0]
+
+    def test_new_connections_apply_the_pragmas(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('synchronous'), 1, 'NORMAL')
+        self.assertEqual(self.pragma('temp_store'), 2, 'MEMORY')
+        self.assertEqual(self.pragma('mmap_size'), 268435456)
+        self.assertEqual(self.pragma('cache_size'), -2000, 'OPTIONS override the defaults')
+
+    def test_atomic_begins_immediate(self):
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+        other.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        with transaction.atomic(using='pragmas'):
+            with self.assertRaisesRegex(sqlite3.OperationalError, 'database is locked'):
+                other.execute('BEGIN IMMEDIATE')
+            # Only writers wait: readers, in a transaction or not, are not blocked by the write lock.
+            self.assertEqual(other.execute('SELECT count(*) FROM item').fetchone(), (0,))
+            other.execute('BEGIN')
+            self.assertEqual(other.execute('SELECT count(*) FROM item').fetchone(), (0,))
+            other.execute('COMMIT')
+        other.execute('BEGIN IMMEDIATE')
+        other.execute('ROLLBACK')
+
+    def test_pragmas_stay_out_of_the_shared_settings(self):
+        self.wrapper.ensure_connection()
+        self.assertEqual(self.wrapper.settings_dict['OPTIONS'], {'pragmas': {'cache_size': -2000}})
+        self.assertNotIn('pragmas', self.wrapper.get_connection_params())
+
+
+class ReplicaRoutingTest(SimpleTestCase):
+    """Reads go to the replica unless the client is pinned to the primary after a write."""
+
+    def setUp(self):
+        for module in ('actors_django.routers', 'actors_django.middleware'):
+            patcher = mock.patch(f'{module}.get_replicas', return_value=['replica'])
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        token = primary_written.set(False)
+        self.addCleanup(primary_written.reset, token)
+        self.router = ReplicaRouter()
+        self.middleware = PrimaryPinningMiddleware(self.read_then_write_view)
+        self.factory = RequestFactory()
+
+    def read_then_write_view(self, request):
+        database = self.router.db_for_read(Actor)
+        if request.GET.get('write'):
+            self.router.db_for_write(Actor)
+        return HttpResponse(database)
+
+    def test_reads_use_replica_and_writes_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Actor), 'replica')
+        self.assertEqual(self.router.db_for_write(Actor), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.router.db_for_read(Actor), DEFAULT_DB_ALIAS, 'reads after a write use the primary')
+        primary_written.set(False)
+        token = primary_pinned.set(True)
+        try:
+            self.assertEqual(self.router.db_for_read(Actor), DEFAULT_DB_ALIAS)
+        finally:
+            primary_pinned.reset(token)
+
+    def test_sessions_always_read_from_primary(self):
+        from django.contrib.sessions.models import Session
+
+        self.assertEqual(self.router.db_for_read(Session), DEFAULT_DB_ALIAS)
+
+    def test_client_sticks_to_primary_after_write(self):
+        response = self.middleware(self.factory.get('/', {'write': '1'}))
+        self.assertEqual(response.content, b'replica')
+        cookie = response.cookies[PrimaryPinningMiddleware.cookie_name]
+
+        request = self.factory.get('/')
+        request.COOKIES[cookie.key] = cookie.value
+        self.assertEqual(self.middleware(request).content, DEFAULT_DB_ALIAS.encode())
+        self.assertEqual(self.middleware(self.factory.get('/')).content, b'replica')
+
+    def test_unsafe_methods_and_admin_read_from_primary(self):
+        self.assertEqual(self.middleware(self.factory.post('/')).content, DEFAULT_DB_ALIAS.encode())
+        self.assertEqual(self.middleware(self.factory.get('/admin/')).content, DEFAULT_DB_ALIAS.encode())
+
+    def test_sync_copies_primary_into_replica(self):
+        with tempfile.TemporaryDirectory() as directory:
+            primary, replica = Path(directory) / 'primary.sqlite3', Path(directory) / 'replica.sqlite3'
+            with sqlite3.connect(primary) as conn:
+                conn.execute('CREATE TABLE actor (name TEXT)')
+                conn.execute("INSERT INTO actor VALUES ('Tom Hanks')")
+            conn.close()
+            sync_sqlite(str(primary), str(replica))
+            with sqlite3.connect(replica) as conn:
+                self.assertEqual(conn.execute('SELECT name FROM actor').fetchall(), [('Tom Hanks',)])
+            conn.close()
+
+
+class AsyncViewTest(ActorTestData, TestCase):
+    """The async views render the same pages as their sync counterparts."""
+
+    def request(self, path: str = '/'):
+        request = AsyncRequestFactory().get(path)
+        request.session = {}
+
+        async def auser():
+            return AnonymousUser()
+
+        request.auser = auser
+        return request
+
+    async def get(self, view_class, path: str = '/', **kwargs):
+        return await view_class.as_view()(self.request(path), **kwargs)
+
+    def listed(self, content: bytes) -> list[str]:
+        return [actor.get_full_name() for actor in self.actors if actor.get_full_name() in content.decode()]
+
+    async def test_index_matches_sync_view(self):
+        response = await self.get(AsyncIndexListView, '/?page=2')
+        self.assertEqual(response.status_code, 200)
+        sync_response = await self.async_client.get(reverse('actors:index') + '?page=2')
+        self.assertTrue(self.listed(response.content))
+        self.assertEqual(self.listed(response.content), self.listed(sync_response.content))
+
+    async def test_category_and_detail(self):
+        response = await self.get(AsyncCategoryListView, category_slug=self.category.slug)
+        self.assertContains(response, f'Category - {self.category.name}')
+        response = await self.get(AsyncActorDetailView, slug=self.actors[0].slug)
+        self.assertContains(response, self.actors[0].get_full_name())
+
+    async def test_last_page(self):
+        response = await self.get(AsyncIndexListView, '/?page=last')
+        self.assertEqual(response.status_code, 200)
+        sync_response = await self.async_client.get(reverse('actors:index') + '?page=last')
+        self.assertGreater(sync_response.context['page_obj'].number, 1)
+        self.assertTrue(self.listed(response.content))
+        self.assertEqual(self.listed(response.content), self.listed(sync_response.content))
+
+    async def test_middleware_runs_in_async_chains(self):
+        with self.assertLogs('django.request', 'DEBUG') as logs:
+            ASGIHandler()
+            logging.getLogger('django.request').debug('Loaded.')
+        self.assertEqual([line for line in logs.output if 'adapted for middleware actors_django' in line], [])
+
+        request = self.request()
+        response = await RequestTimingMiddleware(AsyncIndexListView.as_view())(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(request.timing.db_queries, 0, 'queries of the async ORM are recorded')
+        self.assertIn(f'desc="{request.timing.db_queries} queries"', response['Server-Timing'])
+
+    async def test_unknown_slug_raises_404(self):
+        with self.assertRaises(Http404):
+            await self.get(AsyncCategoryListView, category_slug='unknown')
+        with self.assertRaises(Http404):
+            await self.get(AsyncActorDetailView, slug='unknown')
+
+
+@override_settings(PAGE_CACHE={'ENABLED': True}, SIDEBAR_CACHE_TIMEOUT=60)
+class AsyncViewsPageCacheTest(ActorTestData, TestCase):
+    """Under ASYNC_VIEWS the list pages keep their facets, the page cache and the warm-up."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(use_async_views, settings.ASYNC_VIEWS)
+        use_async_views(True)
+
+    def test_list_pages_show_facets_and_are_cached(self):
+        url = self.category.get_absolute_url()
+        self.assertTrue(iscoroutinefunction(resolve(url).func))
+        response = self.client.get(url)
+        self.assertContains(response, f'href="/browse/?category=men&amp;tag={self.tag.slug}">Film icons</a> (12)')
+        response = self.client.get(self.tag.get_absolute_url())
+        self.assertContains(response, f'href="/browse/?category=men&amp;tag={self.tag.slug}">Men</a> (12)')
+
+        Actor.objects.filter(pk=self.actors[-1].pk).update(first_name='Renamed')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertNotContains(response, 'Renamed')
+
+    def test_warm_up_primes_the_async_pages(self):
+        with mock.patch('actors_django.warmup.connections'), self.assertLogs('actors_django.warmup', 'INFO'):
+            self.assertEqual(warm_up()['pages'], 3)
+        for url in (reverse('actors:index'), self.category.get_absolute_url(), self.tag.get_absolute_url()):
+            with self.assertNumQueries(0):
+                self.assertContains(self.client.get(url), self.category.name)
+
+
+@mock.patch.object(ActorAdmin, 'large_table_threshold', 0)
+class ActorAdminLargeTableTest(ActorTestData, TestCase):
+    """The actor changelist avoids full counts and scans in large-table mode."""
+
+    def setUp(self):
+        cache.clear()
+        admin_user = get_user_model().objects.create_superuser(username='admin', password='pass')
+        self.client.force_login(admin_user)
+        self.url = reverse('admin:actors_actor_changelist')
+
+    def test_changelist_skips_full_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        counts = [query['sql'] for query in queries if 'COUNT(*)' in query['sql'] and 'LIMIT' not in query['sql']]
+        self.assertFalse(counts)
+
+    def test_search_matches_name_prefixes(self):
+        response = self.client.get(self.url, {'q': 'first1 LAST1'})
+        expected = [self.actors[1], self.actors[10], self.actors[11]]
+        self.assertEqual(list(response.context['cl'].result_list), expected)
+
+    def test_search_matches_non_ascii_names_and_categories(self):
+        russian = Category.objects.create(name='Русские')
+        actor = Actor.objects.create(first_name='Иван', last_name='Охлобыстин', category=russian, author=self.user)
+        for term in ('иван', 'ИВАН', 'Охло', 'русск', 'men first1'):
+            with self.subTest(term=term):
+                response = self.client.get(self.url, {'q': term})
+                expected = [actor] if term != 'men first1' else [self.actors[1], self.actors[10], self.actors[11]]
+                self.assertEqual(list(response.context['cl'].result_list), expected)
+
+    @mock.patch.object(ActorAdmin, 'list_per_page', 5)
+    def test_cursor_link_seeks_by_id(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['cl'].next_cursor_url, f'?id__gt={self.actors[4].pk}')
+        response = self.client.get(self.url, {'id__gt': self.actors[4].pk})
+        self.assertEqual(response.context['cl'].result_list[0], self.actors[5])
+
+    def test_related_filter_searches_beyond_the_limit(self):
+        Category.objects.bulk_create(
+            Category(name=f'Genre {number:02}', slug=f'genre-{number}') for number in range(30)
+        )
+
+        def category_options(**params) -> list[str]:
+            response = self.client.get(self.url, params)
+            self.assertEqual(len(response.context['cl'].result_list), len(self.actors))
+            (spec,) = [spec for spec in response.context['cl'].filter_specs if spec.title == 'category']
+            return [name for _, name in spec.lookup_choices]
+
+        options = category_options()
+        self.assertEqual(len(options), 25)
+        self.assertNotIn('Genre 29', options)
+        self.assertContains(self.client.get(self.url), 'name="category__search"')
+        self.assertEqual(category_options(category__search='genre 29'), ['Genre 29'])
+
+
+class ThumbnailTest(ActorTestData, TestCase):
+    """Photo thumbnails are made on save or by make_thumbnails, and only read by the admin changelist."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.media = Path(media.name)
+        admin_user = get_user_model().objects.create_superuser(username='admin', password='pass')
+        self.client.force_login(admin_user)
+
+    def photo(self) -> SimpleUploadedFile:
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (400, 600)).save(buffer, format='JPEG')
+        return SimpleUploadedFile('portrait.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_thumbnails_are_made_on_save_and_read_by_the_changelist(self):
+        actor = self.actors[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            actor.photo = self.photo()
+            actor.save()
+        thumbnail = f'thumbnails/100/{actor.photo.name}'
+        self.assertTrue((self.media / thumbnail).exists())
+
+        with mock.patch('PIL.Image.open') as image_open:
+            response = self.client.get(reverse('admin:actors_actor_changelist'))
+        image_open.assert_not_called()
+        self.assertContains(response, f'src="/media/{thumbnail}"')
+
+    def test_command_makes_the_missing_thumbnails(self):
+        Actor.objects.filter(pk=self.actors[0].pk).update(
+            photo=default_storage.save('actors_photos/a.jpg', self.photo())
+        )
+        out = io.StringIO()
+        call_command('make_thumbnails', stdout=out)
+        self.assertEqual(out.getvalue(), 'Made 1 thumbnails.\n')
+        call_command('make_thumbnails', stdout=out)
+        self.assertIn('Made 0 thumbnails.', out.getvalue())
+
+
+class AutocompleteTest(ActorTestData, TestCase):
+    """The actor form renders only selected choices and loads the others from paginated endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Tag.objects.bulk_create(Tag(name=f'Extra {number:02}', slug=f'extra-{number:02}') for number in range(25))
+        cls.producer = Producer.objects.create(first_name='Steven', last_name='Spielberg')
+        cls.free_producer = Producer.objects.create(first_name='Stanley', last_name='Kubrick')
+        cls.actors[0].producer = cls.producer
+        cls.actors[0].save()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_form_renders_only_selected_choices(self):
+        response = self.client.get(reverse('actors:update_actor', kwargs={'slug': self.actors[0].slug}))
+        self.assertContains(response, f'<option value="{self.tag.pk}" selected>Film icons</option>')
+        self.assertContains(response, 'Steven Spielberg')
+        self.assertNotContains(response, 'Extra 00')
+        self.assertNotContains(response, 'Stanley Kubrick')
+
+    def test_endpoint_paginates_and_searches(self):
+        url = reverse('actors:autocomplete', kwargs={'source': 'tag'})
+        first = self.client.get(url).json()
+        self.assertEqual(len(first['results']), 20)
+        self.assertTrue(first['pagination']['more'])
+        second = self.client.get(url, {'page': 2}).json()
+        self.assertEqual(len(second['results']), 6)
+        self.assertFalse(second['pagination']['more'])
+        found = self.client.get(url, {'term': 'film'}).json()
+        self.assertEqual(found['results'], [{'id': str(self.tag.pk), 'text': 'Film icons'}])
+
+    def test_producer_endpoint_lists_unassigned_producers(self):
+        response = self.client.get(reverse('actors:autocomplete', kwargs={'source': 'producer'}))
+        self.assertEqual([result['text'] for result in response.json()['results']], ['Stanley Kubrick'])
+
+    def test_editing_keeps_the_actors_own_producer(self):
+        actor = self.actors[0]
+        data = {
+            'first_name': actor.first_name,
+            'last_name': actor.last_name,
+            'biography': '',
+            'is_published': 'on',
+            'category': self.category.pk,
+            'tags': [self.tag.pk],
+            'producer': self.producer.pk,
+        }
+        response = self.client.post(reverse('actors:update_actor', kwargs={'slug': actor.slug}), data)
+        self.assertEqual(response.status_code, 302)
+        actor.refresh_from_db()
+        self.assertEqual(actor.producer, self.producer)
+
+
+class ViewCountTest(ActorTestData, TestCase):
+    """Actor views are buffered in memory and written in one UPDATE per flush."""
+
+    def setUp(self):
+        view_counter.drain()
+
+    def test_views_are_flushed_in_one_update(self):
+        for actor in (self.actors[0], self.actors[0], self.actors[1]):
+            self.client.get(actor.get_absolute_url())
+        self.actors[0].refresh_from_db()
+        self.assertEqual(self.actors[0].views, 0)
+        with self.assertNumQueries(1):
+            self.assertEqual(view_counter.flush(), 2)
+        views = dict(Actor.objects.filter(views__gt=0).values_list('pk', 'views'))
+        self.assertEqual(views, {self.actors[0].pk: 2, self.actors[1].pk: 1})
+
+    def test_counts_of_finished_threads_are_kept_without_their_shards(self):
+        counter = ViewCounter()
+        for _ in range(20):
+            thread = threading.Thread(target=counter.hit, args=(self.actors[0].pk,))
+            thread.start()
+            thread.join()
+        self.assertLessEqual(len(counter._shards), 1)
+        self.assertEqual(counter.drain(), {self.actors[0].pk: 20})
+        self.assertEqual(counter._shards, {})
+
+    def test_spooled_counts_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(VIEW_COUNTS={'SPOOL_DIR': directory, 'FLUSH_THREAD': False}):
+                for _ in range(2):
+                    view_counter.hit(self.actors[2].pk)
+                    view_counter.flush()
+            self.assertEqual(len(list(Path(directory).glob('*.json'))), 2)
+            with self.assertNumQueries(1):
+                drain_spool(directory)
+            self.assertFalse(list(Path(directory).iterdir()))
+        self.actors[2].refresh_from_db()
+        self.assertEqual(self.actors[2].views, 2)
+
+    def test_abandoned_claims_are_drained_again(self):
+        with tempfile.TemporaryDirectory() as directory:
+            abandoned = Path(directory, 'old.123.claimed')
+            abandoned.write_text(json.dumps({self.actors[2].pk: 3}))
+            Path(directory, 'busy.456.claimed').write_text(json.dumps({self.actors[2].pk: 5}))
+            os.utime(abandoned, (time.time() - 60, time.time() - 60))
+            with self.assertLogs('actors.counters', 'WARNING'):
+                self.assertEqual(drain_spool(directory, claim_timeout=30), 1)
+            self.assertEqual([path.name for path in Path(directory).iterdir()], ['busy.456.claimed'])
+        self.actors[2].refresh_from_db()
+        self.assertEqual(self.actors[2].views, 3)
+
+    def test_flush_command_needs_a_spool_directory(self):
+        with self.assertRaisesMessage(CommandError, 'SPOOL_DIR'):
+            call_command('flush_view_counts', stdout=io.StringIO())
+        with tempfile.TemporaryDirectory() as directory:
+            write_spool(Path(directory), {self.actors[2].pk: 1})
+            out = io.StringIO()
+            with self.settings(VIEW_COUNTS={'SPOOL_DIR': directory}):
+                call_command('flush_view_counts', stdout=out)
+        self.assertEqual(out.getvalue(), 'Updated view counts of 1 actors.\n')
+
+    def test_most_viewed_ordering(self):
+        Actor.objects.filter(pk=self.actors[3].pk).update(views=10)
+        response = self.client.get(reverse('actors:index'), {'order': 'popular'})
+        self.assertEqual(response.context['actors'][0], self.actors[3])
+        self.assertContains(response, '?page=2&amp;order=popular')
+
+
+class StaticAssetsTest(SimpleTestCase):
+    """collectstatic writes minified, fingerprinted and precompressed assets that the middleware serves."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        cls.root = Path(directory.name)
+        cls.enterClassContext(override_settings(STATIC_ROOT=cls.root))
+        call_command('collectstatic', interactive=False, verbosity=0)
+        cls.middleware = StaticAssetsMiddleware(lambda request: HttpResponse('fallback'))
+
+    def test_minify_css(self):
+        css = '/* layout */\n/*! license */\na :hover ,\nb > i {\n  color: red;\n  margin: 0 ;\n}\n'
+        self.assertEqual(minify_css(css), '/*! license */ a :hover,b>i{color:red;margin:0}')
+
+    def test_static_urls_are_fingerprinted(self):
+        url = static('css/styles.css')
+        self.assertRegex(url, r'^/static/css/styles\.[0-9a-f]{12}\.css$')
+        collected = (self.root / url.removeprefix('/static/')).read_text()
+        self.assertNotIn('\n', collected)
+        self.assertRegex(collected, r'url\("\.\./images/logo\.[0-9a-f]{12}\.png"\)')
+        self.assertTrue((self.root / (url.removeprefix('/static/') + '.gz')).exists())
+
+    def test_precompressed_variant_is_served_immutable(self):
+        url = static('css/styles.css')
+        response = self.middleware(RequestFactory().get(url, HTTP_ACCEPT_ENCODING='br;q=0, gzip'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        collected = (self.root / url.removeprefix('/static/')).read_bytes()
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), collected)
+
+    def test_plain_names_and_missing_files(self):
+        response = self.middleware(RequestFactory().get('/static/css/styles.css'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        response.close()
+        self.assertEqual(self.middleware(RequestFactory().get('/static/missing.css')).content, b'fallback')
+        self.assertEqual(self.middleware(RequestFactory().get('/static/../manage.py')).content, b'fallback')
+        self.assertNotIn('missing.css', self.middleware.files, 'misses are not cached')
+        self.assertIn('css/styles.css', self.middleware.files)
+
+
+class CompressionTest(ActorTestData, TestCase):
+    """HTML is minified, gzipped for clients accepting it, and compressed bodies are reused."""
+
+    def setUp(self):
+        cache.clear()
+        caches['compressed'].clear()
+
+    def test_minify_keeps_preformatted_text(self):
+        html = b'<ul>\n    <li>  One  </li>\n\n    <li>Two</li>\n</ul>\n<pre>  keep\n    this</pre>\n'
+        self.assertEqual(minify_html(html), b'<ul>\n<li> One </li>\n<li>Two</li>\n</ul>\n<pre>  keep\n    this</pre>\n')
+
+    def test_page_is_gzipped_and_compressed_once(self):
+        plain = self.client.get(reverse('actors:index'))
+        self.assertNotIn(b'\n    ', plain.content)
+        labels = (('view', 'actors:index'),)
+        saved = registry.snapshot()[('http_compression_cpu_seconds_saved_total', labels, '')]
+        for _ in range(2):
+            response = self.client.get(reverse('actors:index'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Vary'], 'Cookie, Accept-Encoding')
+            self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertGreater(registry.snapshot()[('http_compression_cpu_seconds_saved_total', labels, '')], saved)
+
+    def test_compressed_bodies_stay_out_of_the_default_cache(self):
+        self.client.get(reverse('actors:index'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse([key for key in cache._cache if 'gzip:' in key])
+        self.assertTrue([key for key in caches['compressed']._cache if 'gzip:' in key])
+
+    def test_pages_with_secrets_are_not_gzipped(self):
+        response = self.client.get(reverse('users:login'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('actors:index'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertNotIn(b'\n    ', response.content, 'still minified')
+
+    def test_streaming_response_is_compressed_per_chunk(self):
+        chunks = [b'<p>%d</p>\n' % number * 50 for number in range(3)]
+        middleware = CompressionMiddleware(lambda request: StreamingHttpResponse(iter(chunks)))
+        response = middleware(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        compressed = list(response.streaming_content)
+        self.assertEqual(len(compressed), len(chunks) + 1, 'every chunk is flushed as it arrives')
+        self.assertEqual(gzip.decompress(b''.join(compressed)), b''.join(chunks))
+
+
+class StaticSiteTest(ActorTestData, TestCase):
+    """build_static_site renders every public page, then only the pages of changed actors."""
+
+    def build(self, directory: str) -> str:
+        out = io.StringIO()
+        call_command('build_static_site', output=directory, workers=1, stdout=out)
+        return out.getvalue()
+
+    def test_incremental_build(self):
+        other = Category.objects.create(name='Women')
+        # A draft keeps the category in the sidebar, whose changes would rebuild everything.
+        Actor.objects.create(first_name='Draft', last_name='Actor', category=other)
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            self.assertIn('Rendered 19 pages', self.build(directory))
+            for name in ('index.html', 'index.page-2.html', 'about/index.html', 'category/men.page-2.html'):
+                self.assertTrue((root / name).exists(), name)
+            self.assertIn(self.actors[0].first_name.encode(), (root / f'post/{self.actors[0].slug}.html').read_bytes())
+            self.assertTrue((root / 'index.html.gz').exists())
+            self.assertIn('Rendered 0 pages', self.build(directory))
+
+            # Both category lists, the index, the tag list and the actor's own page.
+            self.actors[0].category = other
+            self.actors[0].save()
+            self.assertIn('Rendered 8 pages', self.build(directory))
+            self.assertTrue((root / 'category/women.html').exists())
+
+            Actor.objects.filter(pk=self.actors[1].pk).update(is_published=False)
+            # Men is down to one page, so its second page goes together with the actor's own.
+            self.assertIn('and deleted 2', self.build(directory))
+            self.assertFalse((root / f'post/{self.actors[1].slug}.html').exists())
+            self.assertFalse((root / 'category/men.page-2.html').exists())
+
+    def test_facet_counts_rebuild_the_other_lists(self):
+        women = Category.objects.create(name='Women')
+        published = {'category': women, 'is_published': Actor.PublishedStatus.PUBLISHED}
+        Actor.objects.create(first_name='Actress', last_name='One', **published)
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            self.build(directory)
+            self.assertIn(b'Women</a> (1)', (root / 'category/men.html').read_bytes())
+
+            Actor.objects.create(first_name='Actress', last_name='Two', **published)
+            self.build(directory)
+            self.assertIn(b'Women</a> (2)', (root / 'category/men.html').read_bytes())
+            self.assertIn(b'Women</a> (2)', (root / 'category/men.page-2.html').read_bytes())
+
+
+class SitemapTest(ActorTestData, TestCase):
+    """Actor sitemaps are sharded by id range and a shard is only re-rendered when its range changes."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_dir = Path(directory.name)
+        settings = self.settings(SITEMAPS={'SHARD_SIZE': 5, 'CHUNK_SIZE': 2, 'CACHE_DIR': self.cache_dir})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def get_shard(self, shard: int) -> tuple[str, bytes]:
+        response = self.client.get(reverse('actors:sitemap_actors', kwargs={'shard': shard}))
+        self.assertEqual(response.status_code, 200)
+        return type(response).__name__, b''.join(response.streaming_content)
+
+    def test_index_lists_shards_and_sections(self):
+        response = self.client.get(reverse('actors:sitemap'))
+        shards = {(actor.pk - 1) // 5 for actor in self.actors}
+        self.assertEqual(response.content.count(b'<sitemap>'), len(shards) + 2)
+        self.assertContains(response, 'http://testserver/sitemap-categories.xml')
+        response = self.client.get(reverse('actors:sitemap_section', kwargs={'section': 'tags'}))
+        self.assertContains(response, '<loc>http://testserver/tag/film-icons</loc>')
+
+    def test_shards_are_cached_until_their_range_changes(self):
+        first, second = (self.actors[0].pk - 1) // 5, (self.actors[-1].pk - 1) // 5
+        kind, content = self.get_shard(first)
+        self.assertEqual(kind, 'StreamingHttpResponse')
+        self.assertIn(f'<loc>http://testserver{self.actors[0].get_absolute_url()}</loc>'.encode(), content)
+        self.assertEqual(content.count(b'<url>'), len([a for a in self.actors if (a.pk - 1) // 5 == first]))
+        self.get_shard(second)
+        self.assertEqual(self.get_shard(first), ('FileResponse', content))
+
+        self.actors[0].first_name = 'Renamed'
+        self.actors[0].save()
+        kind, content = self.get_shard(first)
+        self.assertEqual(kind, 'StreamingHttpResponse')
+        self.assertIn(f'{self.actors[0].get_absolute_url()}<'.encode(), content)
+        self.assertEqual(self.get_shard(second)[0], 'FileResponse')
+        self.assertEqual(len(list(self.cache_dir.iterdir())), 2)
+
+    def test_empty_shard_is_not_found(self):
+        response = self.client.get(reverse('actors:sitemap_actors', kwargs={'shard': 1000}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_feed_lists_latest_actors(self):
+        response = self.client.get(reverse('actors:feed'))
+        self.assertEqual(response['Content-Type'], 'application/atom+xml; charset=utf-8')
+        self.assertEqual(response.content.count(b'<entry>'), len(self.actors))
+        self.assertContains(response, f'<title>{self.actors[-1].first_name} {self.actors[-1].last_name}</title>')
+
+
+class ChangeOutboxTest(ActorTestData, TestCase):
+    """Every write to the catalogue, bulk ones included, leaves an event in the outbox."""
+
+    def events(self, **filters) -> list[tuple]:
+        queryset = ChangeEvent.objects.filter(pk__gt=self.start, **filters).order_by('pk')
+        return list(queryset.values_list('topic', 'object_id', 'action', 'data'))
+
+    def setUp(self):
+        self.start = ChangeEvent.objects.order_by('pk').values_list('pk', flat=True).last() or 0
+
+    def test_save_and_rolled_back_save(self):
+        actor = self.actors[0]
+        actor.biography = 'New biography'
+        actor.save(update_fields=['biography', 'time_update'])
+        [(topic, object_id, action, data)] = self.events()
+        self.assertEqual((topic, object_id, action), ('actors.actor', actor.pk, 'update'))
+        self.assertEqual(data['biography'], 'New biography')
+        self.assertNotIn('first_name', data)
+
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            Tag.objects.create(name='Rolled back')
+            1 / 0
+        self.assertEqual(len(self.events()), 1)
+
+    def test_tag_changes_from_both_sides(self):
+        tag = Tag.objects.create(name='Oscar winners')
+        self.actors[0].tags.add(tag)
+        tag.actors.remove(self.actors[0])
+        self.actors[1].tags.clear()
+        self.assertEqual(
+            [event[1:] for event in self.events(action='tags')],
+            [
+                (self.actors[0].pk, 'tags', {'add': [tag.pk]}),
+                (self.actors[0].pk, 'tags', {'remove': [tag.pk]}),
+                (self.actors[1].pk, 'tags', {'remove': [self.tag.pk]}),
+            ],
+        )
+
+    def test_bulk_update_and_delete(self):
+        producer = Producer.objects.create(first_name='Steven', last_name='Spielberg')
+        Actor.objects.filter(pk=self.actors[2].pk).update(producer=producer)
+        Actor.objects.filter(pk__in=[self.actors[0].pk, self.actors[1].pk]).update(is_published=False)
+        Actor.objects.filter(pk=self.actors[0].pk).update(views=5)
+        Actor.objects.filter(pk=self.actors[1].pk).delete()
+        producer.delete()
+        self.assertEqual(
+            [(object_id, action, data) for topic, object_id, action, data in self.events(topic='actors.actor')],
+            [
+                (self.actors[2].pk, 'update', {'fields': ['producer']}),
+                (self.actors[0].pk, 'update', {'fields': ['is_published']}),
+                (self.actors[1].pk, 'update', {'fields': ['is_published']}),
+                (self.actors[1].pk, 'delete', {}),
+                (self.actors[2].pk, 'update', {'fields': ['producer']}),
+            ],
+        )
+
+    def test_bulk_create_writes_its_events_in_one_statement(self):
+        with self.assertNumQueries(2):
+            tags = Tag.objects.bulk_create(Tag(name=f'Bulk {number}', slug=f'bulk-{number}') for number in range(50))
+        events = self.events(topic='actors.tag')
+        self.assertEqual([event[1:3] for event in events], [(tag.pk, 'create') for tag in tags])
+        self.assertEqual(events[0][3]['name'], 'Bulk 0')
+
+    def test_consumer_reads_batches_from_its_checkpoint(self):
+        consumer = OutboxConsumer('test', topics=['actors.tag'], batch_size=2)
+        consumer.commit(self.start)
+        tags = [Tag.objects.create(name=f'Tag {number}') for number in range(3)]
+        Category.objects.create(name='Ignored')
+        batches = []
+        for events in consumer:
+            batches.append([event.object_id for event in events])
+            consumer.commit(events)
+        self.assertEqual(batches, [[tags[0].pk, tags[1].pk], [tags[2].pk]])
+        self.assertEqual(consumer.poll(), [])
+        self.assertEqual(consumer.position, ChangeEvent.objects.latest('pk').pk)
+
+    def test_consumer_waits_for_recent_gaps(self):
+        consumer = OutboxConsumer('test')
+        consumer.commit(self.start)
+        first, second, third = (Tag.objects.create(name=f'Tag {number}') for number in range(3))
+        # An event of a transaction that has not committed yet looks like a gap.
+        ChangeEvent.objects.filter(pk__gt=self.start, object_id=second.pk).delete()
+        self.assertEqual([event.object_id for event in consumer.poll()], [first.pk])
+        consumer.gap_timeout = -1
+        self.assertEqual([event.object_id for event in consumer.poll()], [first.pk, third.pk])
+
+    def test_prune_keeps_unread_events(self):
+        Tag.objects.create(name='Old')
+        ChangeEvent.objects.update(time_create=timezone.now() - timedelta(days=30))
+        self.assertEqual(prune(), 0)
+        OutboxConsumer('test').commit(ChangeEvent.objects.latest('pk').pk)
+        OutboxConsumer('other').commit(self.start)
+        committed = ChangeEvent.objects.filter(pk__lte=self.start).count()
+        self.assertEqual(prune(), committed)
+        self.assertTrue(ChangeEvent.objects.filter(pk__gt=self.start).exists())
+
+
+@override_settings(PAGE_CACHE={'ENABLED': True, 'SOFT_TTL': 30, 'HARD_TTL': 300, 'WAIT_TIMEOUT': 5.0})
+class PageCacheTest(ActorTestData, TestCase):
+    """Anonymous list pages come from the cache; stale ones are refreshed once and misses are rendered once."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_list_pages_are_cached_per_page_and_order(self):
+        url = self.category.get_absolute_url()
+        self.client.get(url)
+        Actor.objects.filter(pk=self.actors[-1].pk).update(first_name='Renamed')
+        with self.assertNumQueries(0):
+            response = self.client.get(url + '?utm_source=feed')
+        self.assertNotContains(response, 'Renamed')
+        self.assertContains(self.client.get(url + '?order=popular'), 'Renamed')
+
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(url), 'Renamed')
+
+    def test_stale_page_is_served_while_one_refresh_runs(self):
+        pages, started, release = PageCache(), threading.Event(), threading.Event()
+        renders = []
+
+        def render():
+            renders.append(1)
+            started.set()
+            release.wait(5)
+            return b'new', 'text/html'
+
+        stale = ('page_cache_stale_total', (('view', 'test'),), '')
+        before = registry.snapshot()[stale]
+        with override_settings(PAGE_CACHE={**get_page_cache_config(), 'SOFT_TTL': 0}):
+            pages.store('key', (b'old', 'text/html'), get_page_cache_config())
+            self.assertEqual(pages.get('key', render, 'test'), (b'old', 'text/html'))
+            self.assertTrue(started.wait(5))
+            self.assertEqual(pages.get('key', render, 'test'), (b'old', 'text/html'))
+            release.set()
+            pages._executor.shutdown()
+        self.assertEqual(len(renders), 1)
+        self.assertEqual(cache.get('key')[1:], (b'new', 'text/html'))
+        self.assertEqual(registry.snapshot()[stale], before + 2)
+
+    def test_concurrent_misses_wait_for_one_render(self):
+        pages, release = PageCache(), threading.Event()
+        renders, results = [], []
+
+        def render():
+            renders.append(1)
+            release.wait(5)
+            return b'page', 'text/html'
+
+        coalesced = ('page_cache_coalesced_total', (('scope', 'process'), ('view', '')), '')
+        before = registry.snapshot()[coalesced]
+        threads = [threading.Thread(target=lambda: results.append(pages.get('miss', render))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while registry.snapshot()[coalesced] < before + 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(renders), 1)
+        self.assertEqual(results, [(b'page', 'text/html')] * 5)
+        self.assertEqual(registry.snapshot()[coalesced], before + 4)
+
+    def test_miss_waits_for_the_render_of_another_process(self):
+        key = page_key('/')
+        cache.add(f'{key}:lock', 1)
+        threading.Timer(0.1, cache.set, (key, (time.time() + 30, b'other', 'text/html'))).start()
+        self.assertEqual(PageCache().get(key, lambda: (b'own', 'text/html')), (b'other', 'text/html'))
+
+
+class ProductionProfileTest(SimpleTestCase):
+    """A production worker boots without the development apps and the optional subsystems it doesn't use."""
+
+    def start_worker(self, **environment) -> subprocess.CompletedProcess:
+        environment = {'ACTORS_ENV': 'production', 'ACTORS_SECRET_KEY': 'test-' + 'x' * 50, **environment}
+        environment = {**os.environ, **environment}
+        environment.pop('DJANGO_SETTINGS_MODULE', None)
+        return subprocess.run(
+            [sys.executable, '-X', 'importtime', '-m', 'actors_django.startup', '/no-such-page/'],
+            cwd=Path(__file__).resolve().parent.parent,
+            env={key: value for key, value in environment.items() if value is not None},
+            capture_output=True,
+            text=True,
+        )
+
+    def test_production_worker_skips_development_imports(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            process = self.start_worker(ACTORS_ALLOWED_HOSTS='localhost', ACTORS_CACHE_DIR=cache_dir)
+        self.assertEqual(process.returncode, 0, process.stderr[-2000:])
+        self.assertEqual(json.loads(process.stdout)['statuses'], [404])
+        imported = parse_importtime(process.stderr)
+        self.assertIn('django', imported)
+        for package in ('debug_toolbar', 'django_extensions', 'PIL', 'cProfile', 'pstats'):
+            self.assertNotIn(package, imported)
+
+    def test_production_worker_needs_hosts_and_a_shared_cache(self):
+        process = self.start_worker(ACTORS_ALLOWED_HOSTS=None, ACTORS_CACHE_DIR='/tmp')
+        self.assertIn('ImproperlyConfigured: Set ACTORS_ALLOWED_HOSTS', process.stderr)
+        process = self.start_worker(ACTORS_ALLOWED_HOSTS='localhost', ACTORS_REDIS_URL=None, ACTORS_CACHE_DIR=None)
+        self.assertIn('ImproperlyConfigured: Set ACTORS_REDIS_URL or ACTORS_CACHE_DIR', process.stderr)
+
+
+@override_settings(PAGE_CACHE={'ENABLED': True}, SIDEBAR_CACHE_TIMEOUT=60)
+class WarmUpTest(ActorTestData, TestCase):
+    """After the warm-up the hottest list pages are served without a query."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_warm_up_primes_sidebar_and_hot_pages(self):
+        # Closing the connections would end the test transaction.
+        with mock.patch('actors_django.warmup.connections'), self.assertLogs('actors_django.warmup', 'INFO'):
+            result = warm_up()
+        self.assertGreaterEqual(result['templates'], 10)
+        self.assertGreater(result['urls'], 10)
+        self.assertEqual((result['sidebar'], result['pages']), (2, 3))
+        for url in (reverse('actors:index'), self.category.get_absolute_url(), self.tag.get_absolute_url()):
+            with self.assertNumQueries(0):
+                self.assertContains(self.client.get(url), self.category.name)
+
+    def test_sidebar_is_evicted_by_changes(self):
+        self.client.get(self.actors[0].get_absolute_url())
+        # Only the actor and its tags.
+        with self.assertNumQueries(2):
+            self.client.get(self.actors[1].get_absolute_url())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.actors[0].category = Category.objects.create(name='Women')
+            self.actors[0].save()
+            response = self.client.get(self.actors[1].get_absolute_url())
+            self.assertNotContains(response, 'Women', msg_prefix='uncommitted')
+        self.assertContains(self.client.get(self.actors[1].get_absolute_url()), 'Women')
+
+
+class FacetTest(ActorTestData, TestCase):
+    """List pages combine a category with tags and count the actors of every facet in one query."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.women = Category.objects.create(name='Women')
+        cls.oscar = Tag.objects.create(name='Oscar winners')
+        for actor in cls.actors[:3]:
+            actor.tags.add(cls.oscar)
+        actress = Actor.objects.create(
+            first_name='Actress', last_name='One', category=cls.women, is_published=Actor.PublishedStatus.PUBLISHED
+        )
+        actress.tags.add(cls.tag, cls.oscar)
+
+    def setUp(self):
+        cache.clear()
+
+    def browse(self, query: str):
+        return self.client.get(f'{reverse("actors:browse")}?{query}')
+
+    def test_counts_come_from_one_query(self):
+        with self.assertNumQueries(1):
+            counts = count_facets(self.category.pk, [self.oscar.pk])
+        # Categories are counted under the tags alone, tags under the whole filter.
+        self.assertEqual(counts['category'], {self.category.pk: 3, self.women.pk: 1})
+        self.assertEqual(counts['tag'], {self.tag.pk: 3, self.oscar.pk: 3})
+
+    def test_browse_combines_category_and_tags(self):
+        response = self.browse(f'tag={self.oscar.slug}&category={self.category.slug}&tag={self.tag.slug}')
+        self.assertEqual(len(response.context['actors']), 3)
+        self.assertContains(response, 'Category - Men, Tags - Film icons, Oscar winners')
+        women = response.context['sidebar_categories'][1]
+        self.assertEqual(women.total, 1)
+        self.assertEqual(women.facet_url, f'/browse/?category=women&tag={self.tag.slug}&tag={self.oscar.slug}')
+        self.assertEqual(response.context['all_categories_url'], f'/browse/?tag={self.tag.slug}&tag={self.oscar.slug}')
+
+    def test_category_page_drills_down_into_tags(self):
+        response = self.client.get(self.category.get_absolute_url())
+        self.assertContains(response, f'href="/browse/?category=men&amp;tag={self.oscar.slug}">Oscar winners</a> (3)')
+        self.assertNotContains(self.browse(f'category=men&tag={self.oscar.slug}'), 'First3')
+
+    def test_unknown_or_too_many_tags_are_not_found(self):
+        self.assertEqual(self.browse('tag=unknown').status_code, 404)
+        self.assertEqual(self.browse('&'.join(f'tag=t{number}' for number in range(6))).status_code, 404)
+
+    @override_settings(SIDEBAR_CACHE_TIMEOUT=60)
+    def test_counts_are_cached_per_filter_until_a_change(self):
+        facet_counts(None, [self.oscar.pk, self.tag.pk])
+        with self.assertNumQueries(0):
+            facet_counts(None, [self.tag.pk, self.oscar.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.actors[3].tags.add(self.oscar)
+            self.assertEqual(facet_counts(None, [self.oscar.pk, self.tag.pk])['category'][self.category.pk], 3)
+        self.assertEqual(facet_counts(None, [self.oscar.pk, self.tag.pk])['category'][self.category.pk], 4)
+
+    @override_settings(PAGE_CACHE={'ENABLED': True})
+    def test_page_cache_key_ignores_tag_order_and_repeats(self):
+        first = self.browse(f'tag={self.oscar.slug}&tag={self.tag.slug}')
+        with self.assertNumQueries(0):
+            second = self.browse(f'tag={self.tag.slug}&tag={self.oscar.slug}&tag={self.tag.slug}')
+        self.assertEqual(first.content, second.content)
@@ -0,0 +1,55 @@
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db.models.fields.files import ImageFieldFile
+
+# Widths made for every photo; the admin changelist shows the 100-pixel one.
+THUMBNAIL_WIDTHS = (100,)
+
+
+def thumbnail_name(image: ImageFieldFile, width: int) -> str:
+    """Thumbnails are stored next to the originals under `thumbnails/<width>/`."""
+    return f'thumbnails/{width}/{image.name}'
+
+
+def make_thumbnail(image: ImageFieldFile, width: int) -> bool:
+    """Store a copy of an image scaled down to `width` pixels, unless there already is one.
+
+    Args:
+        image (ImageFieldFile): The image to scale down.
+        width (int): Maximum width of the thumbnail in pixels.
+
+    Returns:
+        bool: Whether a thumbnail was made; False when it exists or the original can't be read.
+    """
+    name = thumbnail_name(image, width)
+    storage = image.storage
+    if storage.exists(name):
+        return False
+    # Imported here: Pillow is only needed to make thumbnails, not at every worker start.
+    from PIL import Image
+
+    try:
+        with image.open('rb'), Image.open(image) as picture:
+            image_format = picture.format
+            picture.thumbnail((width, width * 4))
+            buffer = BytesIO()
+            picture.save(buffer, format=image_format)
+    except (OSError, ValueError):
+        return False
+    storage.save(name, ContentFile(buffer.getvalue()))
+    return True
+
+
+def make_thumbnails(image: ImageFieldFile) -> int:
+    """Make the missing thumbnails of an image in every width of THUMBNAIL_WIDTHS and return how many were made."""
+    return sum(make_thumbnail(image, width) for width in THUMBNAIL_WIDTHS)
+
+
+def thumbnail_url(image: ImageFieldFile, width: int) -> str:
+    """Return the URL of a thumbnail made by make_thumbnail(), or the image's own URL until it is made.
+
+    Nothing is resized here, so pages listing many images only ask the storage whether their thumbnails exist.
+    """
+    name = thumbnail_name(image, width)
+    return image.storage.url(name) if image.storage.exists(name) else image.url
@@ -1,15 +1,38 @@
-from django.urls import path
+from django.conf import settings
+from django.urls import path, re_path
 
 from . import views
+from .feeds import LatestActorsFeed
 
 app_name = 'actors'
 
+if settings.ASYNC_VIEWS:
+    index_view, category_view, detail_view, tag_view = (
+        views.AsyncIndexListView,
+        views.AsyncCategoryListView,
+        views.AsyncActorDetailView,
+        views.AsyncTagListView,
+    )
+else:
+    index_view, category_view, detail_view, tag_view = (
+        views.IndexListView,
+        views.CategoryListView,
+        views.ActorDetailView,
+        views.TagListView,
+    )
+
 urlpatterns = [
-    path('', views.IndexListView.as_view(), name='index'),
+    path('', index_view.as_view(), name='index'),
     path('about/', views.AboutView.as_view(), name='about'),
-    path('category/<slug:category_slug>', views.CategoryListView.as_view(), name='category'),
-    path('post/<slug:slug>', views.ActorDetailView.as_view(), name='post'),
-    path('tag/<slug:tag_slug>', views.TagListView.as_view(), name='tag'),
+    path('category/<slug:category_slug>', category_view.as_view(), name='category'),
+    path('post/<slug:slug>', detail_view.as_view(), name='post'),
+    path('tag/<slug:tag_slug>', tag_view.as_view(), name='tag'),
+    path('browse/', views.FacetedListView.as_view(), name='browse'),
     path('add_actor/', views.ActorCreateView.as_view(), name='add_actor'),
     path('update_actor/<slug:slug>', views.ActorUpdateView.as_view(), name='update_actor'),
+    path('autocomplete/<slug:source>', views.AutocompleteView.as_view(), name='autocomplete'),
+    path('feed/', LatestActorsFeed(), name='feed'),
+    path('sitemap.xml', views.SitemapIndexView.as_view(), name='sitemap'),
+    path('sitemap-actors-<int:shard>.xml', views.ActorSitemapView.as_view(), name='sitemap_actors'),
+    re_path(r'^sitemap-(?P<section>categories|tags)\.xml$', views.SectionSitemapView.as_view(), name='sitemap_section'),
 ]
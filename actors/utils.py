@@ -1,3 +1,29 @@
+import asyncio
+import copy
+import functools
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, QuerySet
+from django.http import Http404, HttpRequest, HttpResponse
+
+from actors_django.metrics import record_cache
+
+from .facets import (
+    CATEGORY,
+    MAX_TAGS,
+    TAG,
+    facet_counts,
+    facet_entries,
+    filter_actors,
+    filter_url,
+    normalize_query,
+)
+from .models import Category, Tag
+from .page_cache import get_config, page_cache, page_key
+
+
 class DataMixin:
     """
     This class, DataMixin, is a mixin class that can be used to add additional data to a context dictionary.
@@ -24,6 +50,8 @@ class DataMixin:
     extra_content = {}
 
     def __init__(self) -> None:
+        # Per instance: filling the class-level dict would leak one view's values into every other view.
+        self.extra_content = dict(self.extra_content)
         if self.title_page:
             self.extra_content['title'] = self.title_page
 
@@ -34,3 +62,188 @@ class DataMixin:
         context.update(self.extra_content)
         context.update(kwargs)
         return context
+
+
+class ListOrderingMixin:
+    """Lets the actor list views switch from newest first to most viewed with the `order` query parameter.
+
+    Attributes:
+        orderings (dict): Order by clause per accepted value of `order`; both are backed by partial indexes.
+    """
+
+    orderings = {'popular': ('-views', '-id')}
+
+    def order_queryset(self, queryset: QuerySet) -> QuerySet:
+        ordering = self.orderings.get(self.request.GET.get('order'))
+        return queryset.order_by(*ordering) if ordering else queryset
+
+
+class CachedPageMixin:
+    """Serves a list view to anonymous visitors through the page cache, see actors.page_cache.
+
+    Logged-in users always get a freshly rendered page, so authors see their changes at once; visitors may see a
+    page up to PAGE_CACHE['SOFT_TTL'] seconds old, plus the time its refresh takes.
+
+    Attributes:
+        cache_params (tuple): Query parameters the page depends on. The others are left out of the cache key, so
+            they cannot be used to bypass the cache.
+    """
+
+    cache_params = ('page', 'order')
+
+    def get_page_cache_key(self) -> str | None:
+        """Return the cache key of the requested page, or None when it must not come from the cache."""
+        request = self.request
+        if not get_config()['ENABLED'] or request.user.is_authenticated:
+            return None
+        # Repeated parameters count once and in any order, so every spelling of a filter shares one entry.
+        params = sorted({(name, value) for name in self.cache_params for value in request.GET.getlist(name)})
+        return page_key(request.path, urlencode(params))
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """
+        Handle a GET request for this view.
+
+        Args:
+            request(HttpRequest): The request instance.
+            *args: additional positional parameters.
+            **kwargs: additional named parameters.
+
+        Returns:
+            HttpResponse: The cached or rendered response.
+        """
+        key = self.get_page_cache_key()
+        if key is None:
+            return super().get(request, *args, **kwargs)
+        # A refresh renders after this request is over, so it gets a copy the response phase cannot change.
+        render = functools.partial(self.render_page, copy.copy(request), args, kwargs)
+        content, content_type = page_cache.get(key, render, view=request.resolver_match.view_name)
+        return HttpResponse(content, content_type=content_type)
+
+    def render_page(self, request: HttpRequest, args: tuple, kwargs: dict) -> tuple[bytes, str]:
+        """Render the page with a new instance of the view, bypassing the cache.
+
+        Returns:
+            tuple[bytes, str]: Content and content type of the page.
+        """
+        view = type(self)()
+        view.setup(request, *args, **kwargs)
+        response = super(CachedPageMixin, view).get(request, *args, **kwargs)
+        response.render()
+        return response.content, response['Content-Type']
+
+
+class FacetMixin:
+    """Filters an actor list view by one category and any number of tags, and shows the sidebar as their facets.
+
+    The sidebar lists the categories and tags with their number of published actors within the filter, see
+    actors.facets, each linked to the filter it leads to: another category, or one tag more or less. Selected
+    categories and tags are looked up in the cached sidebar, so a filter costs no queries besides the counts.
+    """
+
+    def get_filter_slugs(self) -> tuple[str | None, tuple[str, ...]]:
+        """Return the slugs of the category and tags to filter by; those of the query string by default."""
+        return normalize_query(self.request.GET)
+
+    @functools.cached_property
+    def facet_filter(self) -> tuple[dict, Category | None, list[Tag]]:
+        """Return the sidebar and the filter's category and tags, raising Http404 for a filter without actors."""
+        category_slug, tag_slugs = self.get_filter_slugs()
+        if len(tag_slugs) > MAX_TAGS:
+            raise Http404(f'At most {MAX_TAGS} tags can be combined.')
+        sidebar = cached_sidebar()
+        categories = {category.slug: category for category in sidebar['sidebar_categories']}
+        tags = {tag.slug: tag for tag in sidebar['sidebar_tags']}
+        try:
+            category = categories[category_slug] if category_slug else None
+            selected_tags = [tags[slug] for slug in tag_slugs]
+        except KeyError:
+            raise Http404('No actors in this category or with this tag.')
+        return sidebar, category, selected_tags
+
+    def filter_by_facets(self, queryset: QuerySet) -> QuerySet:
+        _, category, tags = self.facet_filter
+        return filter_actors(queryset, category and category.pk, [tag.pk for tag in tags])
+
+    def get_facet_context(self) -> dict:
+        """Return the sidebar entries as facets of the filter, and the selected category for the sidebar template."""
+        sidebar, category, tags = self.facet_filter
+        category_slug = category.slug if category else None
+        tag_slugs = {tag.slug for tag in tags}
+        counts = facet_counts(category and category.pk, [tag.pk for tag in tags])
+        return {
+            'sidebar_categories': facet_entries(
+                sidebar['sidebar_categories'],
+                counts[CATEGORY],
+                {category.pk} if category else set(),
+                lambda entry: filter_url(entry.slug, tag_slugs),
+            ),
+            'sidebar_tags': facet_entries(
+                sidebar['sidebar_tags'],
+                counts[TAG],
+                {tag.pk for tag in tags},
+                lambda entry: filter_url(category_slug, tag_slugs ^ {entry.slug}),
+            ),
+            'category_selected': category_slug or 0,
+            'all_categories_url': filter_url(None, tag_slugs),
+        }
+
+
+def sidebar_categories() -> QuerySet[Category]:
+    """Return the categories shown in the sidebar: those with at least one actor, with their actor count."""
+    return Category.objects.annotate(total=Count('actors')).filter(total__gt=0)
+
+
+def sidebar_tags() -> QuerySet[Tag]:
+    """Return the tags shown in the sidebar: those with at least one actor, with their actor count."""
+    return Tag.objects.annotate(total=Count('actors')).filter(total__gt=0)
+
+
+SIDEBAR_CACHE_KEY = 'actors:sidebar'
+
+
+def cached_sidebar() -> dict:
+    """Return the sidebar categories and tags from the cache, reading them from the database on a miss.
+
+    With SIDEBAR_CACHE_TIMEOUT set to 0 nothing is cached and the entries are lazy querysets, as before.
+
+    Returns:
+        dict: The 'sidebar_categories' and 'sidebar_tags' context entries read by the sidebar template tags.
+    """
+    timeout = getattr(settings, 'SIDEBAR_CACHE_TIMEOUT', 0)
+    if not timeout:
+        return {'sidebar_categories': sidebar_categories(), 'sidebar_tags': sidebar_tags()}
+    sidebar = cache.get(SIDEBAR_CACHE_KEY)
+    record_cache('sidebar', sidebar is not None)
+    if sidebar is None:
+        sidebar = {'sidebar_categories': list(sidebar_categories()), 'sidebar_tags': list(sidebar_tags())}
+        cache.set(SIDEBAR_CACHE_KEY, sidebar, timeout)
+    return sidebar
+
+
+def evict_sidebar() -> None:
+    cache.delete(SIDEBAR_CACHE_KEY)
+
+
+async def alist(queryset: QuerySet) -> list:
+    """Evaluate a queryset with the async ORM and return its rows as a list."""
+    return [obj async for obj in queryset]
+
+
+async def get_sidebar() -> dict:
+    """Fetch the sidebar categories and tags from the cache, or concurrently from the database on a miss.
+
+    Returns:
+        dict: The 'sidebar_categories' and 'sidebar_tags' context entries read by the sidebar template tags.
+    """
+    timeout = getattr(settings, 'SIDEBAR_CACHE_TIMEOUT', 0)
+    if timeout:
+        sidebar = await cache.aget(SIDEBAR_CACHE_KEY)
+        record_cache('sidebar', sidebar is not None)
+        if sidebar is not None:
+            return sidebar
+    categories, tags = await asyncio.gather(alist(sidebar_categories()), alist(sidebar_tags()))
+    sidebar = {'sidebar_categories': categories, 'sidebar_tags': tags}
+    if timeout:
+        await cache.aset(SIDEBAR_CACHE_KEY, sidebar, timeout)
+    return sidebar
@@ -1,16 +1,30 @@
+import asyncio
+import copy
+import functools
+from pathlib import Path
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import QuerySet
-from django.http import HttpRequest, HttpResponse
+from django.core.paginator import InvalidPage, Paginator
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
+from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.generic import CreateView, DetailView, ListView, UpdateView
 
+from .counters import view_counter
+from .facets import filter_params
 from .forms import ActorForm
-from .models import Actor, Category, Tag
-from .utils import DataMixin
+from .models import Actor, Category, Producer, Tag
+from .page_cache import page_cache
+from .sitemaps import cached_actor_shard, render_index, render_section
+from .utils import CachedPageMixin, DataMixin, FacetMixin, ListOrderingMixin, alist, get_sidebar
 
 
-class IndexListView(DataMixin, ListView):
+class IndexListView(CachedPageMixin, ListOrderingMixin, DataMixin, ListView):
     """Handles the index page showing all Actors."""
 
     model = Actor
@@ -19,6 +33,7 @@ class IndexListView(DataMixin, ListView):
     paginate_by = 10
     title_page = 'Homepage'
     category_selected = 0
+    query_budget = 6
 
     def get_context_data(self, **kwargs) -> dict:
         """
@@ -37,14 +52,16 @@ class IndexListView(DataMixin, ListView):
         """Get the queryset for this view.
 
         Returns:
-            Queryset of Actor who has been published.
+            Queryset of Actor who has been published, newest or most viewed first.
         """
-        return Actor.published.all().select_related('category')
+        return self.order_queryset(Actor.published.all().select_related('category', 'author'))
 
 
 class AboutView(View):
     """Handles the "About Us" page."""
 
+    query_budget = 4
+
     def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
         """
         Handle a GET request for this view.
@@ -63,7 +80,7 @@ class AboutView(View):
         return render(request=request, template_name='actors/about.html', context=context)
 
 
-class CategoryListView(DataMixin, ListView):
+class CategoryListView(CachedPageMixin, FacetMixin, ListOrderingMixin, DataMixin, ListView):
     """Handles viewing Actors by their Category."""
 
     model = Actor
@@ -71,6 +88,10 @@ class CategoryListView(DataMixin, ListView):
     context_object_name = 'actors'
     paginate_by = 10
     allow_empty = False
+    query_budget = 8
+
+    def get_filter_slugs(self) -> tuple[str | None, tuple[str, ...]]:
+        return self.kwargs['category_slug'], ()
 
     def get_queryset(self) -> QuerySet[Actor]:
         """Get the queryset for this view.
@@ -81,7 +102,8 @@ class CategoryListView(DataMixin, ListView):
         Returns:
             Queryset of Actor within a specific category.
         """
-        return Actor.published.filter(category__slug=self.kwargs['category_slug']).select_related('category')
+        queryset = self.filter_by_facets(Actor.published.all())
+        return self.order_queryset(queryset.select_related('category', 'author'))
 
     def get_context_data(self, **kwargs) -> dict:
         """
@@ -93,13 +115,9 @@ class CategoryListView(DataMixin, ListView):
         Returns:
             context: A dict representing the context.
         """
-        category = get_object_or_404(Category, slug=self.kwargs['category_slug'])
+        _, category, _ = self.facet_filter
         context = super().get_context_data(**kwargs)
-        return self.get_mixin_context(
-            context=context,
-            title=f'Category - {category.name}',
-            category_selected=category.slug,
-        )
+        return self.get_mixin_context(context=context, title=f'Category - {category.name}', **self.get_facet_context())
 
 
 class ActorDetailView(DataMixin, DetailView):
@@ -108,6 +126,7 @@ class ActorDetailView(DataMixin, DetailView):
     model = Actor
     template_name = 'actors/post.html'
     context_object_name = 'actor'
+    query_budget = 6
 
     def get_context_data(self, **kwargs) -> dict:
         """
@@ -119,7 +138,7 @@ class ActorDetailView(DataMixin, DetailView):
         Returns:
             context: A dict representing the context.
         """
-        actor = get_object_or_404(Actor, slug=self.kwargs[self.slug_url_kwarg])
+        actor = self.object
         context = super().get_context_data(**kwargs)
         return self.get_mixin_context(
             context=context,
@@ -127,6 +146,14 @@ class ActorDetailView(DataMixin, DetailView):
             selected_category=actor.category.slug,
         )
 
+    def get_queryset(self) -> QuerySet[Actor]:
+        """Get the queryset the Actor is looked up in.
+
+        Returns:
+            Queryset of published Actors with their category and tags.
+        """
+        return Actor.published.select_related('category').prefetch_related('tags')
+
     def get_object(self, **kwargs) -> Actor:
         """Get the specific Actor instance for this view.
 
@@ -135,10 +162,26 @@ class ActorDetailView(DataMixin, DetailView):
         Returns:
             Actor instance.
         """
-        return get_object_or_404(Actor.published, slug=self.kwargs[self.slug_url_kwarg])
+        return get_object_or_404(self.get_queryset(), slug=self.kwargs[self.slug_url_kwarg])
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """
+        Handle a GET request for this view and count the view of the actor.
+
+        Args:
+            request(HttpRequest): The request instance.
+            *args: additional positional parameters.
+            **kwargs: additional named parameters.
+
+        Returns:
+            HttpResponse: The rendered response.
+        """
+        response = super().get(request, *args, **kwargs)
+        view_counter.hit(self.object.pk)
+        return response
 
 
-class TagListView(DataMixin, ListView):
+class TagListView(CachedPageMixin, FacetMixin, ListOrderingMixin, DataMixin, ListView):
     """Handles viewing Actors by their tag."""
 
     model = Actor
@@ -146,6 +189,10 @@ class TagListView(DataMixin, ListView):
     context_object_name = 'actors'
     paginate_by = 10
     allow_empty = False
+    query_budget = 8
+
+    def get_filter_slugs(self) -> tuple[str | None, tuple[str, ...]]:
+        return None, (self.kwargs['tag_slug'],)
 
     def get_context_data(self, **kwargs) -> dict:
         """
@@ -157,9 +204,9 @@ class TagListView(DataMixin, ListView):
         Returns:
             context: A dict representing the context.
         """
-        tag = get_object_or_404(klass=Tag, slug=self.kwargs['tag_slug'])
+        _, _, (tag,) = self.facet_filter
         context = super().get_context_data(**kwargs)
-        return self.get_mixin_context(context=context, title=f'Tag - {tag.name}')
+        return self.get_mixin_context(context=context, title=f'Tag - {tag.name}', **self.get_facet_context())
 
     def get_queryset(self) -> QuerySet[Actor]:
         """Get the queryset for this view.
@@ -170,15 +217,67 @@ class TagListView(DataMixin, ListView):
         Returns:
             Queryset of Actor within a specific tag.
         """
-        return Actor.published.filter(tags__slug=self.kwargs['tag_slug'])
+        queryset = self.filter_by_facets(Actor.published.all())
+        return self.order_queryset(queryset.select_related('category', 'author'))
+
+
+class FacetedListView(CachedPageMixin, FacetMixin, ListOrderingMixin, DataMixin, ListView):
+    """Handles viewing Actors by a category and tags combined, e.g. `browse/?category=men&tag=oscar&tag=comedy`.
+
+    The category and tag pages link here when a visitor drills down further, instead of to another single list.
+    """
+
+    model = Actor
+    template_name = 'actors/index.html'
+    context_object_name = 'actors'
+    paginate_by = 10
+    allow_empty = False
+    title_page = 'Browse'
+    cache_params = ('category', 'tag', 'page', 'order')
+    query_budget = 8
+
+    def get_context_data(self, **kwargs) -> dict:
+        """
+        Get the context for this view.
+
+        Args:
+            **kwargs: additional named parameters.
+
+        Returns:
+            context: A dict representing the context.
+        """
+        _, category, tags = self.facet_filter
+        names = [f'Category - {category.name}'] if category else []
+        if tags:
+            names.append(f'Tags - {", ".join(tag.name for tag in tags)}')
+        params = filter_params(category and category.slug, [tag.slug for tag in tags])
+        context = super().get_context_data(**kwargs)
+        return self.get_mixin_context(
+            context=context,
+            title=', '.join(names) or self.title_page,
+            # Prefix of the pagination and ordering links, which keep the filter.
+            filter_query=f'{urlencode(params)}&' if params else '',
+            **self.get_facet_context(),
+        )
 
+    def get_queryset(self) -> QuerySet[Actor]:
+        """Get the queryset for this view.
+
+        Returns:
+            Queryset of published Actors in the selected category, if any, having every selected tag.
+        """
+        queryset = self.filter_by_facets(Actor.published.all())
+        return self.order_queryset(queryset.select_related('category', 'author'))
 
+
+@method_decorator(transaction.atomic, name='post')
 class ActorCreateView(LoginRequiredMixin, DataMixin, CreateView):
     """Handles form view to create a new Actor."""
 
     form_class = ActorForm
     template_name = 'actors/form.html'
     title_page = 'Add post'
+    query_budget = 7
 
     def form_valid(self, form):
         """Saves the form and assigns the current login user as the author.
@@ -191,6 +290,7 @@ class ActorCreateView(LoginRequiredMixin, DataMixin, CreateView):
         return super().form_valid(form)
 
 
+@method_decorator(transaction.atomic, name='post')
 class ActorUpdateView(LoginRequiredMixin, DataMixin, UpdateView):
     """Handles form view to update an existing Actor."""
 
@@ -198,3 +298,307 @@ class ActorUpdateView(LoginRequiredMixin, DataMixin, UpdateView):
     form_class = ActorForm
     template_name = 'actors/form.html'
     title_page = 'Edit post'
+    query_budget = 16
+
+
+class AutocompleteView(LoginRequiredMixin, View):
+    """Serves paginated JSON choices for the autocomplete widgets of ActorForm.
+
+    The response has the format of the admin's autocomplete endpoint:
+    {"results": [{"id": "1", "text": "..."}], "pagination": {"more": true}}. Every word of the `term` parameter
+    must match the start of one of the source's search fields.
+
+    Attributes:
+        paginate_by (int): Number of choices per page.
+        search_fields (dict): Fields searched for each source.
+    """
+
+    paginate_by = 20
+    query_budget = 3
+    search_fields = {
+        'category': ('name',),
+        'tag': ('name',),
+        'producer': ('first_name', 'last_name'),
+    }
+
+    def get_source_queryset(self, source: str) -> QuerySet:
+        """Get the objects a source chooses from.
+
+        Args:
+            source (str): One of 'category', 'tag' or 'producer'.
+
+        Returns:
+            Queryset of the choosable objects; producers already assigned to an actor are left out.
+        """
+        if source == 'category':
+            return Category.objects.order_by('name', 'pk')
+        if source == 'tag':
+            return Tag.objects.order_by('name')
+        return Producer.objects.filter(producer=None).order_by('last_name', 'first_name', 'pk')
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """
+        Handle a GET request for this view.
+
+        Args:
+            request(HttpRequest): The request instance.
+            *args: additional positional parameters.
+            **kwargs: additional named parameters.
+
+        Returns:
+            JsonResponse: One page of matching choices.
+
+        Raises:
+            Http404: If the source is unknown.
+        """
+        source = kwargs['source']
+        if source not in self.search_fields:
+            raise Http404('Unknown autocomplete source.')
+        try:
+            page = max(int(request.GET.get('page') or 1), 1)
+        except ValueError:
+            page = 1
+
+        queryset = self.get_source_queryset(source)
+        for word in request.GET.get('term', '').split():
+            condition = Q()
+            for field in self.search_fields[source]:
+                condition |= Q(**{f'{field}__istartswith': word})
+            queryset = queryset.filter(condition)
+
+        offset = (page - 1) * self.paginate_by
+        objects = list(queryset[offset : offset + self.paginate_by + 1])
+        results = [{'id': str(obj.pk), 'text': str(obj)} for obj in objects[: self.paginate_by]]
+        return JsonResponse({'results': results, 'pagination': {'more': len(objects) > self.paginate_by}})
+
+
+class SitemapIndexView(View):
+    """Serves the sitemap index listing the actor shards and the category and tag sitemaps."""
+
+    query_budget = 1
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        return HttpResponse(render_index(request.build_absolute_uri('/')[:-1]), content_type='application/xml')
+
+
+class ActorSitemapView(View):
+    """Serves one shard of the actor sitemap, streamed from the database or from the shard cache."""
+
+    query_budget = 1
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """
+        Handle a GET request for this view.
+
+        Args:
+            request(HttpRequest): The request instance.
+            *args: additional positional parameters.
+            **kwargs: additional named parameters.
+
+        Returns:
+            HttpResponse: The shard, streamed chunk by chunk.
+
+        Raises:
+            Http404: If the shard has no published actors.
+        """
+        shard = cached_actor_shard(kwargs['shard'], request.build_absolute_uri('/')[:-1])
+        if shard is None:
+            raise Http404('Empty sitemap shard.')
+        if isinstance(shard, Path):
+            return FileResponse(shard.open('rb'), content_type='application/xml')
+        return StreamingHttpResponse(shard, content_type='application/xml')
+
+
+class SectionSitemapView(View):
+    """Serves the sitemap of the category or the tag lists."""
+
+    query_budget = 1
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        content = render_section(kwargs['section'], request.build_absolute_uri('/')[:-1])
+        return HttpResponse(content, content_type='application/xml')
+
+
+class PrefetchedWindow:
+    """One page of rows plus the total count, shaped so that Paginator can use it without querying.
+
+    Attributes:
+        rows (list): The rows of the requested page.
+        total (int): Number of rows across all pages.
+    """
+
+    def __init__(self, rows: list, total: int) -> None:
+        self.rows = rows
+        self.total = total
+
+    def count(self) -> int:
+        return self.total
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __getitem__(self, item):
+        return self.rows
+
+
+class AsyncListMixin:
+    """Natively async GET handler for the actor list views, used under ASGI.
+
+    Anonymous visitors are served through the page cache like the sync views, see CachedPageMixin; a miss or a
+    refresh renders the sync view on a worker thread. Otherwise the page rows, the total count, the sidebar and
+    the view-specific context are awaited concurrently with the async ORM. Everything the templates need,
+    including request.user, is resolved before rendering, so no query runs synchronously inside the event loop.
+    The queryset, pagination and template come from the sync view it is mixed into.
+    """
+
+    async def resolve_filter(self) -> None:
+        """Resolve what the queryset depends on before it is built; nothing by default."""
+
+    async def get_sidebar_context(self) -> dict:
+        """Return the sidebar context entries. They are awaited alongside the page queries."""
+        return await get_sidebar()
+
+    async def get_extra_context(self) -> dict:
+        """Return view-specific context, such as the title. It is awaited alongside the page queries."""
+        return {}
+
+    async def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """
+        Handle a GET request for this view.
+
+        Args:
+            request(HttpRequest): The request instance.
+            *args: additional positional parameters.
+            **kwargs: additional named parameters.
+
+        Returns:
+            HttpResponse: The cached or rendered response.
+
+        Raises:
+            Http404: If the page number is invalid or the list is empty while allow_empty is False.
+        """
+        # The page cache is for anonymous visitors only, so the user is needed first.
+        request.user = await request.auser()
+        key = self.get_page_cache_key()
+        if key is None:
+            return await self.render_list(request)
+        render = functools.partial(self.render_page, copy.copy(request), args, kwargs)
+        page = sync_to_async(page_cache.get)
+        content, content_type = await page(key, render, view=request.resolver_match.view_name)
+        return HttpResponse(content, content_type=content_type)
+
+    async def render_list(self, request: HttpRequest) -> HttpResponse:
+        """Render the requested page of the list with the async ORM."""
+        await self.resolve_filter()
+        queryset = self.get_queryset()
+        page_number = request.GET.get(self.page_kwarg) or 1
+        total = None
+        if page_number == 'last':
+            # The offset of the last page depends on the total, so it is counted first.
+            total = await queryset.acount()
+            number = Paginator(PrefetchedWindow([], total), self.paginate_by).num_pages
+        else:
+            try:
+                number = int(page_number)
+            except ValueError:
+                raise Http404('Page is not “last”, nor can it be converted to an int.')
+        if number < 1:
+            raise Http404('That page number is less than 1')
+
+        offset = (number - 1) * self.paginate_by
+        total, rows, sidebar, extra = await asyncio.gather(
+            queryset.acount() if total is None else asyncio.sleep(0, total),
+            alist(queryset[offset : offset + self.paginate_by]),
+            self.get_sidebar_context(),
+            self.get_extra_context(),
+        )
+        if not total and not self.allow_empty:
+            raise Http404('Empty list and “allow_empty” is False.')
+
+        paginator = Paginator(PrefetchedWindow(rows, total), self.paginate_by)
+        try:
+            page = paginator.page(number)
+        except InvalidPage as error:
+            raise Http404(f'Invalid page ({number}): {error}')
+
+        context = {
+            'paginator': paginator,
+            'page_obj': page,
+            'is_paginated': page.has_other_pages(),
+            'object_list': rows,
+            self.context_object_name: rows,
+            'view': self,
+            **sidebar,
+        }
+        context = self.get_mixin_context(context=context, **extra)
+        return render(request=request, template_name=self.template_name, context=context)
+
+
+class AsyncFacetListMixin(AsyncListMixin):
+    """Async GET handler for the list views of FacetMixin, whose sidebar shows the facets of their filter.
+
+    The filter and the facet counts go through the sync caches of FacetMixin on a worker thread.
+    """
+
+    async def resolve_filter(self) -> None:
+        await sync_to_async(lambda: self.facet_filter)()
+
+    async def get_sidebar_context(self) -> dict:
+        return await sync_to_async(self.get_facet_context)()
+
+
+class AsyncIndexListView(AsyncListMixin, IndexListView):
+    """Async counterpart of IndexListView."""
+
+
+class AsyncCategoryListView(AsyncFacetListMixin, CategoryListView):
+    """Async counterpart of CategoryListView."""
+
+    async def get_extra_context(self) -> dict:
+        _, category, _ = self.facet_filter
+        return {'title': f'Category - {category.name}'}
+
+
+class AsyncTagListView(AsyncFacetListMixin, TagListView):
+    """Async counterpart of TagListView."""
+
+    async def get_extra_context(self) -> dict:
+        _, _, (tag,) = self.facet_filter
+        return {'title': f'Tag - {tag.name}'}
+
+
+class AsyncActorDetailView(ActorDetailView):
+    """Async counterpart of ActorDetailView; the actor, sidebar data and user are awaited concurrently."""
+
+    async def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """
+        Handle a GET request for this view.
+
+        Args:
+            request(HttpRequest): The request instance.
+            *args: additional positional parameters.
+            **kwargs: additional named parameters.
+
+        Returns:
+            HttpResponse: The rendered response.
+
+        Raises:
+            Http404: If no published actor has the given slug.
+        """
+        try:
+            actor, sidebar, user = await asyncio.gather(
+                self.get_queryset().aget(slug=self.kwargs[self.slug_url_kwarg]),
+                get_sidebar(),
+                request.auser(),
+            )
+        except Actor.DoesNotExist:
+            raise Http404('No Actor matches the given query.')
+        request.user = user
+        view_counter.hit(actor.pk)
+        context = {'object': actor, self.context_object_name: actor, 'view': self, **sidebar}
+        context = self.get_mixin_context(
+            context=context,
+            title=f'Actor - {actor.get_full_name()}',
+            selected_category=actor.category.slug,
+        )
+        return render(request=request, template_name=self.template_name, context=context)
@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'actors_django.settings')
+# Serve the public actor pages with their natively async views.
+os.environ.setdefault('ACTORS_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
+
+# Warm up before serving; in the master process of a pre-forking server the workers inherit the result.
+if os.environ.get('ACTORS_WARM_UP') == '1':
+    from actors_django.warmup import warm_up
+
+    warm_up()
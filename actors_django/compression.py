@@ -0,0 +1,139 @@
+import hashlib
+import re
+import time
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import record_cache
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MIN_SIZE': 512,
+    'MINIFY_HTML': True,
+    # (maximum body size in bytes, gzip level): small bodies get the best ratio, large ones the cheapest level.
+    'LEVELS': ((16 * 1024, 9), (256 * 1024, 6), (None, 4)),
+    'STREAMING_LEVEL': 6,
+    'CACHE': 'compressed',
+    'CACHE_TIMEOUT': 600,
+    'CACHE_MAX_SIZE': 1024 * 1024,
+}
+
+# Elements whose whitespace is significant, kept untouched by minify_html.
+PRESERVED = re.compile(rb'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.S | re.I)
+NEWLINE_SPACE = re.compile(rb'[ \t\r\f]*\n\s*')
+SPACES = re.compile(rb'[ \t\r\f]{2,}')
+
+
+def get_config() -> dict:
+    return {**DEFAULTS, **getattr(settings, 'COMPRESSION', {})}
+
+
+def minify_html(content: bytes) -> bytes:
+    """Collapse insignificant whitespace in an HTML document.
+
+    Runs of whitespace spanning lines become one newline and other runs one space, which renders the same, since
+    browsers collapse whitespace between inline content anyway. <pre>, <textarea>, <script> and <style> elements
+    are left as they are.
+    """
+    parts = PRESERVED.split(content)
+    # split() returns text, whole preserved element, element name, text, ...
+    for index in range(0, len(parts), 3):
+        parts[index] = SPACES.sub(b' ', NEWLINE_SPACE.sub(b'\n', parts[index]))
+    return b''.join(part for index, part in enumerate(parts) if index % 3 != 2).strip() + b'\n'
+
+
+def gzip_level(size: int, levels: tuple) -> int:
+    """Pick the gzip level for a body of `size` bytes from (maximum size, level) pairs."""
+    for limit, level in levels:
+        if limit is None or size <= limit:
+            return level
+    return levels[-1][1]
+
+
+def gzip_compress(content: bytes, level: int) -> bytes:
+    """Gzip a body without a timestamp in the header, so identical bodies compress to identical bytes."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(content) + compressor.flush()
+
+
+def compress_body(content: bytes, config: dict) -> tuple[bytes, float, bool]:
+    """Gzip a response body, reusing the compressed bytes of an identical body from the cache.
+
+    Bodies are cached by a digest of their content, so a page served again unchanged, whether from a page cache or
+    re-rendered, is only compressed once per CACHE_TIMEOUT.
+
+    Args:
+        content (bytes): Uncompressed body.
+        config (dict): COMPRESSION settings.
+
+    Returns:
+        tuple[bytes, float, bool]: Compressed body, CPU seconds the compression took (when it ran, or when the cached
+            bytes were produced) and whether the bytes came from the cache.
+    """
+    level = gzip_level(len(content), config['LEVELS'])
+    cacheable = config['CACHE'] and len(content) <= config['CACHE_MAX_SIZE']
+    if cacheable:
+        key = f'gzip:{level}:{hashlib.sha1(content).hexdigest()}'
+        cached = caches[config['CACHE']].get(key)
+        record_cache('compressed_body', cached is not None)
+        if cached is not None:
+            return cached[0], cached[1], True
+    started = time.thread_time()
+    compressed = gzip_compress(content, level)
+    cpu = time.thread_time() - started
+    if cacheable:
+        caches[config['CACHE']].set(key, (compressed, cpu), config['CACHE_TIMEOUT'])
+    return compressed, cpu, False
+
+
+class StreamStats:
+    """Sizes and CPU time of an incrementally compressed stream, complete once the stream is exhausted."""
+
+    def __init__(self) -> None:
+        self.original = 0
+        self.compressed = 0
+        self.cpu = 0.0
+
+
+def compress_chunk(compressor, stats: StreamStats, chunk: bytes | None) -> bytes:
+    """Compress and flush one chunk of a stream, or finish the stream when `chunk` is None."""
+    started = time.thread_time()
+    if chunk is None:
+        data = compressor.flush()
+    else:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        stats.original += len(chunk)
+    stats.cpu += time.thread_time() - started
+    stats.compressed += len(data)
+    return data
+
+
+def compress_stream(chunks, level: int, stats: StreamStats, on_close):
+    """Gzip an iterator of chunks incrementally, flushing after every chunk so none is held back.
+
+    Args:
+        chunks: Iterator of byte strings.
+        level (int): Gzip level.
+        stats (StreamStats): Updated with the sizes and CPU time as the stream is consumed.
+        on_close: Called without arguments once the stream is exhausted.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compress_chunk(compressor, stats, chunk)
+        if data:
+            yield data
+    yield compress_chunk(compressor, stats, None)
+    on_close()
+
+
+async def acompress_stream(chunks, level: int, stats: StreamStats, on_close):
+    """Asynchronous version of compress_stream for async streaming responses."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = compress_chunk(compressor, stats, chunk)
+        if data:
+            yield data
+    yield compress_chunk(compressor, stats, None)
+    on_close()
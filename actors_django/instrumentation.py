@@ -0,0 +1,190 @@
+import re
+import time
+import traceback
+from collections import Counter
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+
+
+class RequestStats:
+    """Timing figures collected while a single request is handled.
+
+    Attributes:
+        started (float): perf_counter value when the request entered the middleware.
+        total (float): Seconds spent handling the whole request.
+        db_time (float): Seconds spent executing SQL.
+        db_queries (int): Number of executed SQL statements.
+        template_time (float): Seconds spent rendering the template of a TemplateResponse.
+        queries (list): (sql, seconds, alias) tuples of the executed statements, capped at `query_limit`.
+        query_limit (int): How many statements to keep the SQL of.
+    """
+
+    def __init__(self, query_limit: int = 50) -> None:
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.db_time = 0.0
+        self.db_queries = 0
+        self.template_time = 0.0
+        self.queries = []
+        self.query_limit = query_limit
+        self._template_started = None
+
+    def record_query(self, sql: str, seconds: float, alias: str) -> None:
+        self.db_queries += 1
+        self.db_time += seconds
+        if len(self.queries) < self.query_limit:
+            self.queries.append((sql, seconds, alias))
+
+    def template_started(self) -> None:
+        self._template_started = time.perf_counter()
+
+    def template_finished(self) -> None:
+        if self._template_started is not None:
+            self.template_time += time.perf_counter() - self._template_started
+            self._template_started = None
+
+    def finish(self) -> None:
+        self.total = time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Return the figures formatted as a Server-Timing header value."""
+        return ', '.join(
+            (
+                f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"',
+                f'tpl;dur={self.template_time * 1000:.1f}',
+                f'total;dur={self.total * 1000:.1f}',
+            )
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            'db_queries': self.db_queries,
+            'db_ms': round(self.db_time * 1000, 1),
+            'template_ms': round(self.template_time * 1000, 1),
+            'total_ms': round(self.total * 1000, 1),
+        }
+
+
+class QueryRecorder:
+    """Database execute wrapper timing every statement into a RequestStats instance."""
+
+    def __init__(self, stats: RequestStats, alias: str) -> None:
+        self.stats = stats
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.stats.record_query(sql, time.perf_counter() - started, self.alias)
+
+
+@contextmanager
+def record_queries(stats: RequestStats):
+    """Time every statement executed on any configured database while the block runs.
+
+    Args:
+        stats (RequestStats): The object the statements are recorded into.
+    """
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(QueryRecorder(stats, alias)))
+        yield stats
+
+
+IN_LIST_RE = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)')
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+\b')
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a view runs more queries than its budget or repeats a query shape (an N+1 pattern)."""
+
+
+def fingerprint(sql: str) -> str:
+    """Reduce a SQL statement to its shape by collapsing literals and IN lists.
+
+    Args:
+        sql (str): The statement as passed to the database cursor.
+
+    Returns:
+        str: The statement with literals replaced by '?' and IN lists collapsed to 'IN (...)'.
+    """
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    return IN_LIST_RE.sub('IN (...)', sql)
+
+
+class QueryInspector:
+    """Execute wrapper counting statements and grouping them by shape to spot N+1 patterns.
+
+    Attributes:
+        repeat_threshold (int): How many executions of one shape count as an N+1 pattern.
+        capture_stacks (bool): Whether to keep the stack of the query that crossed the threshold.
+        count (int): Number of statements executed so far.
+        shapes (dict): Number of executions per statement shape.
+        stacks (dict): Formatted stack per repeated shape, filled when capture_stacks is set.
+    """
+
+    def __init__(self, repeat_threshold: int = 3, capture_stacks: bool = False) -> None:
+        self.repeat_threshold = repeat_threshold
+        self.capture_stacks = capture_stacks
+        self.count = 0
+        self.shapes = Counter()
+        self.stacks = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        shape = fingerprint(sql)
+        self.shapes[shape] += 1
+        if self.capture_stacks and self.shapes[shape] == self.repeat_threshold:
+            self.stacks[shape] = ''.join(traceback.format_stack()[:-1])
+        return execute(sql, params, many, context)
+
+    @property
+    def repeated(self) -> dict[str, int]:
+        """Shapes executed at least `repeat_threshold` times with their execution counts."""
+        return {shape: count for shape, count in self.shapes.items() if count >= self.repeat_threshold}
+
+    def violations(self, budget: int | None) -> list[str]:
+        """Describe every budget or repetition violation seen so far.
+
+        Args:
+            budget (int | None): Maximum number of allowed statements, None for no limit.
+
+        Returns:
+            list: Human readable violation messages, empty if the request was within limits.
+        """
+        messages = []
+        if budget is not None and self.count > budget:
+            messages.append(f'{self.count} queries exceed the budget of {budget}.')
+        for shape, count in self.repeated.items():
+            messages.append(f'Query shape executed {count} times: {shape}')
+        return messages
+
+
+@contextmanager
+def inspect_queries(inspector: QueryInspector):
+    """Run every statement executed on any configured database through the inspector while the block runs."""
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(inspector))
+        yield inspector
+
+
+@asynccontextmanager
+async def in_orm_thread(manager):
+    """Enter record_queries() or inspect_queries() from async code.
+
+    Database connections are per thread, and the async ORM runs its queries through sync_to_async in the one thread
+    kept for the request. The manager is entered and exited in that thread, so it wraps the connections used there.
+    """
+    stack = ExitStack()
+    value = await sync_to_async(stack.enter_context)(manager)
+    try:
+        yield value
+    finally:
+        await sync_to_async(stack.close)()
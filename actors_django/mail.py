@@ -0,0 +1,251 @@
+import base64
+import json
+import logging
+import os
+import smtplib
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.smtp import EmailBackend as SMTPEmailBackend
+
+logger = logging.getLogger('actors_django.mail')
+
+DEFAULTS = {
+    'DIRECTORY': None,
+    'DELIVERY_BACKEND': 'django.core.mail.backends.smtp.EmailBackend',
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 8,
+    'RETRY_DELAY': 30.0,
+    'MAX_RETRY_DELAY': 3600.0,
+    'CLAIM_TIMEOUT': 300.0,
+    'DELIVERY_THREAD': True,
+    'INTERVAL': 5.0,
+}
+
+
+def get_config() -> dict:
+    return {**DEFAULTS, **getattr(settings, 'MAIL_SPOOL', {})}
+
+
+def write_atomic(path: Path, data: dict) -> None:
+    """Durably write a spool file: the rename only happens once its content is on disk."""
+    temporary = path.with_name(f'.{path.name}.{os.getpid()}-{uuid.uuid4().hex}.tmp')
+    with temporary.open('w', encoding='utf-8') as file:
+        json.dump(data, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def spool_name(due: float) -> str:
+    # Zero-padded due time first, so that sorting the names sorts the messages by due time.
+    return f'{due:017.6f}-{uuid.uuid4().hex}.json'
+
+
+def enqueue(directory: Path, sender: str, recipients: list[str], message: bytes) -> Path:
+    """Write one message with its envelope to the spool directory, due at once.
+
+    Returns:
+        Path: The spool file.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / spool_name(time.time())
+    data = {'sender': sender, 'recipients': recipients, 'message': base64.b64encode(message).decode(), 'attempts': 0}
+    write_atomic(path, data)
+    return path
+
+
+class SpoolEmailBackend(BaseEmailBackend):
+    """Queues messages in a local spool directory and returns at once, so a request never waits for the mail server.
+
+    Each message is stored as its MIME bytes plus envelope in one file, written with fsync and an atomic rename,
+    so a message accepted by send_messages() survives a crash. A delivery thread started on first use, or
+    `manage.py send_queued_mail` when DELIVERY_THREAD is off, sends the spool with `deliver`.
+    """
+
+    def send_messages(self, email_messages) -> int:
+        config = get_config()
+        if not config['DIRECTORY']:
+            raise ValueError('Set MAIL_SPOOL["DIRECTORY"] to use the spool email backend.')
+        directory = Path(config['DIRECTORY'])
+        sent = 0
+        for message in email_messages:
+            recipients = message.recipients()
+            if not recipients:
+                continue
+            try:
+                enqueue(directory, message.from_email, recipients, message.message().as_bytes(linesep='\r\n'))
+            except Exception:
+                if not self.fail_silently:
+                    raise
+                continue
+            sent += 1
+        if sent and config['DELIVERY_THREAD']:
+            delivery_worker.wake(config['INTERVAL'])
+        return sent
+
+
+def retry_delay(attempts: int, config: dict) -> float:
+    """Seconds to wait before the next attempt: RETRY_DELAY doubled after every failure, up to MAX_RETRY_DELAY."""
+    return min(config['RETRY_DELAY'] * 2 ** (attempts - 1), config['MAX_RETRY_DELAY'])
+
+
+def claim_due(directory: Path, limit: int, config: dict) -> list[Path]:
+    """Claim up to `limit` due messages by renaming them, so that concurrent deliverers never send one twice.
+
+    Claims older than CLAIM_TIMEOUT, left behind by a deliverer that died, are released first. A deliverer renews
+    its claim before sending each message (see read_claim), so only a claim that waited that long is taken back.
+    """
+    now = time.time()
+    for claim in directory.glob('*.claimed'):
+        try:
+            if now - claim.stat().st_mtime > config['CLAIM_TIMEOUT']:
+                os.replace(claim, directory / claim.name.split('.claimed')[0].rsplit('.', 1)[0])
+        except FileNotFoundError:
+            continue
+    claimed = []
+    for path in sorted(directory.glob('*.json')):
+        if len(claimed) >= limit or float(path.name.split('-')[0]) > now:
+            break
+        claim = path.with_name(f'{path.name}.{os.getpid()}.claimed')
+        try:
+            os.replace(path, claim)
+        except FileNotFoundError:
+            continue
+        os.utime(claim)
+        claimed.append(claim)
+    return claimed
+
+
+def read_claim(claim: Path) -> dict | None:
+    """Renew a claim and read its message, or return None when another deliverer took the claim back meanwhile."""
+    try:
+        os.utime(claim)
+        return json.loads(claim.read_text())
+    except FileNotFoundError:
+        return None
+
+
+def release_pending(claims: list[Path], config: dict) -> None:
+    """Give claimed messages that weren't attempted back to the spool, due at once."""
+    for claim in claims:
+        data = read_claim(claim)
+        if data is not None:
+            release(claim, data, config)
+
+
+def release(claim: Path, data: dict, config: dict, error: Exception | None = None) -> None:
+    """Give a claimed message back to the spool for a later attempt, or move it to failed/ after MAX_ATTEMPTS."""
+    if error is not None:
+        data['attempts'] += 1
+        data['error'] = str(error)
+    if data['attempts'] >= config['MAX_ATTEMPTS']:
+        failed = claim.parent / 'failed'
+        failed.mkdir(exist_ok=True)
+        write_atomic(failed / (claim.name.split('.json')[0] + '.json'), data)
+        logger.error('Giving up on mail to %s after %d attempts: %s', data['recipients'], data['attempts'], error)
+    else:
+        due = time.time() + (retry_delay(data['attempts'], config) if error is not None else 0)
+        write_atomic(claim.parent / spool_name(due), data)
+    claim.unlink(missing_ok=True)
+
+
+def is_permanent(error: smtplib.SMTPException) -> bool:
+    """Whether the server refused a message for good (5xx), rather than for now (4xx)."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return error.smtp_code >= 500
+
+
+def deliver(directory=None, config: dict | None = None) -> tuple[int, int]:
+    """Send the due messages of the spool in batches of BATCH_SIZE over one connection of DELIVERY_BACKEND.
+
+    DELIVERY_BACKEND must be an SMTP backend: the messages are handed over as stored, envelope and MIME bytes, and
+    the server's reply codes decide what is retried.
+
+    The connection stays open from one batch to the next until the spool has no due message left. A message the
+    server refuses temporarily (4xx), or that was being sent when the connection broke, is retried after
+    retry_delay(); one refused permanently (5xx) or MAX_ATTEMPTS times is moved to the failed/ subdirectory. When
+    the server can't be reached at all, the messages are left in the spool as they are.
+
+    Returns:
+        tuple[int, int]: Number of delivered messages and of failed attempts.
+    """
+    config = config or get_config()
+    directory = Path(directory or config['DIRECTORY'])
+    if not directory.is_dir():
+        return 0, 0
+    delivered = failed = 0
+    backend = get_connection(config['DELIVERY_BACKEND'], fail_silently=False)
+    if not isinstance(backend, SMTPEmailBackend):
+        raise ImproperlyConfigured('MAIL_SPOOL["DELIVERY_BACKEND"] must be an SMTP email backend.')
+    try:
+        while claimed := claim_due(directory, config['BATCH_SIZE'], config):
+            if backend.connection is None:
+                try:
+                    backend.open()
+                except OSError as error:
+                    release_pending(claimed, config)
+                    logger.warning('Mail server unreachable: %s', error)
+                    break
+            for index, claim in enumerate(claimed):
+                data = read_claim(claim)
+                if data is None:
+                    continue
+                try:
+                    backend.connection.sendmail(data['sender'], data['recipients'], base64.b64decode(data['message']))
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as error:
+                    failed += 1
+                    if is_permanent(error):
+                        data['attempts'] = config['MAX_ATTEMPTS'] - 1
+                    release(claim, data, config, error)
+                except OSError as error:
+                    # The connection broke: retry this message later and the rest of the batch on the next run.
+                    failed += 1
+                    release(claim, data, config, error)
+                    release_pending(claimed[index + 1 :], config)
+                    logger.warning('Mail delivery interrupted: %s', error)
+                    return delivered, failed
+                else:
+                    delivered += 1
+                    claim.unlink(missing_ok=True)
+        return delivered, failed
+    finally:
+        try:
+            backend.close()
+        except OSError:
+            pass
+
+
+class DeliveryWorker:
+    """Delivers the spool from a daemon thread, woken when a message is queued and every INTERVAL seconds."""
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def wake(self, interval: float) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, args=(interval,), name='mail-delivery', daemon=True)
+                self._thread.start()
+        self._event.set()
+
+    def _run(self, interval: float) -> None:
+        while True:
+            self._event.wait(interval)
+            self._event.clear()
+            try:
+                deliver()
+            except Exception:
+                logger.exception('Failed to deliver queued mail')
+
+
+delivery_worker = DeliveryWorker()
@@ -0,0 +1,266 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger('actors_django.metrics')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Request latency per URL name.', LATENCY_BUCKETS),
+    'http_response_size_bytes': ('histogram', 'Response body size per URL name.', SIZE_BUCKETS),
+    'http_db_queries': ('histogram', 'Database queries per request per URL name.', QUERY_BUCKETS),
+    'http_responses_total': ('counter', 'Responses per URL name and status code.', None),
+    'cache_requests_total': ('counter', 'Cache lookups per cache and result.', None),
+    'throttled_requests_total': ('counter', 'Requests rejected by the login throttle per scope and key.', None),
+    'http_compression_bytes_saved_total': ('counter', 'Response bytes saved per URL name and step.', None),
+    'http_compression_cpu_seconds_total': ('counter', 'CPU seconds spent on minifying and compressing.', None),
+    'http_compression_cpu_seconds_saved_total': ('counter', 'CPU seconds saved by reusing compressed bodies.', None),
+    'page_cache_stale_total': ('counter', 'Stale cached pages served while they are refreshed, per URL name.', None),
+    'page_cache_coalesced_total': ('counter', 'Requests that waited for another render of the same page.', None),
+}
+
+# Totals of the worker processes that exited, in the multi-process directory.
+RETIRED_FILE = 'retired.json'
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_rows(path: Path, totals: dict) -> None:
+    """Add the totals dumped in a metrics file to `totals`."""
+    for name, labels, suffix, value in json.loads(path.read_text()):
+        totals[(name, tuple(map(tuple, labels)), suffix)] += value
+
+
+def write_rows(path: Path, totals: dict) -> None:
+    """Atomically dump totals to a metrics file, through a temporary file no other thread or process writes."""
+    rows = [[name, labels, suffix, value] for (name, labels, suffix), value in totals.items()]
+    temporary = path.with_name(f'.{path.name}.{os.getpid()}-{uuid.uuid4().hex}.tmp')
+    temporary.write_text(json.dumps(rows))
+    os.replace(temporary, path)
+
+
+class MetricsRegistry:
+    """Process-wide metric store with one shard per thread.
+
+    Every thread increments its own dictionary, so recording never takes a lock; the shards are only merged when
+    the metrics are collected. The shards of threads that ended are folded into one retired shard, so a server
+    that recycles its threads doesn't keep one dictionary per thread it ever ran. In multi-process mode each
+    process also dumps its merged totals to `<directory>/<pid>.json` at most every `flush_interval` seconds, one
+    thread at a time, and collection sums all files; the files of exited processes are folded into RETIRED_FILE.
+
+    Attributes:
+        directory (Path | None): Shared directory for multi-process aggregation, None for in-process only.
+        flush_interval (float): Minimum number of seconds between two dumps of this process' totals.
+    """
+
+    def __init__(self, directory: str | None = None, flush_interval: float = 5.0) -> None:
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._shards = {}
+        self._retired = defaultdict(float)
+        self._shards_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = defaultdict(float)
+            with self._shards_lock:
+                self._retire_dead_threads()
+                self._shards[threading.current_thread()] = shard
+        return shard
+
+    def _retire_dead_threads(self) -> None:
+        # Called with _shards_lock held. A thread that ended can't write to its shard any more.
+        for thread in [thread for thread in self._shards if not thread.is_alive()]:
+            for key, value in self._shards.pop(thread).items():
+                self._retired[key] += value
+
+    def inc(self, name: str, labels: tuple, amount: float = 1) -> None:
+        """Increase a counter.
+
+        Args:
+            name (str): Metric name, one of METRICS.
+            labels (tuple): Sorted (label, value) pairs.
+            amount (float): Value to add.
+        """
+        self._shard()[(name, labels, '')] += amount
+        self._maybe_flush()
+
+    def observe(self, name: str, labels: tuple, value: float) -> None:
+        """Record one observation into a histogram with the buckets declared in METRICS."""
+        shard = self._shard()
+        for bound in METRICS[name][2]:
+            if value <= bound:
+                shard[(name, labels, str(bound))] += 1
+        shard[(name, labels, '+Inf')] += 1
+        shard[(name, labels, 'sum')] += value
+        self._maybe_flush()
+
+    def snapshot(self) -> dict:
+        """Merge the thread shards of this process into one dictionary."""
+        with self._shards_lock:
+            self._retire_dead_threads()
+            totals = defaultdict(float, self._retired)
+            shards = list(self._shards.values())
+        for shard in shards:
+            for key, value in list(shard.items()):
+                totals[key] += value
+        return totals
+
+    def collect(self) -> dict:
+        """Return the totals of this process, plus those of the other processes in multi-process mode."""
+        totals = self.snapshot()
+        if self.directory is None:
+            return totals
+        self.prune()
+        own = f'{os.getpid()}.json'
+        for path in self.directory.glob('*.json'):
+            if path.name == own:
+                continue
+            try:
+                read_rows(path, totals)
+            except (OSError, ValueError):
+                continue
+        return totals
+
+    def flush(self) -> None:
+        """Atomically write this process' totals to the shared directory."""
+        if self.directory is None:
+            return
+        with self._flush_lock:
+            self._write()
+
+    def _write(self) -> None:
+        # Called with _flush_lock held.
+        self._last_flush = time.monotonic()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        write_rows(self.directory / f'{os.getpid()}.json', self.snapshot())
+
+    def _maybe_flush(self) -> None:
+        if self.directory is None or time.monotonic() - self._last_flush < self.flush_interval:
+            return
+        # When another thread is flushing, it writes the same totals.
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self._write()
+        except OSError:
+            # Recording a metric must never fail the request it measures.
+            logger.exception('Failed to flush metrics to %s', self.directory)
+        finally:
+            self._flush_lock.release()
+
+    def prune(self) -> int:
+        """Fold the files of exited processes into RETIRED_FILE, keeping the totals monotonic.
+
+        Processes prune under an exclusive lock on the directory, so every file is folded once.
+
+        Returns:
+            int: Number of folded process files.
+        """
+        dead = [path for path in self.directory.glob('*.json') if path.stem.isdigit() and not pid_alive(int(path.stem))]
+        if not dead:
+            return 0
+        folded = 0
+        with (self.directory / '.retired.lock').open('a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            retired, totals = self.directory / RETIRED_FILE, defaultdict(float)
+            if retired.exists():
+                read_rows(retired, totals)
+            for path in dead:
+                try:
+                    read_rows(path, totals)
+                except FileNotFoundError:
+                    # Folded by another process.
+                    continue
+                except ValueError:
+                    pass
+                folded += 1
+            if folded:
+                write_rows(retired, totals)
+            for path in dead:
+                path.unlink(missing_ok=True)
+        return folded
+
+    def reset(self) -> None:
+        with self._shards_lock:
+            self._retired.clear()
+            for shard in self._shards.values():
+                shard.clear()
+
+
+def escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in pairs) + '}'
+
+
+def render(totals: dict) -> str:
+    """Render metric totals in the Prometheus text exposition format."""
+    grouped = defaultdict(lambda: defaultdict(dict))
+    for (name, labels, suffix), value in totals.items():
+        grouped[name][labels][suffix] = value
+
+    lines = []
+    for name, (kind, description, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, values in sorted(grouped.get(name, {}).items()):
+            if kind == 'counter':
+                lines.append(f'{name}{format_labels(labels)} {format_value(values[""])}')
+                continue
+            for bound in buckets:
+                count = values.get(str(bound), 0)
+                lines.append(f'{name}_bucket{format_labels(labels, (("le", str(bound)),))} {format_value(count)}')
+            total = format_value(values.get('+Inf', 0))
+            lines.append(f'{name}_bucket{format_labels(labels, (("le", "+Inf"),))} {total}')
+            lines.append(f'{name}_sum{format_labels(labels)} {format_value(values.get("sum", 0))}')
+            lines.append(f'{name}_count{format_labels(labels)} {total}')
+    return '\n'.join(lines) + '\n'
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a lookup in one of the project's caches.
+
+    Args:
+        cache (str): Name identifying the cache, e.g. 'sidebar'.
+        hit (bool): Whether the lookup was served from the cache.
+    """
+    registry.inc('cache_requests_total', (('cache', cache), ('result', 'hit' if hit else 'miss')))
+
+
+registry = MetricsRegistry(
+    directory=getattr(settings, 'METRICS', {}).get('MULTIPROCESS_DIR'),
+    flush_interval=getattr(settings, 'METRICS', {}).get('FLUSH_INTERVAL', 5.0),
+)
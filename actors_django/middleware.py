@@ -0,0 +1,580 @@
+import logging
+import mimetypes
+import os
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpRequest, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+
+from .compression import StreamStats, acompress_stream, compress_body, compress_stream, get_config, minify_html
+from .instrumentation import (
+    QueryBudgetExceeded,
+    QueryInspector,
+    RequestStats,
+    in_orm_thread,
+    inspect_queries,
+    record_queries,
+)
+from .metrics import registry
+from .routers import get_replicas, primary_pinned, primary_written
+from .staticfiles import ENCODINGS
+
+timing_logger = logging.getLogger('actors_django.timing')
+slow_logger = logging.getLogger('actors_django.timing.slow')
+budget_logger = logging.getLogger('actors_django.query_budget')
+
+
+class HybridMiddleware:
+    """Base of the middleware below, which runs natively in both sync (WSGI) and async (ASGI) chains.
+
+    When the handler below it is a coroutine function, Django calls the instance from the async chain and __call__
+    returns the coroutine of __acall__, so requests to async views are not handed to a thread on their way through.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+
+class RequestTimingMiddleware(HybridMiddleware):
+    """Records per-request DB query count, DB time, template render time and total time.
+
+    The figures are sent back in a Server-Timing header and written as one structured log line per request.
+    Requests slower than SLOW_REQUEST_MS are sampled at SLOW_SAMPLE_RATE and logged together with their SQL.
+    The collected stats are exposed as `request.timing` for middleware placed further down the chain.
+
+    Configured through the REQUEST_TIMING setting; when ENABLED is false the middleware removes itself
+    from the chain at startup, so it costs nothing.
+    """
+
+    defaults = {
+        'ENABLED': True,
+        'HEADER': True,
+        'SLOW_REQUEST_MS': 500,
+        'SLOW_SAMPLE_RATE': 1.0,
+        'QUERY_LIMIT': 50,
+    }
+
+    def __init__(self, get_response) -> None:
+        self.config = {**self.defaults, **getattr(settings, 'REQUEST_TIMING', {})}
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.is_async:
+            return self.__acall__(request)
+        stats = request.timing = RequestStats(query_limit=self.config['QUERY_LIMIT'])
+        with record_queries(stats):
+            response = self.get_response(request)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        stats = request.timing = RequestStats(query_limit=self.config['QUERY_LIMIT'])
+        async with in_orm_thread(record_queries(stats)):
+            response = await self.get_response(request)
+        return self.finish(request, response, stats)
+
+    def finish(self, request: HttpRequest, response: HttpResponse, stats: RequestStats) -> HttpResponse:
+        stats.finish()
+        if self.config['HEADER']:
+            response['Server-Timing'] = stats.server_timing()
+        self.log(request, response, stats)
+        return response
+
+    def process_template_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        """Start the template timer right before a TemplateResponse gets rendered."""
+        stats = request.timing
+        stats.template_started()
+        response.add_post_render_callback(lambda rendered: stats.template_finished())
+        return response
+
+    def log(self, request: HttpRequest, response: HttpResponse, stats: RequestStats) -> None:
+        match = request.resolver_match
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else '',
+            'status': response.status_code,
+            **stats.as_dict(),
+        }
+        timing_logger.info(' '.join(f'{key}={value}' for key, value in fields.items()), extra={'timing': fields})
+
+        slow = stats.total * 1000 >= self.config['SLOW_REQUEST_MS']
+        if slow and random.random() < self.config['SLOW_SAMPLE_RATE']:
+            sql = '\n'.join(
+                f'[{alias}] {seconds * 1000:.1f}ms {statement}' for statement, seconds, alias in stats.queries
+            )
+            slow_logger.warning(
+                'Slow request %s %s took %.1fms with %d queries:\n%s',
+                request.method,
+                request.path,
+                stats.total * 1000,
+                stats.db_queries,
+                sql,
+                extra={'timing': fields},
+            )
+
+
+class QueryBudgetMiddleware(HybridMiddleware):
+    """Enforces per-view query budgets and flags repeated query shapes (N+1 patterns).
+
+    A view declares its budget with a `query_budget` class attribute. In 'raise' mode (used by the test runner)
+    a violation raises QueryBudgetExceeded; in 'log' mode a SAMPLE_RATE fraction of requests is inspected and
+    violations are logged together with the stack of the repeated query.
+
+    Configured through the QUERY_BUDGET setting; MODE 'off' drops the middleware at startup.
+    """
+
+    defaults = {
+        'MODE': 'log',
+        'SAMPLE_RATE': 0.01,
+        'REPEAT_THRESHOLD': 3,
+    }
+
+    def __init__(self, get_response) -> None:
+        if self.get_config()['MODE'] == 'off':
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def get_config(self) -> dict:
+        return {**self.defaults, **getattr(settings, 'QUERY_BUDGET', {})}
+
+    def get_inspector(self) -> QueryInspector | None:
+        """Return the inspector of a request picked for inspection, or None."""
+        config = self.get_config()
+        raising = config['MODE'] == 'raise'
+        if not raising and random.random() >= config['SAMPLE_RATE']:
+            return None
+        return QueryInspector(repeat_threshold=config['REPEAT_THRESHOLD'], capture_stacks=not raising)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.is_async:
+            return self.__acall__(request)
+        inspector = self.get_inspector()
+        if inspector is None:
+            return self.get_response(request)
+        with inspect_queries(inspector):
+            response = self.get_response(request)
+        return self.check(request, response, inspector)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        inspector = self.get_inspector()
+        if inspector is None:
+            return await self.get_response(request)
+        async with in_orm_thread(inspect_queries(inspector)):
+            response = await self.get_response(request)
+        return self.check(request, response, inspector)
+
+    def check(self, request: HttpRequest, response: HttpResponse, inspector: QueryInspector) -> HttpResponse:
+        """Raise or log the budget violations of an inspected request."""
+        match = request.resolver_match
+        view_class = getattr(match.func, 'view_class', None) if match else None
+        violations = inspector.violations(getattr(view_class, 'query_budget', None))
+        if not violations:
+            return response
+
+        view_name = match.view_name if match else request.path
+        if self.get_config()['MODE'] == 'raise':
+            raise QueryBudgetExceeded(f'{view_name}: ' + ' '.join(violations))
+        for message in violations:
+            stack = next((stack for shape, stack in inspector.stacks.items() if shape in message), '')
+            budget_logger.warning('%s: %s%s', view_name, message, f'\n{stack}' if stack else '')
+        return response
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Records latency, response size, DB query count and status code per URL name into the metrics registry.
+
+    Placed first in MIDDLEWARE so it measures the whole chain; the query count is taken from the
+    RequestTimingMiddleware stats when that middleware is enabled.
+
+    Configured through the METRICS setting; when ENABLED is false the middleware removes itself at startup.
+    """
+
+    def __init__(self, get_response) -> None:
+        if not getattr(settings, 'METRICS', {}).get('ENABLED', True):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def record(request: HttpRequest, response: HttpResponse, elapsed: float) -> None:
+        match = request.resolver_match
+        labels = (('view', match.view_name if match else '<unresolved>'),)
+        registry.observe('http_request_duration_seconds', labels, elapsed)
+        registry.inc('http_responses_total', labels + (('status', str(response.status_code)),))
+        if not response.streaming:
+            registry.observe('http_response_size_bytes', labels, len(response.content))
+        stats = getattr(request, 'timing', None)
+        if stats is not None:
+            registry.observe('http_db_queries', labels, stats.db_queries)
+
+
+class ProfilingMiddleware(HybridMiddleware):
+    """Profiles a sampled fraction of requests, or single requests asked for explicitly.
+
+    A request is profiled when it carries a valid signed token (see `manage.py profile_token`) in the X-Profile
+    header, when a staff user adds `?profile=1`, or when it falls into the SAMPLE_RATE fraction. Profiles are
+    written to DIRECTORY as collapsed stacks plus tracemalloc allocation deltas and listed on the staff-only
+    profiles page. One request is profiled at a time; others arriving meanwhile are served without profiling.
+
+    Configured through the PROFILING setting; when ENABLED is false the middleware removes itself at startup.
+    """
+
+    defaults = {
+        'ENABLED': True,
+        'DIRECTORY': None,
+        'ENGINE': 'sampling',
+        'INTERVAL': 0.001,
+        'SAMPLE_RATE': 0.0,
+        'TRACE_ALLOCATIONS': True,
+        'TOKEN_MAX_AGE': 3600,
+        'KEEP': 200,
+    }
+
+    def __init__(self, get_response) -> None:
+        self.config = {**self.defaults, **getattr(settings, 'PROFILING', {})}
+        if not self.config['ENABLED'] or not self.config['DIRECTORY']:
+            raise MiddlewareNotUsed
+        # Imported here, so workers that never profile don't load cProfile, pstats and tracemalloc.
+        from . import profiling
+
+        super().__init__(get_response)
+        self.profiling = profiling
+        self.profiler = profiling.RequestProfiler(
+            directory=self.config['DIRECTORY'],
+            engine=self.config['ENGINE'],
+            interval=self.config['INTERVAL'],
+            trace_allocations=self.config['TRACE_ALLOCATIONS'],
+        )
+
+    def should_profile(self, request: HttpRequest, user=None) -> bool:
+        """Whether to profile the request; `user` is the awaited request.user in async chains."""
+        token = request.headers.get('X-Profile')
+        if token:
+            return self.profiling.check_token(token, max_age=self.config['TOKEN_MAX_AGE'])
+        if request.GET.get('profile') == '1' and (user or request.user).is_staff:
+            return True
+        return random.random() < self.config['SAMPLE_RATE']
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.should_profile(request):
+            return self.get_response(request)
+        response, meta = self.profiler.profile(self.get_response, request)
+        return self.finish(request, response, meta)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        user = await request.auser() if request.GET.get('profile') == '1' else None
+        if not self.should_profile(request, user):
+            return await self.get_response(request)
+        response, meta = await self.profiler.aprofile(self.get_response, request)
+        return self.finish(request, response, meta)
+
+    def finish(self, request: HttpRequest, response: HttpResponse, meta: dict | None) -> HttpResponse:
+        if meta is None:
+            # Another request is being profiled.
+            return response
+        match = request.resolver_match
+        meta.update(
+            view=match.view_name if match else '<unresolved>',
+            method=request.method,
+            path=request.get_full_path(),
+            status=response.status_code,
+        )
+        self.profiler.save_meta(meta)
+        self.profiling.prune_profiles(self.profiler.directory, keep=self.config['KEEP'])
+        response['X-Profile-Id'] = meta['id']
+        return response
+
+
+class PrimaryPinningMiddleware(HybridMiddleware):
+    """Keeps a client's reads on the primary database for a short window after it wrote.
+
+    Unsafe methods and paths starting with one of DATABASE_PRIMARY_PATHS always read from the primary. When a
+    request writes, a signed cookie pins the client's following requests to the primary for DATABASE_PIN_SECONDS,
+    so users see their own changes even while the replicas lag behind.
+
+    The middleware removes itself at startup when no DATABASE_REPLICAS are configured.
+    """
+
+    cookie_name = 'db_pin'
+    cookie_salt = 'actors_django.routers'
+
+    def __init__(self, get_response) -> None:
+        if not get_replicas():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.pin_seconds = getattr(settings, 'DATABASE_PIN_SECONDS', 10)
+        self.primary_paths = tuple(getattr(settings, 'DATABASE_PRIMARY_PATHS', ('/admin/',)))
+
+    def is_pinned(self, request: HttpRequest) -> bool:
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') or request.path.startswith(self.primary_paths):
+            return True
+        cookie = request.get_signed_cookie(
+            self.cookie_name, default=None, salt=self.cookie_salt, max_age=self.pin_seconds
+        )
+        return cookie is not None
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.is_async:
+            return self.__acall__(request)
+        pinned_token = primary_pinned.set(self.is_pinned(request))
+        written_token = primary_written.set(False)
+        try:
+            return self.pin(self.get_response(request))
+        finally:
+            primary_pinned.reset(pinned_token)
+            primary_written.reset(written_token)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        # The async ORM runs queries in a copy of this context, which carries primary_written back.
+        pinned_token = primary_pinned.set(self.is_pinned(request))
+        written_token = primary_written.set(False)
+        try:
+            return self.pin(await self.get_response(request))
+        finally:
+            primary_pinned.reset(pinned_token)
+            primary_written.reset(written_token)
+
+    def pin(self, response: HttpResponse) -> HttpResponse:
+        """Set the pinning cookie when the request wrote to the primary."""
+        if primary_written.get():
+            response.set_signed_cookie(
+                self.cookie_name,
+                '1',
+                salt=self.cookie_salt,
+                max_age=self.pin_seconds,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+def accepted_encodings(header: str) -> set[str]:
+    """Content codings an Accept-Encoding header allows, leaving out those with q=0."""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = params.strip().removeprefix('q=')
+        try:
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticAssetsMiddleware(HybridMiddleware):
+    """Serves collected static files from STATIC_ROOT, preferring their precompressed variants.
+
+    A request under STATIC_URL gets the `.br` or `.gz` sibling written by `collectstatic` when Accept-Encoding
+    allows it, with `Vary: Accept-Encoding`. Names fingerprinted by the manifest storage never change content, so
+    they are cached for a year and marked immutable; other files are cached for MAX_AGE seconds. Files missing from
+    STATIC_ROOT fall through to the rest of the chain (in development, to the staticfiles finders).
+
+    The lookups of collected files are cached per name, since STATIC_ROOT only changes on deploy together with a
+    restart. Misses are not, so requests for made-up names cannot grow the cache beyond the collected files.
+
+    Configured through the STATIC_ASSETS setting; the middleware removes itself at startup when ENABLED is false,
+    STATIC_ROOT is not set or STATIC_URL points to another host.
+    """
+
+    defaults = {
+        'ENABLED': True,
+        'MAX_AGE': 60,
+    }
+    immutable_max_age = 365 * 24 * 60 * 60
+
+    def __init__(self, get_response) -> None:
+        self.config = {**self.defaults, **getattr(settings, 'STATIC_ASSETS', {})}
+        static_url = settings.STATIC_URL or ''
+        if not self.config['ENABLED'] or not settings.STATIC_ROOT or not static_url.startswith('/'):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.prefix = static_url
+        self.root = os.path.realpath(settings.STATIC_ROOT)
+        self.immutable = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        self.files = {}
+
+    def find(self, name: str) -> dict | None:
+        """Stat a static file and its precompressed variants, or return None when it isn't collected."""
+        found = self.files.get(name)
+        if found is None:
+            path = os.path.realpath(os.path.join(self.root, name))
+            if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+                return None
+            content_type, _ = mimetypes.guess_type(path)
+            found = self.files[name] = {
+                'path': path,
+                'content_type': content_type or 'application/octet-stream',
+                'mtime': os.stat(path).st_mtime,
+                'variants': [(coding, path + suffix) for coding, suffix in ENCODINGS if os.path.isfile(path + suffix)],
+            }
+        return found
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.is_async:
+            return self.__acall__(request)
+        response = self.serve(request)
+        return self.get_response(request) if response is None else response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        response = self.serve(request)
+        return await self.get_response(request) if response is None else response
+
+    def serve(self, request: HttpRequest) -> FileResponse | None:
+        """Return the response serving a collected static file, or None to pass the request on."""
+        if request.method not in ('GET', 'HEAD') or not request.path_info.startswith(self.prefix):
+            return None
+        name = request.path_info.removeprefix(self.prefix)
+        found = self.find(name)
+        if found is None:
+            return None
+
+        path, coding = found['path'], None
+        if found['variants']:
+            accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+            coding, path = next(
+                ((coding, variant) for coding, variant in found['variants'] if coding in accepted), (None, path)
+            )
+
+        response = FileResponse(open(path, 'rb'), content_type=found['content_type'])
+        del response['Content-Disposition']
+        if coding:
+            response['Content-Encoding'] = coding
+        if found['variants']:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        response['Last-Modified'] = http_date(found['mtime'])
+        if name in self.immutable:
+            response['Cache-Control'] = f'public, max-age={self.immutable_max_age}, immutable'
+        else:
+            response['Cache-Control'] = f'public, max-age={self.config["MAX_AGE"]}'
+        return response
+
+
+class CompressionMiddleware(HybridMiddleware):
+    """Minifies HTML responses and gzips text responses for clients that accept it.
+
+    The gzip level is picked by body size from the LEVELS setting, and compressed bodies are cached by content
+    digest, so a page served again unchanged is not compressed again. Streaming responses are compressed
+    incrementally, one flushed block per chunk. Bytes saved, CPU spent and CPU saved by the cache are recorded
+    per URL name in the metrics registry.
+
+    Responses that may carry a secret, a CSRF token or the content of a non-empty session, are only minified:
+    compressing a secret next to reflected input leaks it through the response size (BREACH).
+
+    Sits above every middleware that rewrites the body. Configured through the COMPRESSION setting; when ENABLED
+    is false the middleware removes itself at startup.
+    """
+
+    compressible_types = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+    def __init__(self, get_response) -> None:
+        if not get_config()['ENABLED']:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.is_async:
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        content_type = response.get('Content-Type', '')
+        if response.has_header('Content-Encoding') or not content_type.startswith(self.compressible_types):
+            return response
+        config = get_config()
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        gzip_accepted = 'gzip' in accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        gzip_accepted = gzip_accepted and not self.may_carry_secrets(request, response)
+        if response.streaming:
+            if gzip_accepted:
+                self.compress_streaming(response, view, config)
+            return response
+
+        content = response.content
+        if config['MINIFY_HTML'] and content_type.startswith('text/html'):
+            started = time.thread_time()
+            minified = minify_html(content)
+            self.record(view, 'minify', len(content) - len(minified), time.thread_time() - started)
+            content = minified
+        if gzip_accepted and len(content) >= config['MIN_SIZE']:
+            compressed, cpu, cached = compress_body(content, config)
+            if len(compressed) < len(content):
+                self.record(view, 'gzip', len(content) - len(compressed), 0.0 if cached else cpu)
+                if cached:
+                    registry.inc('http_compression_cpu_seconds_saved_total', (('view', view),), cpu)
+                content = compressed
+                response['Content-Encoding'] = 'gzip'
+                self.weaken_etag(response)
+        response.content = content
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(content))
+        return response
+
+    def compress_streaming(self, response: StreamingHttpResponse, view: str, config: dict) -> None:
+        stats = StreamStats()
+
+        def finished() -> None:
+            self.record(view, 'gzip', stats.original - stats.compressed, stats.cpu)
+
+        stream = acompress_stream if response.is_async else compress_stream
+        response.streaming_content = stream(response.streaming_content, config['STREAMING_LEVEL'], stats, finished)
+        response['Content-Encoding'] = 'gzip'
+        del response['Content-Length']
+        self.weaken_etag(response)
+
+    @staticmethod
+    def may_carry_secrets(request: HttpRequest, response: HttpResponse) -> bool:
+        """Whether the body may hold a CSRF token, which sets the CSRF cookie, or depend on a non-empty session."""
+        if settings.CSRF_COOKIE_NAME in response.cookies:
+            return True
+        session = getattr(request, 'session', None)
+        return session is not None and session.accessed and not session.is_empty()
+
+    @staticmethod
+    def weaken_etag(response: HttpResponse) -> None:
+        """A strong ETag names the exact bytes, which are now different."""
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+
+    @staticmethod
+    def record(view: str, step: str, saved: int, cpu: float) -> None:
+        labels = (('step', step), ('view', view))
+        registry.inc('http_compression_bytes_saved_total', labels, saved)
+        registry.inc('http_compression_cpu_seconds_total', labels, cpu)
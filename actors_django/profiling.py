@@ -0,0 +1,236 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.core import signing
+
+TOKEN_SALT = 'actors_django.profiling'
+
+# tracemalloc and cProfile are process-wide: one request is profiled at a time.
+PROFILE_LOCK = threading.Lock()
+
+
+def make_token() -> str:
+    """Return a signed token that enables profiling for requests carrying it in the X-Profile header."""
+    return signing.dumps('profile', salt=TOKEN_SALT)
+
+
+def check_token(token: str, max_age: int) -> bool:
+    try:
+        return signing.loads(token, salt=TOKEN_SALT, max_age=max_age) == 'profile'
+    except signing.BadSignature:
+        return False
+
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """Samples the stack of one thread at a fixed interval and counts collapsed stacks.
+
+    Attributes:
+        thread_id (int): Identifier of the thread to sample.
+        interval (float): Seconds between two samples.
+        stacks (Counter): Number of samples per 'root;...;leaf' stack.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.001) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def collapsed(self) -> str:
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def collapse_pstats(stats: pstats.Stats) -> str:
+    """Approximate collapsed stacks from cProfile data.
+
+    cProfile only records caller/callee pairs, so every function's own time is attributed to the chain of its
+    most expensive callers. Times are in microseconds.
+    """
+
+    def name(function) -> str:
+        filename, line, function_name = function
+        return f'{function_name} ({os.path.basename(filename)}:{line})'
+
+    lines = Counter()
+    for function, (_, _, own_time, _, callers) in stats.stats.items():
+        chain, seen, current, current_callers = [name(function)], {function}, function, callers
+        while current_callers:
+            current = max(current_callers, key=lambda caller: current_callers[caller][3])
+            if current in seen:
+                break
+            seen.add(current)
+            chain.append(name(current))
+            current_callers = stats.stats[current][4] if current in stats.stats else {}
+        micros = int(own_time * 1_000_000)
+        if micros:
+            lines[';'.join(reversed(chain))] += micros
+    return ''.join(f'{stack} {count}\n' for stack, count in lines.most_common())
+
+
+class RequestProfiler:
+    """Profiles one request and stores flamegraph-ready output in a directory.
+
+    Every profile is saved as `<id>.json` (metadata), `<id>.collapsed` (collapsed stacks), `<id>.alloc.txt`
+    (tracemalloc allocation deltas) and, for the cProfile engine, `<id>.prof` (pstats dump).
+
+    Attributes:
+        directory (Path): Directory the profiles are written to.
+        engine (str): 'sampling' for the stack sampler or 'cprofile' for the deterministic profiler.
+        interval (float): Sampling interval of the stack sampler in seconds.
+        trace_allocations (bool): Whether to record tracemalloc allocation deltas.
+    """
+
+    def __init__(self, directory: Path, engine: str = 'sampling', interval: float = 0.001, trace_allocations=True):
+        self.directory = Path(directory)
+        self.engine = engine
+        self.interval = interval
+        self.trace_allocations = trace_allocations
+
+    def profile(self, function, *args):
+        """Call `function(*args)` under the profiler.
+
+        Only one call is profiled at a time, since tracemalloc and cProfile are process-wide; while another one is
+        being profiled, `function` is called as is and the metadata is None.
+
+        Returns:
+            tuple: The return value of the call and the profile metadata, to be completed and passed to save_meta.
+        """
+        if not PROFILE_LOCK.acquire(blocking=False):
+            return function(*args), None
+        try:
+            session = self._start()
+            try:
+                result = function(*args)
+            finally:
+                self._stop(session)
+            return result, self._save(session)
+        finally:
+            PROFILE_LOCK.release()
+
+    async def aprofile(self, function, *args):
+        """Await `function(*args)` under the profiler, like profile().
+
+        The profiler follows the event loop thread, so the profile also holds whatever else the loop ran meanwhile.
+
+        Returns:
+            tuple: The result of the awaited call and the profile metadata, or None when another call is profiled.
+        """
+        if not PROFILE_LOCK.acquire(blocking=False):
+            return await function(*args), None
+        try:
+            session = self._start()
+            try:
+                result = await function(*args)
+            finally:
+                self._stop(session)
+            return result, self._save(session)
+        finally:
+            PROFILE_LOCK.release()
+
+    def _start(self) -> dict:
+        session = {'started_tracing': False, 'profiler': None, 'sampler': None}
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            session['started_tracing'] = True
+        session['before'] = tracemalloc.take_snapshot() if self.trace_allocations else None
+
+        if self.engine == 'cprofile':
+            session['profiler'] = cProfile.Profile()
+            session['profiler'].enable()
+        else:
+            session['sampler'] = StackSampler(threading.get_ident(), interval=self.interval)
+            session['sampler'].start()
+        session['started'] = time.perf_counter()
+        return session
+
+    def _stop(self, session: dict) -> None:
+        session['duration'] = time.perf_counter() - session['started']
+        if session['profiler'] is not None:
+            session['profiler'].disable()
+        else:
+            session['sampler'].stop()
+        session['after'] = tracemalloc.take_snapshot() if self.trace_allocations else None
+        if session['started_tracing']:
+            tracemalloc.stop()
+
+    def _save(self, session: dict) -> dict:
+        profile_id = f'{time.strftime("%Y%m%d%H%M%S")}-{uuid.uuid4().hex[:8]}'
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if session['profiler'] is not None:
+            stats = pstats.Stats(session['profiler'])
+            stats.dump_stats(self.directory / f'{profile_id}.prof')
+            collapsed = collapse_pstats(stats)
+        else:
+            collapsed = session['sampler'].collapsed()
+        (self.directory / f'{profile_id}.collapsed').write_text(collapsed)
+        before, after = session['before'], session['after']
+        if before is not None:
+            own = (tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__))
+            top = after.filter_traces(own).compare_to(before.filter_traces(own), 'lineno')[:30]
+            (self.directory / f'{profile_id}.alloc.txt').write_text(''.join(f'{line}\n' for line in top))
+        return {'id': profile_id, 'engine': self.engine, 'duration_ms': round(session['duration'] * 1000, 1)}
+
+    def save_meta(self, meta: dict) -> None:
+        meta = {**meta, 'created': time.time()}
+        (self.directory / f'{meta["id"]}.json').write_text(json.dumps(meta))
+
+
+def recent_profiles(directory: Path, per_view: int = 20) -> dict[str, list[dict]]:
+    """Return the metadata of the most recent profiles grouped by view name, newest first."""
+    directory = Path(directory)
+    grouped = {}
+    if not directory.is_dir():
+        return grouped
+    metas = []
+    for path in directory.glob('*.json'):
+        try:
+            metas.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    for meta in sorted(metas, key=lambda item: item['created'], reverse=True):
+        profiles = grouped.setdefault(meta.get('view', ''), [])
+        if len(profiles) < per_view:
+            profiles.append(meta)
+    return dict(sorted(grouped.items()))
+
+
+def prune_profiles(directory: Path, keep: int) -> None:
+    """Delete the files of all but the `keep` most recent profiles."""
+    directory = Path(directory)
+    metas = sorted(directory.glob('*.json'), key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in metas[keep:]:
+        profile_id = path.stem
+        for stale in directory.glob(f'{profile_id}.*'):
+            stale.unlink(missing_ok=True)
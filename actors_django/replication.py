@@ -0,0 +1,39 @@
+import sqlite3
+
+from django.db import connections
+
+
+def sync_sqlite(source: str, target: str) -> None:
+    """Copy a consistent snapshot of one SQLite database file over another with the online backup API.
+
+    This is the local stand-in for replication: it lets a second SQLite file act as a read replica of the
+    primary during development and tests.
+
+    Args:
+        source (str): Path of the primary database file.
+        target (str): Path of the replica database file.
+    """
+    with sqlite3.connect(source) as primary, sqlite3.connect(target) as replica:
+        primary.backup(replica)
+    primary.close()
+    replica.close()
+
+
+def sync_replicas(primary_alias: str = 'default', replicas: list[str] | None = None) -> list[str]:
+    """Copy the primary SQLite database over every replica alias.
+
+    Args:
+        primary_alias (str): Alias of the primary database.
+        replicas (list[str] | None): Aliases to refresh, all DATABASE_REPLICAS when None.
+
+    Returns:
+        list: The aliases that were refreshed.
+    """
+    from .routers import get_replicas
+
+    replicas = get_replicas() if replicas is None else replicas
+    source = connections[primary_alias].settings_dict['NAME']
+    for alias in replicas:
+        connections[alias].close()
+        sync_sqlite(str(source), str(connections[alias].settings_dict['NAME']))
+    return replicas
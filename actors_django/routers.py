@@ -0,0 +1,47 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Per-request routing state: whether reads must use the primary, and whether the request has written.
+primary_pinned = ContextVar('primary_pinned', default=False)
+primary_written = ContextVar('primary_written', default=False)
+
+
+def get_replicas() -> list[str]:
+    """Return the configured replica aliases that exist in DATABASES."""
+    return [alias for alias in getattr(settings, 'DATABASE_REPLICAS', ()) if alias in settings.DATABASES]
+
+
+class ReplicaRouter:
+    """Sends reads to a random replica and every write to the primary database.
+
+    Reads stay on the primary when the current request is pinned to it (see PrimaryPinningMiddleware), once the
+    request has written anything, and for the apps listed in DATABASE_PRIMARY_APPS (sessions by default, since a
+    stale session would log the user out). Migrations only run on the primary; replicas receive the schema
+    through replication.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if not replicas or primary_pinned.get() or primary_written.get():
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label in getattr(settings, 'DATABASE_PRIMARY_APPS', ('sessions',)):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        primary_written.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replicas():
+            return False
+        return None
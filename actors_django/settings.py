@@ -10,25 +10,46 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import importlib.util
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Deployment profile
+# ACTORS_ENV=production turns DEBUG off, leaves out the development apps and middleware, caches compiled templates
+# and reads the secret key and the allowed hosts (comma separated) from ACTORS_SECRET_KEY and ACTORS_ALLOWED_HOSTS.
+# A production worker refuses to start without them or without a shared cache (see Cache below).
+# `manage.py bench_startup` measures what each profile costs a worker at boot.
+
+PRODUCTION = os.environ.get('ACTORS_ENV', 'development') == 'production'
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-ygs-!@a2p&tv6#f^n19g3am3!srb-83=(&7ue$yogzc&r#$t06'
+SECRET_KEY = os.environ.get('ACTORS_SECRET_KEY', 'django-insecure-ygs-!@a2p&tv6#f^n19g3am3!srb-83=(&7ue$yogzc&r#$t06')
+if PRODUCTION and 'ACTORS_SECRET_KEY' not in os.environ:
+    raise ImproperlyConfigured('Set ACTORS_SECRET_KEY when ACTORS_ENV is production.')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = not PRODUCTION
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.environ.get('ACTORS_ALLOWED_HOSTS', '').split(',') if host]
+if PRODUCTION and not ALLOWED_HOSTS:
+    raise ImproperlyConfigured('Set ACTORS_ALLOWED_HOSTS when ACTORS_ENV is production.')
 INTERNAL_IPS = ['127.0.0.1']
 
 # Application definition
 
+# Development tools, installed outside production when their packages are available.
+DEVELOPMENT_APPS = [
+    app for app in ('django_extensions', 'debug_toolbar') if not PRODUCTION and importlib.util.find_spec(app)
+]
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -36,25 +57,36 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'django_extensions',
-    'debug_toolbar',
+    *DEVELOPMENT_APPS,
     'users',
     'actors',
 ]
 
 MIDDLEWARE = [
+    'actors_django.middleware.MetricsMiddleware',
+    'actors_django.middleware.RequestTimingMiddleware',
+    'actors_django.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'actors_django.middleware.StaticAssetsMiddleware',
+    'actors_django.middleware.CompressionMiddleware',
+    'actors_django.middleware.PrimaryPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'actors_django.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+if 'debug_toolbar' in DEVELOPMENT_APPS:
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'actors_django.urls'
 
+# Route the public list and detail pages to their async views; asgi.py turns this on by default.
+ASYNC_VIEWS = os.environ.get('ACTORS_ASYNC_VIEWS') == '1'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -71,18 +103,51 @@ TEMPLATES = [
     },
 ]
 
+if PRODUCTION:
+    # Compile every template once per process, and skip the debug context processor.
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        (
+            'django.template.loaders.cached.Loader',
+            ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader'],
+        ),
+    ]
+    TEMPLATES[0]['OPTIONS']['context_processors'].remove('django.template.context_processors.debug')
+
 WSGI_APPLICATION = 'actors_django.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# The project backend applies WAL mode, a busy timeout and cache/mmap pragmas to every connection and starts
+# transactions with BEGIN IMMEDIATE; override single pragmas with OPTIONS = {'pragmas': {...}}.
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'actors_django.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replicas
+# Set ACTORS_REPLICA_DB to the path of a second SQLite file to route reads to it; `manage.py sync_replicas`
+# keeps it in sync with the primary locally. Clients that wrote stay on the primary for DATABASE_PIN_SECONDS.
+
+if os.environ.get('ACTORS_REPLICA_DB'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['ACTORS_REPLICA_DB'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['actors_django.routers.ReplicaRouter']
+DATABASE_PRIMARY_APPS = ('sessions',)
+DATABASE_PRIMARY_PATHS = ('/admin/',)
+DATABASE_PIN_SECONDS = 10
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -121,6 +186,29 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+# `collectstatic` minifies CSS, fingerprints every file through a manifest and writes .gz (and .br with the brotli
+# package) siblings into STATIC_ROOT; StaticAssetsMiddleware serves them with far-future caching.
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'actors_django.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Output directory of `manage.py build_static_site`, the pre-rendered public pages.
+STATIC_SITE_ROOT = BASE_DIR / 'site'
+
+# Static assets served by StaticAssetsMiddleware: fingerprinted names are cached for a year, the others for MAX_AGE.
+
+STATIC_ASSETS = {
+    'ENABLED': True,
+    'MAX_AGE': 60,
+}
+
 MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_URL = '/media/'
 
@@ -139,11 +227,209 @@ LOGOUT_REDIRECT_URL = 'actors:index'
 
 # Authentication user
 
-AUTHENTICATION_BACKENDS = (
-    'django.contrib.auth.backends.ModelBackend',
-    'users.auth.EmailBackend',
-)
+AUTHENTICATION_BACKENDS = ('users.auth.UsernameOrEmailBackend',)
+
+# Login throttling
+# Attempts allowed per (limit, window in seconds), per client IP and per targeted account, on the login and
+# password reset forms. STORE 'memory' keeps counters per process; 'cache' shares them through the default cache.
+
+LOGIN_THROTTLE = {
+    'ENABLED': True,
+    'STORE': 'memory',
+    'RATES': {
+        'ip': (20, 60),
+        'account': (5, 300),
+    },
+}
+
+# Seconds a logged-in user stays cached by pk; saving or deleting the user evicts it.
+USER_CACHE_TIMEOUT = 60
+
+# Seconds the sidebar categories and tags stay cached; saving or deleting an actor, category or tag evicts them.
+# Bulk updates don't, so their changes show up after at most this long. 0 disables the cache.
+SIDEBAR_CACHE_TIMEOUT = 60
+
+# Cache
+# Sessions, users and list pages are cached here. The local-memory cache is per process, so a logout or password
+# change would only be seen by the process that handled it: production needs ACTORS_REDIS_URL to share one cache
+# between processes, or ACTORS_CACHE_DIR for a file-based cache shared by the workers of a single host.
+
+if os.environ.get('ACTORS_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['ACTORS_REDIS_URL'],
+        }
+    }
+elif os.environ.get('ACTORS_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['ACTORS_CACHE_DIR'],
+        }
+    }
+elif PRODUCTION:
+    raise ImproperlyConfigured('Set ACTORS_REDIS_URL or ACTORS_CACHE_DIR when ACTORS_ENV is production.')
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Gzipped response bodies, kept apart so that they never evict sessions, users or pages from the default cache.
+# Bounded to MAX_ENTRIES bodies per process, each at most COMPRESSION['CACHE_MAX_SIZE'] bytes before compression.
+CACHES['compressed'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'compressed-bodies',
+    'OPTIONS': {'MAX_ENTRIES': 256},
+}
+
+# Sessions
+# 'cached_db' reads sessions from the cache and writes them through to the database; 'signed_cookies' keeps them
+# in the client cookie and never touches the server.
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.environ.get('ACTORS_SESSION_BACKEND', 'cached_db')
 
 # Email
+# In production, mail is queued in MAIL_SPOOL['DIRECTORY'] and returns at once; a delivery thread in each worker,
+# or `manage.py send_queued_mail` with DELIVERY_THREAD off, sends it in batches over one SMTP connection to
+# EMAIL_HOST, retrying temporary failures with backoff. Development prints mail to the console.
+# ACTORS_EMAIL_BACKEND overrides both.
+
+EMAIL_BACKEND = os.environ.get(
+    'ACTORS_EMAIL_BACKEND',
+    'actors_django.mail.SpoolEmailBackend' if PRODUCTION else 'django.core.mail.backends.console.EmailBackend',
+)
+EMAIL_HOST = os.environ.get('ACTORS_EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('ACTORS_EMAIL_PORT', '25'))
+EMAIL_TIMEOUT = 10
+
+MAIL_SPOOL = {
+    'DIRECTORY': BASE_DIR / 'spool' / 'mail',
+    'DELIVERY_BACKEND': 'django.core.mail.backends.smtp.EmailBackend',
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 8,
+    'RETRY_DELAY': 30.0,
+    'DELIVERY_THREAD': True,
+    'INTERVAL': 5.0,
+}
+
+# Request timing
+
+REQUEST_TIMING = {
+    'ENABLED': True,
+    'SLOW_REQUEST_MS': 500,
+    'SLOW_SAMPLE_RATE': 1.0,
+}
+
+# Query budgets
+
+QUERY_BUDGET = {
+    'MODE': 'log',
+    'SAMPLE_RATE': 0.01,
+    'REPEAT_THRESHOLD': 3,
+}
+
+TEST_RUNNER = 'actors_django.test_runner.QueryBudgetRunner'
+
+# Metrics
+# Set MULTIPROCESS_DIR to a directory shared by all workers to aggregate metrics across processes.
+
+METRICS = {
+    'ENABLED': True,
+    'MULTIPROCESS_DIR': None,
+    'FLUSH_INTERVAL': 5.0,
+}
+
+# Response compression
+# HTML is minified and text responses are gzipped at the first LEVELS level whose size limit fits the body.
+# Compressed bodies are cached by content digest in CACHE for CACHE_TIMEOUT seconds. Responses with a CSRF token
+# or depending on a non-empty session are never gzipped (BREACH).
+
+COMPRESSION = {
+    'ENABLED': True,
+    'MIN_SIZE': 512,
+    'MINIFY_HTML': True,
+    'LEVELS': ((16 * 1024, 9), (256 * 1024, 6), (None, 4)),
+    'CACHE': 'compressed',
+    'CACHE_TIMEOUT': 600,
+}
+
+# Sitemaps
+# Actor sitemaps are split into shards of SHARD_SIZE ids. A rendered shard is kept in CACHE_DIR until an actor in its
+# id range is added, saved or unpublished.
 
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+SITEMAPS = {
+    'SHARD_SIZE': 50_000,
+    'CACHE_DIR': BASE_DIR / 'cache' / 'sitemaps',
+}
+
+# List page cache
+# The index, category and tag lists are cached for anonymous visitors. Pages older than SOFT_TTL seconds are served
+# stale while one of REFRESH_WORKERS threads renders them again; the cache drops them after HARD_TTL. Concurrent
+# misses of a page wait up to WAIT_TIMEOUT seconds for a single render, across processes through a lock in CACHE.
+
+PAGE_CACHE = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'SOFT_TTL': 30,
+    'HARD_TTL': 300,
+    'WAIT_TIMEOUT': 5.0,
+    'REFRESH_WORKERS': 2,
+}
+
+# Change outbox
+# Every change to actors, categories, tags and producers is written to actors.ChangeEvent in its transaction. A
+# consumer reads up to BATCH_SIZE events past its checkpoint and waits GAP_TIMEOUT seconds for missing ids of
+# transactions still in flight; `manage.py prune_outbox` deletes events committed by every consumer after
+# RETENTION_DAYS.
+
+CHANGE_OUTBOX = {
+    'BATCH_SIZE': 500,
+    'GAP_TIMEOUT': 30.0,
+    'RETENTION_DAYS': 7,
+}
+
+# Actor view counts
+# Views are counted in memory and flushed every FLUSH_INTERVAL seconds with one UPDATE. With several processes,
+# set SPOOL_DIR so processes spool their counts to files, and run `manage.py flush_view_counts --interval 10`.
+# A spool file claimed by a drainer that died is drained again once its claim is CLAIM_TIMEOUT seconds old.
+
+VIEW_COUNTS = {
+    'ENABLED': True,
+    'SPOOL_DIR': None,
+    'FLUSH_INTERVAL': 10.0,
+    'FLUSH_THREAD': True,
+    'CLAIM_TIMEOUT': 300.0,
+}
+
+# Request profiling
+# Profile a request with the signed header printed by `manage.py profile_token`, or as staff with `?profile=1`.
+# In production it is off unless ACTORS_PROFILING=1, so that workers don't load the profilers at boot.
+
+PROFILING = {
+    'ENABLED': not PRODUCTION or os.environ.get('ACTORS_PROFILING') == '1',
+    'DIRECTORY': BASE_DIR / 'profiles',
+    'ENGINE': 'sampling',
+    'SAMPLE_RATE': 0.0,
+    'KEEP': 200,
+}
+
+# Logging
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'actors_django': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
@@ -0,0 +1,91 @@
+"""Measures the boot of one worker process; run by `manage.py bench_startup` and `bench_warmup` in a fresh
+interpreter as `python -m actors_django.startup [--warm-up] PATH...`.
+
+Prints one JSON object with the seconds taken by django.setup(), by loading the WSGI handler and its middleware,
+by the warm-up when --warm-up is given, and by one request to each PATH in turn. Run it with `python -X importtime`
+to get the import times too.
+"""
+
+import io
+import json
+import os
+import sys
+import time
+
+
+def wsgi_get(application, path: str) -> int:
+    """Send one GET request through a WSGI application in-process and return the response status.
+
+    The client address is outside INTERNAL_IPS so that the debug toolbar stays out of the measurement.
+    """
+    path, _, query = path.partition('?')
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SCRIPT_NAME': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost',
+        'REMOTE_ADDR': '192.0.2.1',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    status = []
+    response = application(environ, lambda line, headers, exc_info=None: status.append(line))
+    try:
+        for _ in response:
+            pass
+    finally:
+        getattr(response, 'close', lambda: None)()
+    return int(status[0].split()[0])
+
+
+def measure(paths: list[str], warm: bool = False) -> dict:
+    """Boot Django, load the WSGI handler, optionally warm it up, and request every path once, timing each step.
+
+    Returns:
+        dict: Seconds per step under 'setup', 'handler' and 'warm_up', and the seconds and statuses of the
+            requests in order under 'requests' and 'statuses'.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'actors_django.settings')
+    timings = {}
+    started = time.perf_counter()
+    import django
+
+    django.setup()
+    timings['setup'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    from django.core.handlers.wsgi import WSGIHandler
+
+    application = WSGIHandler()
+    timings['handler'] = time.perf_counter() - started
+
+    timings['warm_up'] = 0.0
+    if warm:
+        from actors_django.warmup import warm_up
+
+        started = time.perf_counter()
+        warm_up()
+        timings['warm_up'] = time.perf_counter() - started
+
+    timings['requests'], timings['statuses'] = [], []
+    for path in paths:
+        started = time.perf_counter()
+        timings['statuses'].append(wsgi_get(application, path))
+        timings['requests'].append(time.perf_counter() - started)
+    return timings
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    warm = '--warm-up' in arguments
+    paths = [argument for argument in arguments if argument != '--warm-up'] or ['/']
+    print(json.dumps(measure(paths, warm=warm)))
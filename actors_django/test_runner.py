@@ -0,0 +1,21 @@
+import logging
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryBudgetRunner(DiscoverRunner):
+    """Test runner that makes query budget and N+1 violations raise instead of being logged.
+
+    Per-request timing lines are silenced so they don't flood the test output, buffered view counts are only
+    flushed when a test asks for it, and list pages and the sidebar are only served from their caches in the tests
+    of them.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_BUDGET = {**getattr(settings, 'QUERY_BUDGET', {}), 'MODE': 'raise'}
+        settings.VIEW_COUNTS = {**getattr(settings, 'VIEW_COUNTS', {}), 'FLUSH_THREAD': False}
+        settings.PAGE_CACHE = {**getattr(settings, 'PAGE_CACHE', {}), 'ENABLED': False}
+        settings.SIDEBAR_CACHE_TIMEOUT = 0
+        logging.getLogger('actors_django.timing').setLevel(logging.WARNING)
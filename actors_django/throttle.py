@@ -0,0 +1,173 @@
+import functools
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+
+from .metrics import registry
+
+DEFAULTS = {
+    'ENABLED': True,
+    'STORE': 'memory',
+    'RATES': {
+        'ip': (20, 60),
+        'account': (5, 300),
+    },
+}
+
+
+def get_config() -> dict:
+    return {**DEFAULTS, **getattr(settings, 'LOGIN_THROTTLE', {})}
+
+
+def estimate(current: int, previous: int, elapsed: float) -> float:
+    """Weighted hit count of the sliding window ending now.
+
+    Args:
+        current (int): Hits in the current fixed window.
+        previous (int): Hits in the previous fixed window.
+        elapsed (float): Fraction of the current window that has passed, between 0 and 1.
+    """
+    return previous * (1 - elapsed) + current
+
+
+def retry_after(current: int, previous: int, elapsed: float, limit: int, window: int) -> int:
+    """Seconds until the sliding window allows one more hit."""
+    if current >= limit:
+        # The current window alone is full: wait for it to become the previous one and decay enough.
+        needed = 1 - (limit - 1) / current if current else 0
+        return max(1, math.ceil((1 - elapsed + needed) * window))
+    needed = 1 - (limit - 1 - current) / previous if previous else 0
+    return max(1, math.ceil((needed - elapsed) * window))
+
+
+class MemoryStore:
+    """Sliding-window counters kept in process memory.
+
+    Every key holds the hit counts of the current and the previous fixed window; the sliding count interpolates
+    between them. Once the store grows past `max_keys`, keys untouched for two windows are pruned.
+    """
+
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self.max_keys = max_keys
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: int, window: int, now: float) -> int:
+        """Count a hit unless the key is over its limit.
+
+        Args:
+            key (str): Counter key.
+            limit (int): Hits allowed per window.
+            window (int): Window length in seconds.
+            now (float): Current UNIX time.
+
+        Returns:
+            int: 0 if the hit was allowed, otherwise the number of seconds to wait.
+        """
+        index, elapsed = divmod(now / window, 1)
+        with self._lock:
+            start, current, previous = self._counters.get(key, (index, 0, 0, window))[:3]
+            if start != index:
+                current, previous = 0, current if start == index - 1 else 0
+            if estimate(current, previous, elapsed) + 1 > limit:
+                self._counters[key] = (index, current, previous, window)
+                return retry_after(current, previous, elapsed, limit, window)
+            self._counters[key] = (index, current + 1, previous, window)
+            if len(self._counters) > self.max_keys:
+                self._counters = {
+                    key: counter for key, counter in self._counters.items() if counter[0] >= now // counter[3] - 1
+                }
+        return 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counters.clear()
+
+
+class CacheStore:
+    """Sliding-window counters in the default cache, shared by every worker using the same cache backend.
+
+    Each fixed window is a separate cache entry incremented atomically; counts may be slightly off when workers
+    race on the same key, which is acceptable for throttling.
+    """
+
+    def hit(self, key: str, limit: int, window: int, now: float) -> int:
+        """Count a hit unless the key is over its limit, see MemoryStore.hit."""
+        index, elapsed = divmod(now / window, 1)
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        current_key, previous_key = f'throttle:{digest}:{int(index)}', f'throttle:{digest}:{int(index) - 1}'
+        counts = cache.get_many([current_key, previous_key])
+        current, previous = counts.get(current_key, 0), counts.get(previous_key, 0)
+        if estimate(current, previous, elapsed) + 1 > limit:
+            return retry_after(current, previous, elapsed, limit, window)
+        if not cache.add(current_key, 1, timeout=window * 2):
+            try:
+                cache.incr(current_key)
+            except ValueError:
+                cache.set(current_key, 1, timeout=window * 2)
+        return 0
+
+
+memory_store = MemoryStore()
+cache_store = CacheStore()
+
+
+def client_ip(request: HttpRequest) -> str:
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def check(scope: str, request: HttpRequest, account: str = '') -> int:
+    """Count a throttled attempt against the client IP and, when given, the account it targets.
+
+    Args:
+        scope (str): Name of the protected action, e.g. 'login'.
+        request (HttpRequest): The request making the attempt.
+        account (str): Username or email the attempt is for.
+
+    Returns:
+        int: 0 if the attempt may proceed, otherwise the number of seconds the client has to wait.
+    """
+    config = get_config()
+    store = cache_store if config['STORE'] == 'cache' else memory_store
+    now = time.time()
+    keys = [('ip', client_ip(request))]
+    if account:
+        keys.append(('account', account.strip().lower()))
+    for kind, value in keys:
+        limit, window = config['RATES'][kind]
+        wait = store.hit(f'{scope}:{kind}:{value}', limit, window, now)
+        if wait:
+            registry.inc('throttled_requests_total', (('scope', scope), ('key', kind)))
+            return wait
+    return 0
+
+
+def throttle(scope: str, account_field: str = ''):
+    """Decorate a view so that POST requests over the LOGIN_THROTTLE rates get a 429 before the view runs.
+
+    Args:
+        scope (str): Name of the protected action, used in the counter keys and metrics.
+        account_field (str): POST field holding the username or email the attempt targets, if any.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            if request.method == 'POST' and get_config()['ENABLED']:
+                wait = check(scope, request, request.POST.get(account_field, '') if account_field else '')
+                if wait:
+                    response = HttpResponse(
+                        f'Too many attempts. Try again in {wait} seconds.', status=429, content_type='text/plain'
+                    )
+                    response['Retry-After'] = str(wait)
+                    return response
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -19,13 +19,19 @@ from django.contrib import admin
 from django.urls import include, path
 
 from actors_django import settings
+from actors_django.views import metrics_view, profile_file_view, profiles_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('actors.urls')),
     path('users/', include('users.urls')),
-    path('__debug__/', include('debug_toolbar.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    path('profiles/', profiles_view, name='profiles'),
+    path('profiles/<slug:profile_id>.<str:kind>', profile_file_view, name='profile_file'),
 ]
 
+if 'debug_toolbar' in settings.INSTALLED_APPS:
+    urlpatterns.append(path('__debug__/', include('debug_toolbar.urls')))
+
 if settings.DEBUG:
     urlpatterns += static(prefix=settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,77 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse
+from django.shortcuts import render
+
+from . import metrics
+
+PROFILE_FILE_KINDS = {
+    'collapsed': 'text/plain; charset=utf-8',
+    'alloc.txt': 'text/plain; charset=utf-8',
+    'prof': 'application/octet-stream',
+}
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Expose the collected metrics in the Prometheus text format.
+
+    Only staff users and clients from INTERNAL_IPS may read the metrics.
+
+    Args:
+        request (HttpRequest): The request instance.
+
+    Returns:
+        HttpResponse: The metrics as 'text/plain; version=0.0.4'.
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS and not request.user.is_staff:
+        raise PermissionDenied
+    body = metrics.render(metrics.registry.collect())
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+def profiles_view(request: HttpRequest) -> HttpResponse:
+    """List the most recent request profiles grouped by view.
+
+    Args:
+        request (HttpRequest): The request instance.
+
+    Returns:
+        HttpResponse: The rendered response.
+    """
+    # Imported here: cProfile, pstats and tracemalloc only load when profiles are looked at.
+    from .profiling import recent_profiles
+
+    directory = settings.PROFILING.get('DIRECTORY')
+    context = {
+        'title': 'Request profiles',
+        'profiles': recent_profiles(directory) if directory else {},
+    }
+    return render(request=request, template_name='profiles.html', context=context)
+
+
+@staff_member_required
+def profile_file_view(request: HttpRequest, profile_id: str, kind: str) -> FileResponse:
+    """Download one of the files stored for a profile.
+
+    Args:
+        request (HttpRequest): The request instance.
+        profile_id (str): Identifier of the profile.
+        kind (str): One of 'collapsed', 'alloc.txt' or 'prof'.
+
+    Returns:
+        FileResponse: The requested file.
+
+    Raises:
+        Http404: If the kind is unknown or the file does not exist.
+    """
+    directory = settings.PROFILING.get('DIRECTORY')
+    if not directory or kind not in PROFILE_FILE_KINDS:
+        raise Http404
+    path = Path(directory) / f'{profile_id}.{kind}'
+    if not path.is_file():
+        raise Http404
+    return FileResponse(path.open('rb'), as_attachment=kind == 'prof', content_type=PROFILE_FILE_KINDS[kind])
@@ -0,0 +1,133 @@
+"""Warms a worker up before it serves its first request.
+
+Run warm_up() after django.setup(), ideally in the master process of a pre-forking server so the workers share the
+compiled templates, populated URL resolvers and primed caches copy-on-write. wsgi.py and asgi.py call it when
+ACTORS_WARM_UP=1, which pays off with `gunicorn --preload actors_django.wsgi`; without --preload every worker
+warms itself up before accepting requests. `manage.py bench_warmup` measures the effect on the first requests.
+"""
+
+import asyncio
+import logging
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.urls import get_resolver
+
+logger = logging.getLogger('actors_django.warmup')
+
+
+def project_template_names(engine: DjangoTemplates) -> list[str]:
+    """Names of the templates in the engine's DIRS and in the project's own apps, leaving out third-party ones."""
+    directories = [Path(directory) for directory in engine.dirs]
+    base_dir = Path(settings.BASE_DIR).resolve()
+    for app in apps.get_app_configs():
+        if Path(app.path).resolve().is_relative_to(base_dir):
+            directories.append(Path(app.path) / 'templates')
+    names = set()
+    for directory in directories:
+        names.update(path.relative_to(directory).as_posix() for path in directory.rglob('*') if path.is_file())
+    return sorted(names)
+
+
+def compile_templates() -> int:
+    """Compile every project template into the cached loaders of the Django template engines.
+
+    Returns:
+        int: Number of compiled templates.
+    """
+    compiled = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for name in project_template_names(engine):
+            engine.get_template(name)
+            compiled += 1
+    return compiled
+
+
+def populate_urls() -> int:
+    """Populate the URL resolvers: compile every pattern and build the reverse lookup tables of every namespace.
+
+    Returns:
+        int: Number of URL patterns.
+    """
+
+    def compile_patterns(resolver) -> int:
+        count = 0
+        for pattern in resolver.url_patterns:
+            if hasattr(pattern, 'url_patterns'):
+                count += compile_patterns(pattern)
+            else:
+                pattern.pattern.regex
+                count += 1
+        return count
+
+    resolver = get_resolver()
+    # Reading the reverse table populates the root resolver and, recursively, every included one.
+    resolver.reverse_dict
+    return compile_patterns(resolver)
+
+
+def hot_list_urls(sidebar: dict, count: int) -> list[str]:
+    """URLs of the index and of the categories and tags with the most actors, ranked by the sidebar counts."""
+    from django.urls import reverse
+
+    urls = [reverse('actors:index')]
+    for entries in (sidebar['sidebar_categories'], sidebar['sidebar_tags']):
+        hottest = sorted(entries, key=lambda obj: (-obj.total, obj.pk))[:count]
+        urls.extend(obj.get_absolute_url() for obj in hottest)
+    return urls
+
+
+def prime_pages(urls: list[str]) -> int:
+    """Render list pages through their views, which stores them in the page cache.
+
+    Returns:
+        int: Number of primed pages.
+    """
+    from actors.page_cache import get_config
+    from actors.static_site import anonymous_request, call_view
+
+    if not get_config()['ENABLED']:
+        return 0
+    primed = 0
+    for url in urls:
+        if call_view(anonymous_request(url)).status_code == 200:
+            primed += 1
+    return primed
+
+
+def warm_up(pages: int = 5) -> dict:
+    """Compile the templates, populate the URL resolvers and prime the sidebar and the hottest list pages.
+
+    Database connections are closed at the end, so forked workers open their own. When called inside a running
+    event loop, as by a server that loads the ASGI application there, only the templates and URLs are warmed up,
+    since the ORM can't be used synchronously.
+
+    Args:
+        pages (int): Number of categories and of tags whose first list page is primed, besides the index.
+
+    Returns:
+        dict: Number of templates, URL patterns and pages warmed up, and the seconds it took.
+    """
+    from actors.utils import cached_sidebar
+
+    started = time.perf_counter()
+    result = {'templates': compile_templates(), 'urls': populate_urls(), 'sidebar': 0, 'pages': 0}
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        try:
+            sidebar = cached_sidebar()
+            result['sidebar'] = len(sidebar['sidebar_categories']) + len(sidebar['sidebar_tags'])
+            result['pages'] = prime_pages(hot_list_urls(sidebar, pages))
+        finally:
+            connections.close_all()
+    result['seconds'] = time.perf_counter() - started
+    logger.info('Warmed up %(templates)d templates, %(urls)d URLs and %(pages)d pages in %(seconds).2fs', result)
+    return result
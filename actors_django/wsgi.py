@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'actors_django.settings')
 
 application = get_wsgi_application()
+
+# Warm up before serving; with `gunicorn --preload` this runs once in the master and the workers inherit the result.
+if os.environ.get('ACTORS_WARM_UP') == '1':
+    from actors_django.warmup import warm_up
+
+    warm_up()
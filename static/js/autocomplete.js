@@ -0,0 +1,61 @@
+// Turns <select data-autocomplete-url> elements into searchable selects backed by a paginated JSON endpoint.
+(function () {
+    'use strict';
+
+    function setup(select) {
+        const search = document.createElement('input');
+        search.type = 'search';
+        search.className = 'form-input';
+        search.placeholder = 'Search…';
+        const more = document.createElement('button');
+        more.type = 'button';
+        more.textContent = 'More…';
+        more.hidden = true;
+        select.before(search);
+        select.after(more);
+
+        let page = 1;
+        let timer = null;
+
+        function load(reset) {
+            const url = new URL(select.dataset.autocompleteUrl, window.location.href);
+            url.searchParams.set('term', search.value);
+            url.searchParams.set('page', page);
+            fetch(url, {headers: {'Accept': 'application/json'}, credentials: 'same-origin'})
+                .then((response) => response.json())
+                .then((data) => {
+                    if (reset) {
+                        for (const option of Array.from(select.options)) {
+                            if (!option.selected && option.value) {
+                                option.remove();
+                            }
+                        }
+                    }
+                    const present = new Set(Array.from(select.options).map((option) => option.value));
+                    for (const result of data.results) {
+                        if (!present.has(result.id)) {
+                            select.add(new Option(result.text, result.id));
+                        }
+                    }
+                    more.hidden = !data.pagination.more;
+                });
+        }
+
+        search.addEventListener('input', () => {
+            clearTimeout(timer);
+            timer = setTimeout(() => {
+                page = 1;
+                load(true);
+            }, 250);
+        });
+        more.addEventListener('click', () => {
+            page += 1;
+            load(false);
+        });
+        load(true);
+    }
+
+    document.addEventListener('DOMContentLoaded', () => {
+        document.querySelectorAll('select[data-autocomplete-url]').forEach(setup);
+    });
+})();
@@ -1,52 +1,136 @@
+import functools
+import string
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.contrib.auth.backends import BaseBackend
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+from django.db.models.functions import Lower
 from django.http import HttpRequest
+from django.utils.crypto import get_random_string
+
+from actors_django.metrics import record_cache
+
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def user_cache_key(user_id) -> str:
+    return f'users:user:{user_id}'
+
+
+def get_cached_user(user_id):
+    """Get a User instance by primary key, from the cache when possible.
+
+    Users are cached for USER_CACHE_TIMEOUT seconds and evicted whenever they are saved or deleted, which also
+    covers password changes and last_login updates. A miss is read from the primary, so that a lagging replica
+    cannot put a user back into the cache as it was before the change that evicted it.
+
+    Args:
+        user_id (int): The id of the User instance.
+
+    Returns:
+        User instance if available, None otherwise.
+    """
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    record_cache('user', user is not None)
+    if user is None:
+        user_model = get_user_model()
+        try:
+            user = user_model.objects.db_manager(DEFAULT_DB_ALIAS).get(pk=user_id)
+        except user_model.DoesNotExist:
+            return None
+        cache.set(key, user, getattr(settings, 'USER_CACHE_TIMEOUT', 60))
+    return user
+
+
+def invalidate_cached_user(user_id) -> None:
+    cache.delete(user_cache_key(user_id))
 
 
-class EmailBackend(BaseBackend):
-    """Custom authentication backend.
+@functools.cache
+def dummy_password_hash() -> str:
+    """Return a hash of a random password, made with the default hasher, to check against for unknown users."""
+    return make_password(get_random_string(32))
 
-    This backend is used to authenticate users via their email and password instead
-    of the traditional username-password method.
+
+def find_login_user(identifier: str):
+    """Find the user a login identifier refers to with one indexed, case-insensitive lookup.
+
+    The identifier is compared to the lowercased username and email. SQLite's LOWER() only folds ASCII, so the
+    identifier with only its ASCII letters lowered is compared too, and the username also exactly, which finds
+    non-ASCII names typed in their stored case. Every branch is answered by an index. A username match wins over an email match, and an exact-case username over other usernames
+    differing only in case. An email shared by several users identifies nobody.
+
+    Args:
+        identifier (str): The username or email typed into the login form.
+
+    Returns:
+        User instance if the identifier designates exactly one user, None otherwise.
+    """
+    if not identifier:
+        return None
+    value = identifier.lower()
+    candidates = list(
+        get_user_model()
+        .objects.alias(username_lower=Lower('username'), email_lower=Lower('email'))
+        .filter(
+            Q(username_lower__in={value, identifier.translate(ASCII_LOWER)})
+            | Q(email_lower__in={value, identifier.translate(ASCII_LOWER)})
+            | Q(username__in={identifier, value})
+        )[:10]
+    )
+    by_username = [user for user in candidates if user.username.lower() == value]
+    if by_username:
+        return next((user for user in by_username if user.username == identifier), by_username[0])
+    return candidates[0] if len(candidates) == 1 else None
+
+
+class UsernameOrEmailBackend(ModelBackend):
+    """Authenticates with a username or an email and a password.
+
+    The user is found with a single query and at most one password hash is checked per attempt. When no user
+    matches, the password is checked against a dummy hash so that a failed login takes the same time whether or
+    not the account exists. The logged-in user is resolved through the user cache.
 
     Extends:
-        BaseBackend: Django's base authentication backend.
+        ModelBackend: Django's default authentication backend.
     """
 
     def authenticate(self, request: HttpRequest, username: str = None, password: str = None, **kwargs):
-        """Carry out the authentication based on email (username) and password.
-
-        Note that the 'username' parameter is actually an email in this context.
+        """Carry out the authentication based on username or email and password.
 
         Args:
             request (HttpRequest): HttpRequest object.
-            username (str): The email for authentication.
+            username (str): The username or email for authentication.
             password (str): The password for authentication.
 
         Returns:
             User object if authentication successful, None otherwise.
         """
-        user_model = get_user_model()
-        try:
-            user = user_model.objects.get(email=username)
-        except (user_model.DoesNotExist, user_model.MultipleObjectsReturned):
+        if username is None:
+            username = kwargs.get(get_user_model().USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        user = find_login_user(username)
+        if user is None:
+            check_password(password, dummy_password_hash())
             return None
-        else:
-            if user.check_password(password):
-                return user
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
         return None
 
     def get_user(self, user_id: int):
-        """Get a User instance based on the user_id provided.
+        """Get an active User instance based on the user_id provided.
 
         Args:
             user_id (int): The id of the User instance.
 
         Returns:
-            User instance if available, None otherwise.
+            User instance if available and allowed to authenticate, None otherwise.
         """
-        user_model = get_user_model()
-        try:
-            return user_model.objects.get(pk=user_id)
-        except user_model.DoesNotExist:
-            return None
+        user = get_cached_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
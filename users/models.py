@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
 
 
 class User(AbstractUser):
@@ -14,3 +15,9 @@ class User(AbstractUser):
 
     photo = models.ImageField(upload_to='users_photos/', blank=True, null=True)
     date_birth = models.DateField(blank=True, null=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(Lower('username'), name='user_username_lower_idx'),
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+        ]
@@ -0,0 +1,19 @@
+import functools
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .auth import invalidate_cached_user
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def evict_cached_user(sender, instance, using, **kwargs):
+    """Drop a saved or deleted user from the user cache so the next request reads it from the database.
+
+    The eviction waits for the commit: evicted earlier, a request could cache the old row again before the change
+    is visible to it.
+    """
+    transaction.on_commit(functools.partial(invalidate_cached_user, instance.pk), using=using)
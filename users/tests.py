@@ -1,3 +1,325 @@
-from django.test import TestCase
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import check_password
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from actors_django.mail import claim_due, deliver
+from actors_django.throttle import MemoryStore, memory_store
+
+from .auth import find_login_user, get_cached_user
+
+
+class UserCacheTest(TestCase):
+    """Logged-in users and their sessions are resolved from the cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='editor', email='editor@gmail.com', password='pass')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_warm_request_makes_no_auth_or_session_queries(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('actors:index'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('actors:index'))
+        self.assertEqual(response.context['user'], self.user)
+        tables = ('"users_user"', '"django_session"')
+        self.assertFalse([query['sql'] for query in queries if any(table in query['sql'] for table in tables)])
+
+    def test_saving_user_evicts_cached_copy_on_commit(self):
+        get_cached_user(self.user.pk)
+        self.user.first_name = 'Changed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+            self.assertEqual(get_cached_user(self.user.pk).first_name, '', 'evicted once the change is committed')
+        self.assertEqual(get_cached_user(self.user.pk).first_name, 'Changed')
+
+    def test_cache_misses_read_from_the_primary(self):
+        with mock.patch('actors_django.routers.get_replicas', return_value=['replica']):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(get_cached_user(self.user.pk), self.user)
+        self.assertEqual(len(queries), 1)
+
+    def test_password_change_ends_cached_sessions(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('actors:index'))
+        self.user.set_password('other')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        response = self.client.get(reverse('actors:index'))
+        self.assertTrue(response.context['user'].is_anonymous)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UsernameOrEmailBackendTest(TestCase):
+    """Logins accept a username or an email with one lookup and at most one password check."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user_model = get_user_model()
+        cls.user = user_model.objects.create_user(username='Editor', email='editor@gmail.com', password='pass')
+        cls.other = user_model.objects.create_user(username='editor@gmail.com', email='other@gmail.com')
+        user_model.objects.create_user(username='first', email='shared@gmail.com')
+        user_model.objects.create_user(username='second', email='shared@gmail.com')
+
+    def test_username_and_email_are_case_insensitive(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(authenticate(None, username='EDITOR', password='pass'), self.user)
+        self.assertEqual(authenticate(None, username='Editor@Gmail.com', password='pass'), None)
+        self.assertEqual(find_login_user('other@GMAIL.com'), self.other)
+
+    def test_non_ascii_username_and_email(self):
+        user = get_user_model().objects.create_user(username='Иван', email='Иван@почта.рф', password='pass')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(authenticate(None, username='Иван', password='pass'), user)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(authenticate(None, username='Иван@почта.рф', password='pass'), user)
+        self.assertEqual(authenticate(None, username='ИВАН@почта.рф', password='pass'), None, 'stored case only')
+
+        with connection.cursor() as cursor:
+            plan = ' '.join(row[-1] for row in cursor.execute('EXPLAIN QUERY PLAN ' + queries[0]['sql']))
+        self.assertNotIn('SCAN users_user', plan)
+        for index in ('user_username_lower_idx', 'user_email_lower_idx', 'sqlite_autoindex_users_user_1'):
+            self.assertIn(index, plan)
+
+    def test_username_match_wins_and_shared_email_matches_nobody(self):
+        self.assertEqual(find_login_user('editor@gmail.com'), self.other)
+        self.assertIsNone(find_login_user('shared@gmail.com'))
+
+    def test_failed_logins_check_exactly_one_hash(self):
+        for username in ('editor', 'nobody'):
+            with (
+                self.subTest(username=username),
+                mock.patch('django.contrib.auth.base_user.check_password', wraps=check_password) as user_check,
+                mock.patch('users.auth.check_password', wraps=check_password) as dummy_check,
+            ):
+                self.assertIsNone(authenticate(None, username=username, password='wrong'))
+                self.assertEqual(user_check.call_count + dummy_check.call_count, 1)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    LOGIN_THROTTLE={'ENABLED': True, 'STORE': 'memory', 'RATES': {'ip': (4, 60), 'account': (2, 60)}},
+)
+class LoginThrottleTest(TestCase):
+    """Over-limit login attempts are rejected before any lookup or password hash."""
+
+    def setUp(self):
+        memory_store.clear()
+
+    def login(self, username: str, ip: str = '10.0.0.1'):
+        return self.client.post(reverse('users:login'), {'username': username, 'password': 'wrong'}, REMOTE_ADDR=ip)
+
+    def test_account_limit_returns_retry_after_without_hashing(self):
+        for ip in ('10.0.0.1', '10.0.0.2'):
+            self.assertEqual(self.login('editor', ip).status_code, 200)
+        with mock.patch('users.auth.check_password') as dummy_check, self.assertNumQueries(0):
+            response = self.login('Editor', '10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        dummy_check.assert_not_called()
+
+    def test_ip_limit_covers_every_account(self):
+        for number in range(4):
+            self.assertEqual(self.login(f'user{number}').status_code, 200)
+        self.assertEqual(self.login('another').status_code, 429)
+        self.assertEqual(self.login('another', '10.0.0.9').status_code, 200)
+
+    def test_password_reset_is_throttled_per_email(self):
+        url = reverse('users:password_reset')
+        for ip in ('10.0.0.1', '10.0.0.2'):
+            self.client.post(url, {'email': 'editor@gmail.com'}, REMOTE_ADDR=ip)
+        response = self.client.post(url, {'email': 'editor@gmail.com'}, REMOTE_ADDR='10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+
+    def test_sliding_window_decays(self):
+        store = MemoryStore()
+        for _ in range(2):
+            self.assertEqual(store.hit('key', 2, 60, now=600.0), 0)
+        self.assertEqual(store.hit('key', 2, 60, now=630.0), 60)
+        self.assertEqual(store.hit('key', 2, 60, now=690.0), 0, 'half of the previous window has decayed')
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP for smtplib to hand over messages, storing them on the server."""
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self) -> None:
+        server = self.server
+        self.reply('220 localhost stand-in SMTP server')
+        envelope = {}
+        while True:
+            line = self.rfile.readline().decode('utf-8', 'replace').rstrip('\r\n')
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif command == 'MAIL':
+                envelope = {'sender': line.split(':', 1)[1].strip().strip('<>'), 'recipients': []}
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                envelope['recipients'].append(line.split(':', 1)[1].strip().strip('<>'))
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while (data := self.rfile.readline()) not in (b'.\r\n', b''):
+                    lines.append(data[1:] if data.startswith(b'..') else data)
+                time.sleep(server.delay)
+                with server.lock:
+                    code = server.replies.pop(0) if server.replies else 250
+                    if code == 250:
+                        server.messages.append({**envelope, 'message': b''.join(lines)})
+                self.reply(f'{code} {"OK" if code == 250 else "Refused"}')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """Stand-in SMTP server on a free local port, for the tests of the mail delivery.
+
+    Attributes:
+        delay (float): Seconds every message takes to be accepted, to simulate a slow mail server.
+        replies (list[int]): Reply codes for the next messages, e.g. [451] to refuse one temporarily; 250 after.
+        messages (list[dict]): Accepted messages with their sender, recipients and raw message bytes.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, delay: float = 0.0) -> None:
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.delay = delay
+        self.replies = []
+        self.messages = []
+        self.lock = threading.Lock()
+        self.connections = 0
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def process_request(self, request, client_address) -> None:
+        self.connections += 1
+        super().process_request(request, client_address)
+
+    def __enter__(self) -> 'LocalSMTPServer':
+        threading.Thread(target=self.serve_forever, name='local-smtp', daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class MailSpoolTest(TestCase):
+    """Mail is queued in the spool without waiting for the server and delivered in batches out of band."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='editor', email='editor@gmail.com', password='pass')
+
+    def setUp(self):
+        memory_store.clear()
+        self.directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.server = self.enterContext(LocalSMTPServer())
+        self.enterContext(
+            override_settings(
+                EMAIL_BACKEND='actors_django.mail.SpoolEmailBackend',
+                EMAIL_HOST='127.0.0.1',
+                EMAIL_PORT=self.server.port,
+                MAIL_SPOOL={'DIRECTORY': self.directory, 'DELIVERY_THREAD': False, 'RETRY_DELAY': 0.0},
+            )
+        )
+
+    def reset_password(self):
+        return self.client.post(reverse('users:password_reset'), {'email': 'editor@gmail.com'})
+
+    def test_password_reset_does_not_wait_for_the_mail_server(self):
+        self.server.delay = 0.5
+        started = time.perf_counter()
+        response = self.reset_password()
+        self.assertLess(time.perf_counter() - started, self.server.delay)
+        self.assertRedirects(response, reverse('users:password_reset_done'))
+        self.assertEqual(len(list(self.directory.glob('*.json'))), 1)
+        self.assertEqual(self.server.messages, [])
+
+        self.assertEqual(deliver(), (1, 0))
+        [message] = self.server.messages
+        self.assertEqual(message['recipients'], ['editor@gmail.com'])
+        self.assertIn(b'password-reset/', message['message'])
+        self.assertEqual(list(self.directory.glob('*.json')), [])
+
+    def test_batch_is_sent_over_one_connection(self):
+        for _ in range(3):
+            self.reset_password()
+        self.assertEqual(deliver(), (3, 0))
+        self.assertEqual(len(self.server.messages), 3)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_temporary_refusal_is_retried(self):
+        self.reset_password()
+        self.server.replies = [451]
+        self.assertEqual(deliver(), (1, 1), 'retried at once with RETRY_DELAY 0')
+        self.assertEqual(len(self.server.messages), 1)
+
+    def test_permanent_refusal_moves_message_to_failed(self):
+        self.reset_password()
+        self.server.replies = [550]
+        with self.assertLogs('actors_django.mail', 'ERROR'):
+            self.assertEqual(deliver(), (0, 1))
+        [failed] = (self.directory / 'failed').glob('*.json')
+        self.assertEqual(json.loads(failed.read_text())['attempts'], 8)
+        self.assertEqual(list(self.directory.glob('*.json')), [])
+
+    def test_claims_taken_back_by_another_deliverer_are_skipped(self):
+        for _ in range(2):
+            self.reset_password()
+
+        def claim_then_lose_the_second(directory, limit, config):
+            claimed = claim_due(directory, limit, config)
+            if len(claimed) == 2:
+                stale = time.time() - config['CLAIM_TIMEOUT'] - 1
+                os.utime(claimed[1], (stale, stale))
+                claim_due(directory, 0, config)
+            return claimed
+
+        with mock.patch('actors_django.mail.claim_due', side_effect=claim_then_lose_the_second):
+            self.assertEqual(deliver(), (2, 0), 'the second one is sent once, from its new claim')
+        self.assertEqual(len(self.server.messages), 2)
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    def test_delivery_backend_must_speak_smtp(self):
+        self.reset_password()
+        with override_settings(MAIL_SPOOL={'DIRECTORY': self.directory, 'DELIVERY_BACKEND': settings.EMAIL_BACKEND}):
+            with self.assertRaises(ImproperlyConfigured):
+                deliver()
+
+    def test_unreachable_server_leaves_spool_untouched(self):
+        self.reset_password()
+        with override_settings(EMAIL_PORT=1), self.assertLogs('actors_django.mail', 'WARNING'):
+            self.assertEqual(deliver(), (0, 0))
+        [queued] = self.directory.glob('*.json')
+        self.assertEqual(json.loads(queued.read_text())['attempts'], 0)
@@ -7,6 +7,8 @@ from django.contrib.auth.views import (
 )
 from django.urls import path, reverse_lazy
 
+from actors_django.throttle import throttle
+
 from . import views
 
 app_name = 'users'
@@ -25,10 +27,12 @@ urlpatterns = [
     ),
     path(
         'password-reset/',
-        PasswordResetView.as_view(
-            template_name='users/password_reset_form.html',
-            email_template_name='users/password_reset_email.html',
-            success_url=reverse_lazy('users:password_reset_done'),
+        throttle('password_reset', account_field='email')(
+            PasswordResetView.as_view(
+                template_name='users/password_reset_form.html',
+                email_template_name='users/password_reset_email.html',
+                success_url=reverse_lazy('users:password_reset_done'),
+            )
         ),
         name='password_reset',
     ),
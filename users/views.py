@@ -1,14 +1,18 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import LoginView, LogoutView, PasswordChangeView
+from django.db import transaction
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import render
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.generic import CreateView, UpdateView
 
+from actors_django.throttle import throttle
 from users.forms import RegisterUserForm, UserLoginForm, UserPasswordChangeForm, UserProfileForm
 
 
+@method_decorator(throttle('login', account_field='username'), name='post')
 class UserLoginView(LoginView):
     """
     Class: UserLoginView
@@ -65,6 +69,7 @@ class UserRegisterDoneView(View):
         return render(request=request, template_name='users/register_done.html', context=context)
 
 
+@method_decorator(transaction.atomic, name='post')
 class UserProfileUpdateView(LoginRequiredMixin, UpdateView):
     """View for a user to update their own profile.
 